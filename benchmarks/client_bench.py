@@ -0,0 +1,206 @@
+"""Round-trip benchmark for the phone app's HTTP calls (client/android-client.py).
+
+Boots the API from sever/remote-control-system.py on a local port against
+the in-memory FakeBackend (--mode async, the asyncio server, by default;
+werkzeug's threaded dev server behind --mode flask closes the connection
+after every response, so there the pooled client cannot reuse one), puts a latency proxy in front of it that
+delays every packet by half of --rtt-ms each way and every new connection by
+a full round trip (the TCP handshake), and then makes --requests profile
+list calls, the app's most frequent request, two ways:
+
+  * one-shot: requests.get() per call, a new connection each time, as the
+    app did before it kept a session;
+  * pooled: one session from client/http_session.py, reusing a keep-alive
+    connection.
+
+For each it reports latency percentiles and the connections opened. The
+pooled run is repeated without gzip (Accept-Encoding: identity) to show the
+bytes on the wire with and without compression.
+
+    python benchmarks/client_bench.py
+    python benchmarks/client_bench.py --rtt-ms 300 --profiles 200 --requests 20
+    python benchmarks/client_bench.py --mode flask
+
+Everything runs on 127.0.0.1; the latency is simulated, not measured.
+"""
+import argparse
+import json
+import os
+import platform
+import queue
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+from bench_common import summarize
+from http_bench import ROOT, boot_async_server, boot_flask_server, load_server_module
+
+sys.path.insert(0, os.path.join(ROOT, 'client'))
+from process_backend import FakeBackend  # noqa: E402
+from http_session import TIMEOUT, make_session  # noqa: E402
+
+
+class LatencyProxy:
+    """TCP proxy adding a fixed one-way delay to every chunk, and a round trip to every connect.
+
+    Chunks are timestamped as they arrive and sent on once their delay has
+    passed, so the link adds latency without limiting throughput.
+    """
+
+    def __init__(self, target_port, rtt):
+        self.target_port = target_port
+        self.delay = rtt / 2
+        self.rtt = rtt
+        self.connections = 0
+        self.bytes_down = 0
+        self.lock = threading.Lock()
+        self.listener = socket.create_server(('127.0.0.1', 0))
+        self.port = self.listener.getsockname()[1]
+
+    def start(self):
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def reset_counters(self):
+        with self.lock:
+            self.connections = 0
+            self.bytes_down = 0
+
+    def _accept(self):
+        while True:
+            client, _ = self.listener.accept()
+            with self.lock:
+                self.connections += 1
+            threading.Thread(target=self._connect, args=(client,), daemon=True).start()
+
+    def _connect(self, client):
+        time.sleep(self.rtt)  # SYN, SYN-ACK
+        upstream = socket.create_connection(('127.0.0.1', self.target_port))
+        for source, target, downstream in ((client, upstream, False), (upstream, client, True)):
+            pending = queue.Queue()
+            threading.Thread(target=self._read, args=(source, pending, downstream), daemon=True).start()
+            threading.Thread(target=self._write, args=(target, pending), daemon=True).start()
+
+    def _read(self, source, pending, downstream):
+        while True:
+            try:
+                data = source.recv(65536)
+            except OSError:
+                data = b''
+            pending.put((time.monotonic() + self.delay, data))
+            if not data:
+                return
+            if downstream:
+                with self.lock:
+                    self.bytes_down += len(data)
+
+    def _write(self, target, pending):
+        while True:
+            due, data = pending.get()
+            time.sleep(max(0.0, due - time.monotonic()))
+            try:
+                if not data:
+                    target.shutdown(socket.SHUT_WR)
+                    return
+                target.sendall(data)
+            except OSError:
+                return
+
+
+def setup_profiles(server, workdir, profile_count):
+    exe_dir = os.path.join(workdir, 'bin')
+    os.makedirs(exe_dir, exist_ok=True)
+    profiles = server.engine.profiles
+    profiles.clear()
+    for i in range(profile_count):
+        exe_path = os.path.join(exe_dir, f'app-{i}.exe')
+        open(exe_path, 'w').close()
+        profiles[f'p{i}'] = {'name': f'App {i}', 'path': exe_path, 'arguments': f'--instance {i}',
+                             'status': 'unknown', 'pid': None}
+    server.engine.save_config()
+
+
+def run_client(proxy, base_url, token, request_count, get):
+    proxy.reset_counters()
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(request_count):
+        start = time.perf_counter()
+        response = get(f'{base_url}/api/profiles', headers={'Authorization': token}, timeout=TIMEOUT)
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - start)
+    result = summarize(latencies, 0, time.perf_counter() - started)
+    result['connections'] = proxy.connections
+    result['bytes_per_response'] = round(proxy.bytes_down / request_count)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Round-trip benchmark for the phone app's HTTP calls")
+    parser.add_argument('--mode', choices=['flask', 'async'], default='async', help='Server front-end to run')
+    parser.add_argument('--workers', type=int, default=4, help='Worker threads for the async server')
+    parser.add_argument('--rtt-ms', type=float, default=150, help='Simulated round-trip time')
+    parser.add_argument('--profiles', type=int, default=100, help='Profiles in the server config')
+    parser.add_argument('--requests', type=int, default=30, help='Profile list calls per client')
+    parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+    args = parser.parse_args()
+    output = os.path.abspath(args.output) if args.output else None
+
+    workdir = tempfile.mkdtemp(prefix='rc-client-bench-')
+    os.chdir(workdir)
+    server = load_server_module()
+    server.load_config()
+    engine = server.engine
+    engine.backend = engine.warm_pool.backend = FakeBackend(50)
+    setup_profiles(server, workdir, args.profiles)
+
+    if args.mode == 'async':
+        shutdown, server_url = boot_async_server(server, args.workers)
+    else:
+        shutdown, server_url = boot_flask_server(server)
+    proxy = LatencyProxy(int(server_url.rsplit(':', 1)[1]), args.rtt_ms / 1000)
+    proxy.start()
+    base_url = f'http://127.0.0.1:{proxy.port}'
+
+    session = make_session()
+    token = session.post(f'{base_url}/api/login', json={'username': 'admin', 'password': 'admin123'},
+                         timeout=TIMEOUT).json()['token']
+    try:
+        results = {
+            'one_shot': run_client(proxy, base_url, token, args.requests, requests.get),
+            'pooled': run_client(proxy, base_url, token, args.requests, session.get),
+        }
+        identity = make_session()
+        identity.headers['Accept-Encoding'] = 'identity'
+        results['pooled_uncompressed'] = run_client(proxy, base_url, token, args.requests, identity.get)
+    finally:
+        shutdown()
+
+    one_shot, pooled = results['one_shot'], results['pooled']
+    report = {
+        'benchmark': 'client_round_trips',
+        'config': {'mode': args.mode, 'rtt_ms': args.rtt_ms, 'profiles': args.profiles, 'requests': args.requests},
+        'environment': {'python': platform.python_version(), 'platform': platform.platform(),
+                        'requests': requests.__version__},
+        'results': results,
+        'pooled_saving': {
+            'mean_ms': round(one_shot['mean_ms'] - pooled['mean_ms'], 3),
+            'ratio': round(one_shot['mean_ms'] / pooled['mean_ms'], 2),
+            'gzip_bytes_ratio': round(results['pooled_uncompressed']['bytes_per_response']
+                                      / pooled['bytes_per_response'], 2),
+        },
+    }
+
+    text = json.dumps(report, indent=4)
+    if output:
+        with open(output, 'w') as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
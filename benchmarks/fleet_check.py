@@ -0,0 +1,209 @@
+"""Scripted check of the fleet gateway (sever/fleet_gateway.py) against several local control servers.
+
+Starts --backends copies of sever/remote-control-system.py, each in a
+directory of its own with --profiles profiles, plus one backend URL that
+nothing listens on. It then starts the gateway with no users.json, so it
+has to create the default admin, and checks that:
+
+  * the default admin can log in to the gateway;
+  * /api/fleet/backends reports every live backend as ok and the dead one
+    as an error;
+  * /api/fleet/profiles merges the profiles of every live backend;
+  * a start and a stop sent through the gateway reach the right backend;
+  * once a backend is killed, fleet reads still answer at once, serving its
+    last profile list as stale.
+
+    python benchmarks/fleet_check.py
+    python benchmarks/fleet_check.py --backends 5 --profiles 20
+
+Profiles run a copy of `sleep` named after their backend, so a stop can only
+reach the processes this check started. Prints a JSON report and exits with
+status 1 if any check failed.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+from bench_common import free_port
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVER_DIR = os.path.join(ROOT, 'sever')
+SERVER_SCRIPT = os.path.join(SERVER_DIR, 'remote-control-system.py')
+GATEWAY_SCRIPT = os.path.join(SERVER_DIR, 'fleet_gateway.py')
+TIMEOUT = 10
+
+
+def boot(cmd, workdir, port):
+    process = subprocess.Popen(cmd, cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                               env=dict(os.environ, PYTHONPATH=SERVER_DIR))
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return process
+        except OSError:
+            if process.poll() is not None:
+                break
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError(f"{os.path.basename(cmd[1])} did not start on port {port}")
+
+
+def setup_backend(workdir, index, profile_count, sleep_binary):
+    os.makedirs(workdir)
+    # A name of its own (within the 15 characters of a kernel process name)
+    exe_path = os.path.join(workdir, f'fleetchk{index}')
+    shutil.copy(sleep_binary, exe_path)
+    profiles = {f'p{i}': {'name': f'Backend {index} app {i}', 'path': exe_path, 'arguments': '60',
+                          'status': 'unknown', 'pid': None}
+                for i in range(profile_count)}
+    with open(os.path.join(workdir, 'config.json'), 'w') as f:
+        json.dump(profiles, f, indent=4)
+
+
+class Checks:
+    def __init__(self):
+        self.results = []
+
+    def check(self, name, ok, **detail):
+        self.results.append(dict({'check': name, 'ok': bool(ok)}, **detail))
+        return ok
+
+    @property
+    def passed(self):
+        return all(result['ok'] for result in self.results)
+
+
+def backend_status(url, profile_id):
+    token = requests.post(f'{url}/api/login', json={'username': 'admin', 'password': 'admin123'},
+                          timeout=TIMEOUT).json()['token']
+    profiles = requests.get(f'{url}/api/profiles', headers={'Authorization': token}, timeout=TIMEOUT).json()
+    return profiles[profile_id]['status']
+
+
+def run_checks(args, workdir):
+    sleep_binary = shutil.which('sleep')
+    if sleep_binary is None:
+        raise RuntimeError("No sleep executable found")
+
+    checks = Checks()
+    processes = []
+    backend_urls = {}
+    try:
+        for i in range(args.backends):
+            backend_dir = os.path.join(workdir, f'backend-{i}')
+            setup_backend(backend_dir, i, args.profiles, sleep_binary)
+            port = free_port()
+            processes.append(boot([sys.executable, SERVER_SCRIPT, '--host', '127.0.0.1', '--port', str(port),
+                                   '--no-reload'], backend_dir, port))
+            backend_urls[f'b{i}'] = f'http://127.0.0.1:{port}'
+
+        gateway_dir = os.path.join(workdir, 'gateway')
+        os.makedirs(gateway_dir)
+        fleet = [{'name': name, 'url': url, 'username': 'admin', 'password': 'admin123'}
+                 for name, url in backend_urls.items()]
+        fleet.append({'name': 'dead', 'url': f'http://127.0.0.1:{free_port()}', 'connect_timeout': 1})
+        with open(os.path.join(gateway_dir, 'fleet.json'), 'w') as f:
+            json.dump({'backends': fleet}, f, indent=4)
+        gateway_port = free_port()
+        processes.append(boot([sys.executable, GATEWAY_SCRIPT, '--host', '127.0.0.1',
+                               '--port', str(gateway_port)], gateway_dir, gateway_port))
+        gateway = f'http://127.0.0.1:{gateway_port}'
+        session = requests.Session()
+
+        response = session.post(f'{gateway}/api/login', json={'username': 'admin', 'password': 'admin123'},
+                                timeout=TIMEOUT)
+        if not checks.check('default_admin_login', response.status_code == 200,
+                            status_code=response.status_code,
+                            users_file_created=os.path.exists(os.path.join(gateway_dir, 'users.json'))):
+            return checks
+        session.headers['Authorization'] = response.json()['token']
+
+        states = {view['name']: view['state']
+                  for view in session.get(f'{gateway}/api/fleet/backends', timeout=TIMEOUT).json()}
+        expected = dict({name: 'ok' for name in backend_urls}, dead='error')
+        checks.check('backend_states', states == expected, states=states)
+
+        started = time.perf_counter()
+        merged = session.get(f'{gateway}/api/fleet/profiles', timeout=TIMEOUT).json()
+        elapsed = time.perf_counter() - started
+        checks.check('merged_profiles', len(merged['profiles']) == args.backends * args.profiles,
+                     profiles=len(merged['profiles']), elapsed_ms=round(elapsed * 1000, 3))
+
+        # Start and stop through the gateway, confirmed on the backend itself
+        target = f'b{args.backends - 1}'
+        response = session.post(f'{gateway}/api/fleet/profiles/{target}:p0/start', timeout=TIMEOUT)
+        checks.check('forwarded_start', response.status_code == 200
+                     and backend_status(backend_urls[target], 'p0') == 'running',
+                     status_code=response.status_code, reply=response.json())
+        response = session.post(f'{gateway}/api/fleet/profiles/{target}:p0/stop', timeout=TIMEOUT)
+        checks.check('forwarded_stop', response.status_code == 200
+                     and backend_status(backend_urls[target], 'p0') == 'stopped',
+                     status_code=response.status_code, reply=response.json())
+        others = [backend_status(url, 'p0') for name, url in backend_urls.items() if name != target]
+        checks.check('other_backends_untouched', all(status == 'stopped' for status in others), statuses=others)
+
+        # Lose a backend: its last list is served as stale without waiting on it
+        processes[0].kill()
+        processes[0].wait()
+        time.sleep(args.fresh_ttl + 0.5)
+        latencies = []
+        for _ in range(3):
+            started = time.perf_counter()
+            merged = session.get(f'{gateway}/api/fleet/profiles', timeout=TIMEOUT).json()
+            latencies.append(time.perf_counter() - started)
+            time.sleep(0.2)
+        checks.check('lost_backend_served_stale',
+                     merged['backends']['b0']['state'] == 'stale'
+                     and len(merged['profiles']) == args.backends * args.profiles
+                     and max(latencies) < 1,
+                     b0=merged['backends']['b0'], max_latency_ms=round(max(latencies) * 1000, 3))
+        return checks
+    finally:
+        for process in processes:
+            process.kill()
+            process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the fleet gateway against several local control servers")
+    parser.add_argument('--backends', type=int, default=3, help='Control servers to start')
+    parser.add_argument('--profiles', type=int, default=5, help='Profiles per control server')
+    parser.add_argument('--fresh-ttl', type=float, default=2,
+                        help="The gateway's FRESH_TTL: how long to wait before a killed backend's list is stale")
+    parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='rc-fleet-check-')
+    try:
+        checks = run_checks(args, workdir)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'check': 'fleet_gateway',
+        'config': {'backends': args.backends, 'profiles': args.profiles},
+        'environment': {'python': platform.python_version(), 'platform': platform.platform()},
+        'passed': checks.passed,
+        'results': checks.results,
+    }
+    text = json.dumps(report, indent=4)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        print(text)
+    sys.exit(0 if checks.passed else 1)
+
+
+if __name__ == '__main__':
+    main()
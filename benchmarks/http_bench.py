@@ -0,0 +1,372 @@
+"""Synthetic load benchmark for the HTTP API in sever/remote-control-system.py.
+
+Boots the Flask app on a local port against the in-memory FakeBackend, drives
+login, profile listing, per-profile status and start/stop at a configurable
+concurrency and prints throughput and latency percentiles as JSON.
+
+    python benchmarks/http_bench.py --processes 500 --profiles 50 --concurrency 16
+    python benchmarks/http_bench.py --save-baseline baseline.json
+    python benchmarks/http_bench.py --baseline baseline.json --tolerance 0.25
+    python benchmarks/http_bench.py --mode both --idle-subscribers 500
+
+--mode selects the Flask threaded server, the asyncio server or both, run
+back to back under the same load, each in a process of its own. --idle-subscribers keeps that many
+/api/events long-polls open for the whole run and reports the server's
+thread count alongside the latencies.
+
+Everything runs on 127.0.0.1; no network access or real processes are needed.
+"""
+import argparse
+import asyncio
+import importlib.util
+import itertools
+import json
+import logging
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from werkzeug.serving import make_server
+
+from bench_common import raise_fd_limit, summarize
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVER_DIR = os.path.join(ROOT, 'sever')
+SERVER_SCRIPT = os.path.join(SERVER_DIR, 'remote-control-system.py')
+BENCH_SCRIPT = os.path.abspath(__file__)
+
+sys.path.insert(0, SERVER_DIR)
+from process_backend import FakeBackend  # noqa: E402
+from async_server import AsyncHTTPServer  # noqa: E402
+
+SCENARIOS = ['login', 'list_profiles', 'profile_status', 'start_stop']
+MODES = ['flask', 'async']
+
+
+def load_server_module():
+    spec = importlib.util.spec_from_file_location('remote_control_system', SERVER_SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class LoadDriver:
+    """Runs one scenario at a fixed concurrency and collects latencies."""
+
+    def __init__(self, base_url, concurrency, username='admin', password='admin123'):
+        self.base_url = base_url
+        self.concurrency = concurrency
+        self.credentials = {'username': username, 'password': password}
+        self.local = threading.local()
+
+    def session(self):
+        session = getattr(self.local, 'session', None)
+        if session is None:
+            session = self.local.session = requests.Session()
+        return session
+
+    def token(self):
+        token = getattr(self.local, 'token', None)
+        if token is None:
+            response = self.session().post(f'{self.base_url}/api/login', json=self.credentials, timeout=30)
+            response.raise_for_status()
+            token = self.local.token = response.json()['token']
+        return token
+
+    def run(self, request_count, make_request):
+        latencies = []
+        errors = [0]
+        lock = threading.Lock()
+        counter = itertools.count()
+
+        def worker():
+            while next(counter) < request_count:
+                start = time.perf_counter()
+                try:
+                    ok = make_request()
+                except requests.RequestException:
+                    ok = False
+                elapsed = time.perf_counter() - start
+                with lock:
+                    if ok:
+                        latencies.append(elapsed)
+                    else:
+                        errors[0] += 1
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for _ in range(self.concurrency):
+                executor.submit(worker)
+        return summarize(latencies, errors[0], time.perf_counter() - start)
+
+    def login(self):
+        response = self.session().post(f'{self.base_url}/api/login', json=self.credentials, timeout=30)
+        return response.status_code == 200
+
+    def list_profiles(self):
+        response = self.session().get(f'{self.base_url}/api/profiles',
+                                      headers={'Authorization': self.token()}, timeout=30)
+        return response.status_code == 200
+
+    def profile_status(self, profile_ids):
+        profile_id = random.choice(profile_ids)
+        response = self.session().get(f'{self.base_url}/api/profiles/{profile_id}/status',
+                                      headers={'Authorization': self.token()}, timeout=30)
+        return response.status_code == 200
+
+    def start_stop(self, profile_ids):
+        profile_id = random.choice(profile_ids)
+        headers = {'Authorization': self.token()}
+        start = self.session().post(f'{self.base_url}/api/profiles/{profile_id}/start', headers=headers, timeout=30)
+        stop = self.session().post(f'{self.base_url}/api/profiles/{profile_id}/stop', headers=headers, timeout=30)
+        # Concurrent workers may race on the same profile, so a 400 from stop is expected
+        return start.status_code == 200 and stop.status_code in (200, 400)
+
+
+def setup_profiles(server, workdir, profile_count):
+    exe_dir = os.path.join(workdir, 'bin')
+    os.makedirs(exe_dir, exist_ok=True)
+    profiles = server.engine.profiles
+    profiles.clear()
+    for i in range(profile_count):
+        exe_path = os.path.join(exe_dir, f'app-{i}.exe')
+        open(exe_path, 'w').close()
+        profiles[f'p{i}'] = {'name': f'App {i}', 'path': exe_path,
+                             'arguments': '', 'status': 'unknown', 'pid': None}
+    server.engine.save_config()
+    return list(profiles)
+
+
+def boot_flask_server(server, host='127.0.0.1'):
+    # Per-request access logging would dominate the measurement
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    http_server = make_server(host, 0, server.app, threaded=True)
+    thread = threading.Thread(target=http_server.serve_forever, daemon=True)
+    thread.start()
+    return http_server.shutdown, f'http://{host}:{http_server.server_port}'
+
+
+def boot_async_server(server, workers, host='127.0.0.1'):
+    http_server = AsyncHTTPServer(server.app, server.check_session, server.status_feed,
+                                  host=host, port=0, workers=workers,
+                                  max_poll_timeout=server.EVENTS_MAX_TIMEOUT)
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+
+    def run():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(http_server.start())
+        started.set()
+        loop.run_forever()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    started.wait()
+
+    def shutdown():
+        asyncio.run_coroutine_threadsafe(http_server.stop(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+    return shutdown, f'http://{host}:{http_server.port}'
+
+
+# Open long-polls that stay parked on /api/events for the whole run
+def open_idle_subscribers(base_url, token, version, count):
+    host, port = base_url.split('//', 1)[1].split(':')
+    request = (f'GET /api/events?since={version}&timeout=3600 HTTP/1.1\r\n'
+               f'Host: {host}\r\nAuthorization: {token}\r\n\r\n').encode()
+    sockets = []
+    for _ in range(count):
+        sock = socket.create_connection((host, int(port)))
+        sock.sendall(request)
+        sockets.append(sock)
+    return sockets
+
+
+def rss_mb():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def run_mode(server, mode, args, profile_ids):
+    if mode == 'async':
+        shutdown, base_url = boot_async_server(server, args.workers)
+    else:
+        shutdown, base_url = boot_flask_server(server)
+
+    driver = LoadDriver(base_url, args.concurrency)
+    subscribers = []
+    try:
+        threads_before = threading.active_count()
+        if args.idle_subscribers:
+            subscribers = open_idle_subscribers(base_url, driver.token(), server.status_feed.version + 10 ** 9,
+                                                args.idle_subscribers)
+            time.sleep(0.5)
+        resources = {
+            'idle_subscribers': len(subscribers),
+            'threads_before_subscribers': threads_before,
+            'threads_with_subscribers': threading.active_count(),
+            'threads_per_subscriber': round((threading.active_count() - threads_before) / len(subscribers), 3)
+            if subscribers else None,
+            'rss_mb': rss_mb(),
+        }
+
+        scenarios = {
+            'login': (args.requests, driver.login),
+            'list_profiles': (args.requests, driver.list_profiles),
+            'profile_status': (args.requests, lambda: driver.profile_status(profile_ids)),
+            'start_stop': (args.start_stop_requests, lambda: driver.start_stop(profile_ids)),
+        }
+        results = {}
+        for name in args.scenarios:
+            request_count, make_request = scenarios[name]
+            results[name] = driver.run(request_count, make_request)
+    finally:
+        for sock in subscribers:
+            sock.close()
+        shutdown()
+
+    return {'results': results, 'resources': resources}
+
+
+# Run one mode in a fresh interpreter and return its part of the report
+def run_mode_in_subprocess(args, mode):
+    with tempfile.TemporaryDirectory(prefix='rc-bench-') as tmp:
+        output = os.path.join(tmp, 'report.json')
+        cmd = [sys.executable, BENCH_SCRIPT, '--mode', mode, '--output', output,
+               '--processes', str(args.processes), '--profiles', str(args.profiles),
+               '--concurrency', str(args.concurrency), '--requests', str(args.requests),
+               '--start-stop-requests', str(args.start_stop_requests), '--scenarios', *args.scenarios,
+               '--workers', str(args.workers), '--idle-subscribers', str(args.idle_subscribers)]
+        subprocess.run(cmd, check=True)
+        with open(output) as f:
+            return json.load(f)['modes'][mode]
+
+
+def run_local(args):
+    workdir = tempfile.mkdtemp(prefix='rc-bench-')
+    os.chdir(workdir)
+    raise_fd_limit()
+
+    server = load_server_module()
+    server.load_config()
+    engine = server.engine
+    engine.backend = engine.warm_pool.backend = FakeBackend(args.processes)
+    # Exits of fake processes are reported by the fake backend itself
+    engine.exit_watcher = engine.backend.exit_watcher(engine.on_process_exit)
+    engine.exit_watcher.start()
+    profile_ids = setup_profiles(server, workdir, args.profiles)
+    return {args.mode: run_mode(server, args.mode, args, profile_ids)}
+
+
+def run_benchmark(args):
+    if args.mode == 'both':
+        # One process per mode, so threads the first server leaves behind (its
+        # long-poll handlers drain slowly) don't count in the next one's figures
+        runs = {mode: run_mode_in_subprocess(args, mode) for mode in MODES}
+    else:
+        runs = run_local(args)
+
+    return {
+        'benchmark': 'http_api',
+        'config': {
+            'processes': args.processes,
+            'profiles': args.profiles,
+            'concurrency': args.concurrency,
+            'requests': args.requests,
+            'start_stop_requests': args.start_stop_requests,
+            'idle_subscribers': args.idle_subscribers,
+            'async_workers': args.workers,
+        },
+        'environment': {'python': platform.python_version(), 'platform': platform.platform()},
+        'modes': runs,
+    }
+
+
+# Compare a run against a stored baseline; returns a list of regressions
+def compare_to_baseline(report, baseline, tolerance):
+    regressions = []
+    for mode, run in report['modes'].items():
+        for name, current in run['results'].items():
+            previous = baseline.get('modes', {}).get(mode, {}).get('results', {}).get(name)
+            if not previous:
+                continue
+            for metric in ('p50_ms', 'p95_ms', 'p99_ms'):
+                if previous.get(metric) and current.get(metric) is not None:
+                    if current[metric] > previous[metric] * (1 + tolerance):
+                        regressions.append({'mode': mode, 'scenario': name, 'metric': metric,
+                                            'baseline': previous[metric], 'current': current[metric]})
+            if previous.get('throughput_rps') and current['throughput_rps'] < previous['throughput_rps'] * (1 - tolerance):
+                regressions.append({'mode': mode, 'scenario': name, 'metric': 'throughput_rps',
+                                    'baseline': previous['throughput_rps'], 'current': current['throughput_rps']})
+            if current['errors'] > previous.get('errors', 0):
+                regressions.append({'mode': mode, 'scenario': name, 'metric': 'errors',
+                                    'baseline': previous.get('errors', 0), 'current': current['errors']})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load benchmark for the remote control HTTP API")
+    parser.add_argument('--processes', type=int, default=300, help='Number of simulated processes')
+    parser.add_argument('--profiles', type=int, default=20, help='Number of profiles')
+    parser.add_argument('--concurrency', type=int, default=8, help='Concurrent client workers')
+    parser.add_argument('--requests', type=int, default=500, help='Requests per read scenario')
+    parser.add_argument('--start-stop-requests', type=int, default=40, help='Start/stop pairs to issue')
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument('--mode', choices=MODES + ['both'], default='flask', help='Server mode to benchmark')
+    parser.add_argument('--workers', type=int, default=16, help='Worker threads for the async server')
+    parser.add_argument('--idle-subscribers', type=int, default=0,
+                        help='Long-poll connections held open during the run')
+    parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+    parser.add_argument('--save-baseline', help='Store this run as the baseline file')
+    parser.add_argument('--baseline', help='Compare against a stored baseline and fail on regression')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed relative regression (0.2 = 20%%)')
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output) if args.output else None
+    save_baseline = os.path.abspath(args.save_baseline) if args.save_baseline else None
+    baseline_file = os.path.abspath(args.baseline) if args.baseline else None
+
+    report = run_benchmark(args)
+
+    exit_code = 0
+    if baseline_file:
+        with open(baseline_file, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(report, baseline, args.tolerance)
+        report['regression'] = {'baseline': baseline_file, 'tolerance': args.tolerance,
+                                'passed': not regressions, 'regressions': regressions}
+        exit_code = 1 if regressions else 0
+
+    text = json.dumps(report, indent=4)
+    if output:
+        with open(output, 'w') as f:
+            f.write(text)
+    else:
+        print(text)
+
+    if save_baseline:
+        with open(save_baseline, 'w') as f:
+            json.dump(report, f, indent=4)
+
+    sys.exit(exit_code)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""Wire-size and CPU benchmark for the socket protocol's negotiated encodings.
+
+Builds a get_apps reply for --apps apps, the biggest message the socket
+server sends, and runs it through every encoding the handshake can agree on
+(JSON or MessagePack, each with and without the per-connection zlib
+stream). For each one it reports:
+
+  * bytes on the wire for the first reply on a connection, and the average
+    over --replies further replies in which a few app statuses change, the
+    way a client polling every few seconds sees them (the zlib stream keeps
+    a 32 KiB history, which pays off for small repeated messages; a reply
+    this big mostly compresses against itself);
+  * server encode and client decode CPU per reply;
+  * the modelled time to deliver one reply over each --link, given as
+    name=kilobits_per_second/round_trip_ms.
+
+    python benchmarks/protocol_bench.py
+    python benchmarks/protocol_bench.py --apps 1000 --link 3g=384/300 --link edge=120/600
+
+Runs offline; nothing is sent over a socket. Uses the msgpack package when
+it is installed and the protocol's pure Python packer otherwise, and says
+which in the report.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'sever'))
+from socket_protocol import (CAPABILITY_MSGPACK, CAPABILITY_ZLIB, HEADER, MessageCodec,  # noqa: E402
+                             msgpack)
+
+ENCODINGS = {
+    'json': 0,
+    'json+zlib': CAPABILITY_ZLIB,
+    'msgpack': CAPABILITY_MSGPACK,
+    'msgpack+zlib': CAPABILITY_MSGPACK | CAPABILITY_ZLIB,
+}
+DEFAULT_LINKS = ['edge=120/600', '3g=384/300', 'lte=5000/80']
+
+
+def parse_link(text):
+    name, _, spec = text.partition('=')
+    kbps, _, rtt = spec.partition('/')
+    return name, float(kbps), float(rtt or 0)
+
+
+def get_apps_reply(app_count, rng):
+    apps = [{'name': f'App {i:04d}',
+             'path': f'C:\\Program Files\\Vendor {i % 37}\\Product {i}\\bin\\product-{i}.exe',
+             'status': rng.choice(['green', 'red', 'red', 'yellow'])}
+            for i in range(app_count)]
+    return {'status': 'success', 'apps': apps, 'id': 1}
+
+
+def next_reply(reply, rng, changes):
+    apps = [dict(app) for app in reply['apps']]
+    for app in rng.sample(apps, min(changes, len(apps))):
+        app['status'] = 'green' if app['status'] != 'green' else 'red'
+    return {'status': 'success', 'apps': apps, 'id': reply['id'] + 1}
+
+
+def measure(capabilities, replies):
+    server = MessageCodec(capabilities)
+    client = MessageCodec(capabilities)
+    sizes = []
+    encode_time = decode_time = 0.0
+    for reply in replies:
+        start = time.perf_counter()
+        payload = server.encode(reply)
+        encode_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        decoded = client.decode(client.decompress(payload))
+        decode_time += time.perf_counter() - start
+        if decoded != reply:
+            raise AssertionError("Round trip changed the message")
+        sizes.append(HEADER.size + len(payload))
+
+    repeats = sizes[1:] or sizes
+    return {
+        'first_reply_bytes': sizes[0],
+        'repeat_reply_bytes': round(sum(repeats) / len(repeats)),
+        'encode_ms': round(encode_time / len(replies) * 1000, 3),
+        'decode_ms': round(decode_time / len(replies) * 1000, 3),
+    }
+
+
+def transfer_ms(size, kbps, rtt_ms):
+    return round(rtt_ms + size * 8 / (kbps * 1000) * 1000, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Wire-size and CPU benchmark for the socket protocol encodings")
+    parser.add_argument('--apps', type=int, default=1000, help='Apps in the get_apps reply')
+    parser.add_argument('--replies', type=int, default=20, help='Further replies on the same connection')
+    parser.add_argument('--changes', type=int, default=5, help='App statuses that change between replies')
+    parser.add_argument('--link', action='append', help='name=kbps/rtt_ms; repeatable (default: edge, 3g, lte)')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    replies = [get_apps_reply(args.apps, rng)]
+    for _ in range(args.replies):
+        replies.append(next_reply(replies[-1], rng, args.changes))
+    links = [parse_link(link) for link in args.link or DEFAULT_LINKS]
+
+    results = {}
+    for name, capabilities in ENCODINGS.items():
+        result = measure(capabilities, replies)
+        result['first_reply_ms'] = {link: transfer_ms(result['first_reply_bytes'], kbps, rtt)
+                                    for link, kbps, rtt in links}
+        result['repeat_reply_ms'] = {link: transfer_ms(result['repeat_reply_bytes'], kbps, rtt)
+                                     for link, kbps, rtt in links}
+        results[name] = result
+
+    report = {
+        'benchmark': 'socket_protocol_encodings',
+        'config': {
+            'apps': args.apps,
+            'replies': args.replies,
+            'changes_per_reply': args.changes,
+            'links': {link: {'kbps': kbps, 'rtt_ms': rtt} for link, kbps, rtt in links},
+        },
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'msgpack': 'msgpack ' + '.'.join(map(str, msgpack.version)) if msgpack else 'pure Python',
+        },
+        'results': results,
+    }
+
+    text = json.dumps(report, indent=4)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
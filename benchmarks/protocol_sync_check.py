@@ -0,0 +1,31 @@
+"""Check that the client's copy of the socket protocol matches the server's.
+
+client/socket_protocol.py is a copy of sever/socket_protocol.py, kept so the
+client can be packaged without the server tree. This prints a unified diff
+and exits with status 1 when the two have drifted apart.
+
+    python benchmarks/protocol_sync_check.py
+"""
+import difflib
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVER_COPY = os.path.join('sever', 'socket_protocol.py')
+CLIENT_COPY = os.path.join('client', 'socket_protocol.py')
+
+
+def main():
+    with open(os.path.join(ROOT, SERVER_COPY)) as f:
+        server = f.readlines()
+    with open(os.path.join(ROOT, CLIENT_COPY)) as f:
+        client = f.readlines()
+    if server == client:
+        print(f"{CLIENT_COPY} matches {SERVER_COPY}")
+        sys.exit(0)
+    sys.stdout.writelines(difflib.unified_diff(server, client, SERVER_COPY, CLIENT_COPY))
+    sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
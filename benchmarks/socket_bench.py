@@ -0,0 +1,257 @@
+"""Connection-scaling benchmark for the raw socket server in sever/windows-server.py.
+
+Starts the server as a subprocess in each mode (a thread per connection, or
+the asyncio event loop), then:
+
+  * opens --idle-connections sockets at once, the way phones reconnect after
+    a network blip, and times how long until every one has completed the
+    protocol handshake;
+  * with those connections held idle, reports the server's thread count and
+    resident memory;
+  * drives --requests get_apps / app_status requests from one active client
+    and reports their latency while the idle connections stay open.
+
+    python benchmarks/socket_bench.py --idle-connections 5000
+    python benchmarks/socket_bench.py --mode async --backlog 5 --idle-connections 2000
+
+The apps in the generated config point at paths that don't exist, so no real
+processes are checked or started. Linux only (reads /proc for the server's
+thread count and memory).
+"""
+import argparse
+import json
+import os
+import platform
+import selectors
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench_common import free_port, percentile, raise_fd_limit, summarize
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVER_DIR = os.path.join(ROOT, 'sever')
+SERVER_SCRIPT = os.path.join(SERVER_DIR, 'windows-server.py')
+
+sys.path.insert(0, SERVER_DIR)
+from socket_protocol import (FrameDecoder, decode_message, encode_frame, encode_message,  # noqa: E402
+                             handshake, parse_handshake)
+
+MODES = ['threaded', 'async']
+
+
+def write_config(workdir, app_count):
+    config = {
+        'apps': [{'name': f'App {i}', 'path': os.path.join(workdir, 'missing', f'app-{i}.exe')}
+                 for i in range(app_count)],
+        'users': [{'username': 'admin', 'password': 'bench'}]
+    }
+    with open(os.path.join(workdir, 'config.json'), 'w') as f:
+        json.dump(config, f)
+
+
+def boot_server(workdir, mode, args):
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, SERVER_SCRIPT, '--host', '127.0.0.1', '--port', str(port), '--mode', mode,
+         '--workers', str(args.workers), '--backlog', str(args.backlog)],
+        cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        env=dict(os.environ, PYTHONPATH=SERVER_DIR), preexec_fn=raise_fd_limit)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return process, port
+        except OSError:
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError(f"{mode} server did not start")
+
+
+def server_resources(pid):
+    resources = {}
+    with open(f'/proc/{pid}/status') as f:
+        for line in f:
+            if line.startswith('Threads:'):
+                resources['threads'] = int(line.split()[1])
+            elif line.startswith('VmRSS:'):
+                resources['rss_mb'] = round(int(line.split()[1]) / 1024, 1)
+    return resources
+
+
+# Connect `count` sockets at once and complete every handshake; returns (sockets, report)
+def connection_storm(port, count, timeout):
+    selector = selectors.DefaultSelector()
+    pending = {}
+    start = time.perf_counter()
+    failures = 0
+    for _ in range(count):
+        sock = socket.socket()
+        sock.setblocking(False)
+        sock.connect_ex(('127.0.0.1', port))
+        pending[sock] = b''
+        selector.register(sock, selectors.EVENT_WRITE)
+
+    connected = []
+    handshake_times = []
+    deadline = time.monotonic() + timeout
+    while pending and time.monotonic() < deadline:
+        for key, events in selector.select(0.5):
+            sock = key.fileobj
+            if events & selectors.EVENT_WRITE:
+                error = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                if error:
+                    failures += 1
+                    selector.unregister(sock)
+                    del pending[sock]
+                    sock.close()
+                    continue
+                sock.send(handshake())
+                selector.modify(sock, selectors.EVENT_READ)
+                continue
+            try:
+                data = sock.recv(16)
+            except OSError:
+                data = b''
+            if not data:
+                failures += 1
+                selector.unregister(sock)
+                del pending[sock]
+                sock.close()
+                continue
+            pending[sock] += data
+            if parse_handshake(pending[sock]) is not None:
+                selector.unregister(sock)
+                del pending[sock]
+                connected.append(sock)
+                handshake_times.append(time.perf_counter() - start)
+
+    for sock in pending:
+        failures += 1
+        sock.close()
+    selector.close()
+    elapsed = time.perf_counter() - start
+    handshake_times.sort()
+    return connected, {
+        'connections': count,
+        'established': len(connected),
+        'failures': failures,
+        'elapsed_s': round(elapsed, 3),
+        'p50_ms': round(percentile(handshake_times, 50) * 1000, 3) if handshake_times else None,
+        'p99_ms': round(percentile(handshake_times, 99) * 1000, 3) if handshake_times else None,
+    }
+
+
+class ActiveClient:
+    """One framed, authenticated connection issuing requests back to back."""
+
+    def __init__(self, port):
+        self.sock = socket.create_connection(('127.0.0.1', port), timeout=30)
+        self.sock.sendall(handshake())
+        reply = b''
+        while parse_handshake(reply) is None:
+            reply += self.sock.recv(16)
+        self.decoder = FrameDecoder()
+        self.decoder.feed(reply[parse_handshake(reply)[2]:])
+        self.next_id = 0
+        response = self.request({'action': 'authenticate', 'username': 'admin', 'password': 'bench'})
+        if response.get('status') != 'success':
+            raise RuntimeError(f"Authentication failed: {response}")
+
+    def request(self, command):
+        self.next_id += 1
+        self.sock.sendall(encode_frame(encode_message(dict(command, id=self.next_id))))
+        while True:
+            for payload in self.decoder.feed(self.sock.recv(65536)):
+                message = decode_message(payload)
+                if message.get('id') == self.next_id:
+                    return message
+
+    def run(self, request_count, command):
+        latencies = []
+        errors = 0
+        start = time.perf_counter()
+        for _ in range(request_count):
+            begin = time.perf_counter()
+            try:
+                ok = self.request(command).get('status') == 'success'
+            except OSError:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - begin)
+            else:
+                errors += 1
+        return summarize(latencies, errors, time.perf_counter() - start)
+
+    def close(self):
+        self.sock.close()
+
+
+def run_mode(workdir, mode, args):
+    process, port = boot_server(workdir, mode, args)
+    idle = []
+    try:
+        baseline = server_resources(process.pid)
+        idle, storm = connection_storm(port, args.idle_connections, args.storm_timeout)
+        time.sleep(0.5)
+        resources = dict(server_resources(process.pid), idle_connections=len(idle),
+                         threads_before=baseline['threads'], rss_mb_before=baseline['rss_mb'])
+
+        client = ActiveClient(port)
+        try:
+            results = {
+                'get_apps': client.run(args.requests, {'action': 'get_apps'}),
+                'app_status': client.run(args.requests, {'action': 'app_status', 'app_name': 'App 0'}),
+            }
+        finally:
+            client.close()
+    finally:
+        for sock in idle:
+            sock.close()
+        process.kill()
+        process.wait()
+    return {'storm': storm, 'resources': resources, 'results': results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Connection-scaling benchmark for the socket server")
+    parser.add_argument('--idle-connections', type=int, default=5000, help='Connections opened at once and held')
+    parser.add_argument('--apps', type=int, default=50, help='Apps in the server config')
+    parser.add_argument('--requests', type=int, default=500, help='Requests per scenario on the active client')
+    parser.add_argument('--mode', choices=MODES + ['both'], default='both', help='Server mode to benchmark')
+    parser.add_argument('--workers', type=int, default=16, help='Worker threads for the async server')
+    parser.add_argument('--backlog', type=int, default=1024, help='Listen backlog passed to the server')
+    parser.add_argument('--storm-timeout', type=float, default=60, help='Seconds to wait for every handshake')
+    parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+    args = parser.parse_args()
+
+    raise_fd_limit()
+    workdir = tempfile.mkdtemp(prefix='rc-socket-bench-')
+    write_config(workdir, args.apps)
+
+    modes = MODES if args.mode == 'both' else [args.mode]
+    report = {
+        'benchmark': 'socket_server',
+        'config': {
+            'idle_connections': args.idle_connections,
+            'apps': args.apps,
+            'requests': args.requests,
+            'async_workers': args.workers,
+            'backlog': args.backlog,
+        },
+        'environment': {'python': platform.python_version(), 'platform': platform.platform()},
+        'modes': {mode: run_mode(workdir, mode, args) for mode in modes},
+    }
+
+    text = json.dumps(report, indent=4)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -14,12 +14,22 @@ from kivy.uix.settings import SettingsWithSidebar
 from kivy.config import ConfigParser
 
 import socket
+import select
 import json
 import threading
 import os
 from functools import partial
 import time
 
+from socket_protocol import (MAGIC, SUPPORTED_CAPABILITIES, FrameDecoder, LegacyDecoder, MessageCodec,
+                             ProtocolError, encode_frame, handshake, parse_handshake)
+from request_executor import RequestExecutor
+
+CONNECT_TIMEOUT = 10  # Seconds to reach the server
+PING_AFTER = 25  # Seconds without hearing from the server before we ping it
+DEAD_AFTER = 60  # Seconds without hearing from the server before we reconnect
+MAX_RECONNECT_DELAY = 30
+
 class ExeButton(BoxLayout):
     """Custom widget for executable buttons with LED status indicator."""
     def __init__(self, app_name, status="red", **kwargs):
@@ -89,6 +99,20 @@ class RemoteControlClient(App):
         self.socket = None
         self.connected = False
         self.authenticated = False
+        self.framed = False  # Framed protocol with request ids, or legacy bare JSON
+        self.decoder = None
+        self.codec = MessageCodec()  # Encoding and compression agreed in the handshake
+        self.protocol_version = None
+        self.next_request_id = 0
+        self.pending_responses = {}  # {request id: response} received out of order
+        self.pending_events = []  # Pushed frames not applied yet
+        self.subscribed = False  # Server pushes status changes; no polling needed
+        self.last_received = 0  # time.monotonic() of the last bytes from the server
+        self.last_ping = 0
+        self.reconnect_delay = 1
+        self.reconnecting = False
+        # All socket I/O runs on one network thread, off the UI thread and never interleaved
+        self.network = RequestExecutor(workers=1)
         
         # App data
         self.apps = []
@@ -157,9 +181,15 @@ class RemoteControlClient(App):
         
         # Start periodic status updates if connected
         Clock.schedule_interval(self.update_app_statuses, 5)  # Every 5 seconds
+        Clock.schedule_interval(self.process_pushes, 0.5)
         
         return self.main_layout
     
+    def on_stop(self):
+        self.network.shutdown()
+        if self.socket:
+            self.socket.close()
+    
     def update_background(self):
         """Update the app background based on settings."""
         with self.main_layout.canvas.before:
@@ -195,34 +225,88 @@ class RemoteControlClient(App):
     
     def connect_to_server(self, instance):
         """Connect to the remote server."""
+        if self.network.busy('connect'):
+            return
+        self.host = self.config.get('Server', 'host')
+        self.port = int(self.config.get('Server', 'port'))
+        self.status_label.text = f"Connecting to {self.host}:{self.port}..."
+        self.network.submit(partial(self.open_connection, self.host, self.port),
+                            self.on_connected, self.on_connect_failed, key='connect')
+    
+    def open_connection(self, host, port):
+        """Open the socket and negotiate the protocol (network thread)."""
+        if self.connected:
+            return
+        self.socket = socket.create_connection((host, port), timeout=CONNECT_TIMEOUT)
+        # A server that stops answering fails the blocked read instead of hanging it
+        self.socket.settimeout(DEAD_AFTER)
         try:
-            self.host = self.config.get('Server', 'host')
-            self.port = int(self.config.get('Server', 'port'))
-            
-            # Create a socket
-            self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.socket.connect((self.host, self.port))
-            
-            self.connected = True
-            self.status_label.text = f"Connected to {self.host}:{self.port}"
-            self.connect_button.text = "Disconnect"
-            self.connect_button.unbind(on_press=self.connect_to_server)
-            self.connect_button.bind(on_press=self.disconnect_from_server)
-            
-            return True
-        except Exception as e:
-            self.status_label.text = f"Connection Error: {str(e)}"
-            self.connected = False
-            return False
+            self.negotiate_protocol()
+        except Exception:
+            self.socket.close()
+            self.socket = None
+            raise
+        self.connected = True
+    
+    def on_connected(self, result):
+        if self.connect_button.text == "Disconnect":
+            return
+        self.status_label.text = f"Connected to {self.host}:{self.port}"
+        self.connect_button.text = "Disconnect"
+        self.connect_button.unbind(on_press=self.connect_to_server)
+        self.connect_button.bind(on_press=self.disconnect_from_server)
+    
+    def on_connect_failed(self, error):
+        self.status_label.text = f"Connection Error: {str(error)}"
+        self.connected = False
+    
+    def negotiate_protocol(self):
+        """Use framed messages if the server supports them, otherwise legacy JSON."""
+        self.pending_responses = {}
+        self.pending_events = []
+        self.subscribed = False
+        self.last_received = self.last_ping = time.monotonic()
+        # Offer MessagePack and compression; the server picks what it supports
+        self.socket.sendall(handshake(capabilities=SUPPORTED_CAPABILITIES))
+        reply = b''
+        while parse_handshake(reply) is None and not reply.lstrip().startswith(b'{'):
+            data = self.socket.recv(4096)
+            if not data:
+                raise ConnectionError("Connection closed by server")
+            reply += data
+        
+        if reply.startswith(MAGIC):
+            version, capabilities, size = parse_handshake(reply)
+            self.framed = True
+            self.protocol_version = version
+            self.codec = MessageCodec(capabilities)
+            self.decoder = FrameDecoder(version)
+            self.decoder.feed(reply[size:])
+        else:
+            # Older servers answer the handshake with an "Invalid JSON format" error
+            self.framed = False
+            self.codec = MessageCodec()
+            self.decoder = LegacyDecoder()
+            while not self.decoder.feed(reply):
+                reply = self.socket.recv(4096)
+                if not reply:
+                    raise ConnectionError("Connection closed by server")
     
     def disconnect_from_server(self, instance):
         """Disconnect from the server."""
+        self.network.cancel()
         if self.socket:
+            try:
+                # Wakes the network thread if it is blocked reading
+                self.socket.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
             self.socket.close()
             self.socket = None
         
         self.connected = False
         self.authenticated = False
+        self.subscribed = False
         self.status_label.text = "Disconnected"
         self.connect_button.text = "Connect"
         self.connect_button.unbind(on_press=self.disconnect_from_server)
@@ -234,46 +318,71 @@ class RemoteControlClient(App):
         self.app_widgets = {}
     
     def authenticate(self, instance):
-        """Authenticate with the server."""
-        if not self.connected:
-            if not self.connect_to_server(None):
-                return
-        
+        """Authenticate with the server, connecting first if needed."""
         username = self.username_input.text
         password = self.password_input.text
         
         if not username or not password:
             self.status_label.text = "Please enter username and password"
+            self.reconnecting = False
             return
+        if self.network.busy('login'):
+            return  # Already on its way
         
-        try:
-            # Send authentication request
-            auth_request = {
-                "action": "authenticate",
-                "username": username,
-                "password": password
-            }
-            
-            self.send_command(auth_request)
-            response = self.receive_response()
-            
-            if response.get("status") == "success":
-                self.authenticated = True
-                self.status_label.text = "Authenticated"
-                self.login_button.text = "Logout"
-                self.login_button.unbind(on_press=self.authenticate)
-                self.login_button.bind(on_press=self.logout)
-                self.refresh_button.disabled = False
-                
-                # Get apps after authentication
-                self.refresh_apps(None)
-            else:
-                self.status_label.text = "Authentication Failed"
-        except Exception as e:
-            self.status_label.text = f"Authentication Error: {str(e)}"
+        self.host = self.config.get('Server', 'host')
+        self.port = int(self.config.get('Server', 'port'))
+        self.status_label.text = "Logging in..."
+        self.network.submit(partial(self.login_request, self.host, self.port, username, password),
+                            self.on_login, self.on_login_failed, key='login')
+    
+    def login_request(self, host, port, username, password):
+        """Connect if needed and send the credentials (network thread)."""
+        self.open_connection(host, port)
+        return self.request({
+            "action": "authenticate",
+            "username": username,
+            "password": password
+        })
+    
+    def on_login(self, response):
+        self.on_connected(None)
+        if response.get("status") != "success":
+            self.status_label.text = "Authentication Failed"
+            self.reconnecting = False
+            return
+        
+        self.authenticated = True
+        self.status_label.text = "Reconnected" if self.reconnecting else "Authenticated"
+        self.reconnecting = False
+        self.login_button.text = "Logout"
+        self.login_button.unbind(on_press=self.authenticate)
+        self.login_button.bind(on_press=self.logout)
+        self.refresh_button.disabled = False
+        
+        # Get apps after authentication
+        self.refresh_apps(None)
+        self.subscribe_to_updates()
+    
+    def on_login_failed(self, error):
+        if not self.connected:
+            self.on_connect_failed(error)
+            if self.reconnecting:
+                self.reconnect_delay = min(self.reconnect_delay * 2, MAX_RECONNECT_DELAY)
+                self.status_label.text = f"Server unreachable, retrying in {self.reconnect_delay}s"
+                Clock.schedule_once(self.reconnect, self.reconnect_delay)
+            return
+        self.on_connected(None)
+        self.status_label.text = f"Authentication Error: {str(error)}"
+        self.reconnecting = False
     
     def logout(self, instance):
         """Log out from the server."""
+        # Replies still on their way belong to the old session
+        self.network.cancel()
+        if self.subscribed:
+            self.network.submit(partial(self.request, {"action": "unsubscribe"}),
+                                on_error=lambda e: print(f"Error unsubscribing: {str(e)}"))
+            self.subscribed = False
         self.authenticated = False
         self.status_label.text = "Logged Out"
         self.login_button.text = "Login"
@@ -290,19 +399,114 @@ class RemoteControlClient(App):
         if not self.authenticated:
             return
         
-        try:
-            request = {"action": "get_apps"}
-            self.send_command(request)
-            response = self.receive_response()
-            
-            if response.get("status") == "success" and "apps" in response:
-                self.apps = response["apps"]
-                self.update_app_buttons()
-                self.status_label.text = f"Loaded {len(self.apps)} applications"
-            else:
-                self.status_label.text = "Failed to get applications"
-        except Exception as e:
-            self.status_label.text = f"Error refreshing apps: {str(e)}"
+        self.network.submit(partial(self.request, {"action": "get_apps"}),
+                            self.on_apps, self.on_refresh_failed, key='get_apps')
+    
+    def on_apps(self, response):
+        if response.get("status") == "success" and "apps" in response:
+            self.apps = response["apps"]
+            self.update_app_buttons()
+            self.status_label.text = f"Loaded {len(self.apps)} applications"
+        else:
+            self.status_label.text = "Failed to get applications"
+    
+    def on_refresh_failed(self, error):
+        self.status_label.text = f"Error refreshing apps: {str(error)}"
+    
+    def subscribe_to_updates(self):
+        """Ask the server to push status changes instead of polling for them."""
+        if not self.authenticated or not self.framed:
+            return  # Legacy servers only answer requests
+        
+        self.network.submit(partial(self.request, {"action": "subscribe"}), self.on_subscribed,
+                            lambda e: print(f"Error subscribing to updates: {str(e)}"), key='subscribe')
+    
+    def on_subscribed(self, response):
+        if response.get("status") == "success" and "apps" in response:
+            self.apps = response["apps"]
+            self.update_app_buttons()
+            self.subscribed = True
+    
+    def process_pushes(self, dt):
+        """Apply status changes and operation results the server pushed since the last call."""
+        if not self.framed or not self.connected or self.network.busy('pushes'):
+            return
+        
+        self.network.submit(self.poll_server, self.apply_pushes, self.on_poll_failed, key='pushes')
+    
+    def poll_server(self):
+        """Read what has arrived, pinging a quiet server; returns the pushed events (network thread)."""
+        self.read_available()
+        silence = time.monotonic() - self.last_received
+        if silence > DEAD_AFTER:
+            raise ConnectionError(f"No reply from server for {int(silence)}s")
+        if silence > PING_AFTER and time.monotonic() - self.last_ping > PING_AFTER:
+            # Any reply will do, even "Unknown command" from an older server
+            self.last_ping = time.monotonic()
+            self.socket.sendall(encode_frame(self.codec.encode({"action": "ping"}), self.protocol_version))
+        self.pending_responses.pop(None, None)  # Replies to our pings
+        
+        events, self.pending_events = self.pending_events, []
+        return events
+    
+    def on_poll_failed(self, error):
+        if isinstance(error, OSError):
+            self.connection_lost(str(error))
+        else:
+            print(f"Error reading pushed updates: {str(error)}")
+    
+    def apply_pushes(self, events):
+        for event in events:
+            if event.get("event") == "ping":
+                self.network.submit(partial(self.send_command, {"action": "pong"}),
+                                    on_error=lambda e: print(f"Error answering ping: {str(e)}"))
+                continue
+            if event.get("event") == "operation_complete":
+                self.operation_complete(event)
+                continue
+            if event.get("event") != "app_status_changed":
+                continue
+            self.set_app_status(event.get("app_name"), event.get("app_status", "red"))
+    
+    def set_app_status(self, app_name, status):
+        for app in self.apps:
+            if app["name"] == app_name:
+                app["status"] = status
+                break
+        
+        if app_name in self.app_widgets:
+            self.app_widgets[app_name].update_status(status)
+    
+    def connection_lost(self, reason):
+        """Tear the dead connection down and, if we were logged in, keep trying to get back."""
+        resume = self.authenticated
+        self.subscribed = False  # Don't try to unsubscribe over a dead socket
+        if self.authenticated:
+            self.logout(None)
+        self.disconnect_from_server(None)
+        self.status_label.text = f"Connection lost: {reason}"
+        if resume:
+            self.reconnect_delay = 1
+            Clock.schedule_once(self.reconnect, self.reconnect_delay)
+    
+    def reconnect(self, dt):
+        """Connect and log in again; on_login() also refreshes and resubscribes, on_login_failed() retries."""
+        if self.authenticated:
+            return  # Already back, by hand
+        
+        self.reconnecting = True
+        self.authenticate(None)
+    
+    def operation_complete(self, event):
+        """Report the result of a start or stop the server ran in the background."""
+        app_name = event.get("app_name")
+        starting = event.get("action") == "start_app"
+        if event.get("status") == "success":
+            self.status_label.text = f"{'Started' if starting else 'Stopped'} {app_name}"
+        else:
+            self.status_label.text = f"Failed to {'start' if starting else 'stop'} {app_name}: {event.get('message', '')}"
+        if not self.subscribed:
+            self.request_app_status(app_name)
     
     def update_app_buttons(self):
         """Update the app buttons in the UI."""
@@ -334,99 +538,112 @@ class RemoteControlClient(App):
                 current_status = app.get("status", "red")
                 break
         
-        try:
-            if current_status == "green":
-                # App is running, stop it
-                request = {"action": "stop_app", "app_name": app_name}
-                self.send_command(request)
-                response = self.receive_response()
-                
-                if response.get("status") == "success":
-                    self.status_label.text = f"Stopped {app_name}"
-                    # Update app status after stop command
-                    self.request_app_status(app_name)
-                else:
-                    self.status_label.text = f"Failed to stop {app_name}: {response.get('message', '')}"
-            else:
-                # App is not running, start it
-                request = {"action": "start_app", "app_name": app_name}
-                self.send_command(request)
-                response = self.receive_response()
-                
-                if response.get("status") == "success":
-                    self.status_label.text = f"Started {app_name}"
-                    # Update app status after start command
-                    self.request_app_status(app_name)
-                else:
-                    self.status_label.text = f"Failed to start {app_name}: {response.get('message', '')}"
-        except Exception as e:
-            self.status_label.text = f"Error toggling app {app_name}: {str(e)}"
+        # App is running, stop it; otherwise start it
+        stopping = current_status == "green"
+        request = {"action": "stop_app" if stopping else "start_app", "app_name": app_name}
+        self.status_label.text = f"{'Stopping' if stopping else 'Starting'} {app_name}..."
+        self.network.submit(partial(self.request, request), partial(self.on_toggled, app_name, stopping),
+                            partial(self.on_toggle_failed, app_name))
+    
+    def on_toggled(self, app_name, stopping, response):
+        # "accepted" keeps the Starting/Stopping text; the result arrives as an operation_complete frame
+        if response.get("status") == "success":
+            self.status_label.text = f"{'Stopped' if stopping else 'Started'} {app_name}"
+            # Update app status after the command
+            self.request_app_status(app_name)
+        elif response.get("status") != "accepted":
+            self.status_label.text = f"Failed to {'stop' if stopping else 'start'} {app_name}: {response.get('message', '')}"
+    
+    def on_toggle_failed(self, app_name, error):
+        self.status_label.text = f"Error toggling app {app_name}: {str(error)}"
     
     def request_app_status(self, app_name):
         """Request the current status of an app."""
         if not self.authenticated:
             return
         
-        try:
-            request = {"action": "app_status", "app_name": app_name}
-            self.send_command(request)
-            response = self.receive_response()
-            
-            if response.get("status") == "success" and "app_status" in response:
-                status = response["app_status"]
-                # Update the app status in our apps list
-                for app in self.apps:
-                    if app["name"] == app_name:
-                        app["status"] = status
-                        break
-                
-                # Update the UI
-                if app_name in self.app_widgets:
-                    self.app_widgets[app_name].update_status(status)
-        except Exception as e:
-            print(f"Error getting app status: {str(e)}")
+        self.network.submit(partial(self.request, {"action": "app_status", "app_name": app_name}),
+                            partial(self.on_app_status, app_name),
+                            lambda e: print(f"Error getting app status: {str(e)}"))
+    
+    def on_app_status(self, app_name, response):
+        if response.get("status") == "success" and "app_status" in response:
+            self.set_app_status(app_name, response["app_status"])
     
     def update_app_statuses(self, dt):
         """Periodically update app statuses."""
-        if not self.authenticated or not self.connected:
+        if not self.authenticated or not self.connected or self.subscribed:
+            return
+        # A slow server still answering the last refresh doesn't need another one
+        if self.network.busy('get_apps'):
             return
         
-        try:
-            request = {"action": "get_apps"}
-            self.send_command(request)
-            response = self.receive_response()
+        self.network.submit(partial(self.request, {"action": "get_apps"}), self.on_app_statuses,
+                            lambda e: print(f"Error updating app statuses: {str(e)}"), key='get_apps')
+    
+    def on_app_statuses(self, response):
+        if response.get("status") == "success" and "apps" in response:
+            self.apps = response["apps"]
             
-            if response.get("status") == "success" and "apps" in response:
-                self.apps = response["apps"]
+            # Update UI for each app
+            for app in self.apps:
+                app_name = app["name"]
+                status = app.get("status", "red")
                 
-                # Update UI for each app
-                for app in self.apps:
-                    app_name = app["name"]
-                    status = app.get("status", "red")
-                    
-                    if app_name in self.app_widgets:
-                        self.app_widgets[app_name].update_status(status)
-        except Exception as e:
-            print(f"Error updating app statuses: {str(e)}")
+                if app_name in self.app_widgets:
+                    self.app_widgets[app_name].update_status(status)
+    
+    def request(self, command):
+        """Send a command and wait for its reply (network thread)."""
+        return self.receive_response(self.send_command(command))
     
     def send_command(self, command):
-        """Send a command to the server."""
+        """Send a command to the server; returns its request id (None in legacy mode)."""
         if not self.socket:
             raise Exception("Not connected to server")
         
-        data = json.dumps(command).encode('utf-8')
-        self.socket.send(data)
+        if not self.framed:
+            self.socket.sendall(json.dumps(command).encode('utf-8'))
+            return None
+        
+        self.next_request_id += 1
+        command = dict(command, id=self.next_request_id)
+        self.socket.sendall(encode_frame(self.codec.encode(command), self.protocol_version))
+        return self.next_request_id
     
-    def receive_response(self):
-        """Receive and parse response from the server."""
+    def receive_response(self, request_id=None):
+        """Receive the response to request_id, keeping any others that arrive first."""
         if not self.socket:
             raise Exception("Not connected to server")
         
-        data = self.socket.recv(4096)
+        while True:
+            if request_id in self.pending_responses:
+                return self.pending_responses.pop(request_id)
+            
+            self.read_messages(self.socket.recv(65536))
+    
+    def read_available(self):
+        """Read whatever has arrived without blocking."""
+        while select.select([self.socket], [], [], 0)[0]:
+            self.read_messages(self.socket.recv(65536))
+    
+    def read_messages(self, data):
+        """Decode received bytes into replies (by request id) and pushed events."""
         if not data:
-            raise Exception("Connection closed by server")
-        
-        return json.loads(data.decode('utf-8'))
+            raise ConnectionError("Connection closed by server")
+        self.last_received = time.monotonic()
+        
+        for payload in self.decoder.feed(data):
+            try:
+                if self.framed:
+                    payload = self.codec.decompress(payload)
+                response = self.codec.decode(payload)
+            except ProtocolError as e:
+                response = {"status": "error", "message": str(e)}
+            if "event" in response and "id" not in response:
+                self.pending_events.append(response)
+            else:
+                self.pending_responses[response.get("id")] = response
     
     def build_config(self, config):
         """Build the default configuration."""
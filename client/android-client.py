@@ -11,9 +11,11 @@ from kivy.clock import Clock
 from kivy.graphics import Color, Ellipse, Rectangle
 from kivy.utils import get_color_from_hex
 from kivy.storage.jsonstore import JsonStore
-import requests
 import json
 import os
+from functools import partial
+from http_session import ACTION_TIMEOUT, POOL_SIZE, TIMEOUT, make_session
+from request_executor import RequestExecutor
 
 # Configuration
 CONFIG_FILE = 'remote_control_config.json'
@@ -66,6 +68,7 @@ class ProfileButton(BoxLayout):
         self.profile_id = profile_id
         self.profile_data = profile_data
         self.controller = controller
+        self.busy = False  # A start or stop is waiting for the server
 
         # Status indicator
         self.status_indicator = StatusIndicator()
@@ -93,18 +96,32 @@ class ProfileButton(BoxLayout):
         self.update_ui()
 
     def start_exe(self, instance):
-        response = self.controller.start_profile(self.profile_id)
-        if response and response.status_code == 200:
-            data = response.json()
-            self.profile_data['status'] = data['status']
-            self.update_ui()
+        self.run_action(self.controller.start_profile)
 
     def stop_exe(self, instance):
-        response = self.controller.stop_profile(self.profile_id)
-        if response and response.status_code == 200:
-            data = response.json()
-            self.profile_data['status'] = data['status']
-            self.update_ui()
+        self.run_action(self.controller.stop_profile)
+
+    def run_action(self, action):
+        self.busy = True
+        self.update_ui()
+        self.controller.network.submit(partial(self.request_action, action), self.action_done, self.action_failed)
+
+    def request_action(self, action):
+        """Runs on a network thread; returns the new status, or None if the server refused."""
+        response = action(self.profile_id)
+        if response is not None and response.status_code == 200:
+            return response.json()['status']
+        return None
+
+    def action_done(self, status):
+        self.busy = False
+        if status is not None:
+            self.profile_data['status'] = status
+        self.update_ui()
+
+    def action_failed(self, error):
+        self.busy = False
+        self.update_ui()
 
     def update_status(self, status):
         self.profile_data['status'] = status
@@ -116,7 +133,10 @@ class ProfileButton(BoxLayout):
         self.status_label.text = status_text
 
         # Update button states
-        if self.profile_data['status'] == 'running':
+        if self.busy:
+            self.start_button.disabled = True
+            self.stop_button.disabled = True
+        elif self.profile_data['status'] == 'running':
             self.start_button.disabled = True
             self.stop_button.disabled = False
         elif self.profile_data['status'] == 'stopped':
@@ -248,19 +268,30 @@ class LoginScreen(BoxLayout):
             self.status_label.text = 'Please enter username and password'
             return
 
-        try:
-            response = requests.post(f"{self.app.server_url}/api/login",
-                                     json={"username": username, "password": password},
-                                     timeout=5)
-
-            if response.status_code == 200:
-                data = response.json()
-                self.app.auth_token = data['token']
-                self.app.show_main_screen()
-            else:
-                self.status_label.text = 'Login failed: ' + response.json().get('error', 'Unknown error')
-        except Exception as e:
-            self.status_label.text = f'Connection error: {str(e)}'
+        self.login_button.disabled = True
+        self.status_label.text = 'Logging in...'
+        self.app.network.submit(partial(self.request_login, username, password),
+                                self.login_done, self.login_failed, key='login')
+
+    def request_login(self, username, password):
+        """Runs on a network thread; returns (status code, reply)."""
+        response = self.app.session.post(f"{self.app.server_url}/api/login",
+                                         json={"username": username, "password": password},
+                                         timeout=TIMEOUT)
+        return response.status_code, response.json()
+
+    def login_done(self, result):
+        status_code, data = result
+        self.login_button.disabled = False
+        if status_code == 200:
+            self.app.auth_token = data['token']
+            self.app.show_main_screen()
+        else:
+            self.status_label.text = 'Login failed: ' + data.get('error', 'Unknown error')
+
+    def login_failed(self, error):
+        self.login_button.disabled = False
+        self.status_label.text = f'Connection error: {str(error)}'
 
 
 class AddProfilePopup(Popup):
@@ -377,7 +408,7 @@ class MainScreen(BoxLayout):
         self.profile_buttons = {}
 
         # Schedule periodic refresh
-        Clock.schedule_interval(lambda dt: self.refresh_profiles(None), 10)
+        self.refresh_event = Clock.schedule_interval(self.poll_profiles, 10)
 
     def update_server_label(self):
         self.server_label.text = f'Server: {self.app.server_url}'
@@ -387,17 +418,30 @@ class MainScreen(BoxLayout):
         popup.bind(on_dismiss=lambda instance: self.update_server_label())
         popup.open()
 
+    def poll_profiles(self, dt):
+        # A slow server still answering the last refresh doesn't need another one
+        if not self.app.network.busy('profiles'):
+            self.refresh_profiles(None)
+
     def refresh_profiles(self, instance):
-        try:
-            response = self.app.get_profiles()
-            if response and response.status_code == 200:
-                profiles = response.json()
-                self.update_profiles(profiles)
-                self.status_bar.text = 'Profiles refreshed'
-            else:
-                self.status_bar.text = 'Failed to refresh profiles'
-        except Exception as e:
-            self.status_bar.text = f'Error: {str(e)}'
+        self.app.network.submit(self.fetch_profiles, self.show_profiles, self.show_error, key='profiles')
+
+    def fetch_profiles(self):
+        """Runs on a network thread; returns the profiles, or None if the server refused."""
+        response = self.app.get_profiles()
+        if response is not None and response.status_code == 200:
+            return response.json()
+        return None
+
+    def show_profiles(self, profiles):
+        if profiles is None:
+            self.status_bar.text = 'Failed to refresh profiles'
+            return
+        self.update_profiles(profiles)
+        self.status_bar.text = 'Profiles refreshed'
+
+    def show_error(self, error):
+        self.status_bar.text = f'Error: {str(error)}'
 
     def update_profiles(self, profiles):
         # First update existing buttons
@@ -425,21 +469,18 @@ class MainScreen(BoxLayout):
         popup.open()
 
     def add_profile(self, profile_data):
-        try:
-            response = self.app.add_profile(profile_data)
-            if response and response.status_code == 201:
-                self.status_bar.text = 'Profile added'
-                self.refresh_profiles(None)
-            else:
-                self.status_bar.text = 'Failed to add profile'
-        except Exception as e:
-            self.status_bar.text = f'Error: {str(e)}'
+        self.app.network.submit(partial(self.app.add_profile, profile_data), self.profile_added, self.show_error)
+
+    def profile_added(self, response):
+        if response is not None and response.status_code == 201:
+            self.status_bar.text = 'Profile added'
+            self.refresh_profiles(None)
+        else:
+            self.status_bar.text = 'Failed to add profile'
 
     def logout(self, instance):
-        try:
-            self.app.logout()
-        except:
-            pass
+        self.refresh_event.cancel()
+        self.app.logout()
         self.app.show_login_screen()
 
 
@@ -451,6 +492,10 @@ class RemoteControlApp(App):
         self.host_port = DEFAULT_PORT
         self.server_url = f"http://{self.host_ip}:{self.host_port}"
         self.auth_token = None
+        # Every request runs off the UI thread, one worker per pooled connection
+        self.network = RequestExecutor(workers=POOL_SIZE)
+        # One pooled keep-alive session for every call (see http_session.py)
+        self.session = make_session()
         self.load_config()
 
     def build(self):
@@ -458,6 +503,9 @@ class RemoteControlApp(App):
         self.show_login_screen()
         return self.root
 
+    def on_stop(self):
+        self.network.shutdown()
+
     def load_config(self):
         try:
             if os.path.exists(CONFIG_FILE):
@@ -472,6 +520,8 @@ class RemoteControlApp(App):
 
     def update_server_url(self):
         self.server_url = f"http://{self.host_ip}:{self.host_port}"
+        # Pooled connections to the previous server are no use any more
+        self.session.close()
 
     def save_config(self):
         try:
@@ -496,44 +546,43 @@ class RemoteControlApp(App):
         if not self.auth_token:
             return None
 
-        return requests.get(f"{self.server_url}/api/profiles",
-                            headers={"Authorization": self.auth_token},
-                            timeout=5)
+        return self.session.get(f"{self.server_url}/api/profiles",
+                                headers={"Authorization": self.auth_token},
+                                timeout=TIMEOUT)
 
     def add_profile(self, profile_data):
         if not self.auth_token:
             return None
 
-        return requests.post(f"{self.server_url}/api/profiles",
-                             json=profile_data,
-                             headers={"Authorization": self.auth_token},
-                             timeout=5)
+        return self.session.post(f"{self.server_url}/api/profiles",
+                                 json=profile_data,
+                                 headers={"Authorization": self.auth_token},
+                                 timeout=TIMEOUT)
 
     def start_profile(self, profile_id):
         if not self.auth_token:
             return None
 
-        return requests.post(f"{self.server_url}/api/profiles/{profile_id}/start",
-                             headers={"Authorization": self.auth_token},
-                             timeout=5)
+        return self.session.post(f"{self.server_url}/api/profiles/{profile_id}/start",
+                                 headers={"Authorization": self.auth_token},
+                                 timeout=ACTION_TIMEOUT)
 
     def stop_profile(self, profile_id):
         if not self.auth_token:
             return None
 
-        return requests.post(f"{self.server_url}/api/profiles/{profile_id}/stop",
-                             headers={"Authorization": self.auth_token},
-                             timeout=5)
+        return self.session.post(f"{self.server_url}/api/profiles/{profile_id}/stop",
+                                 headers={"Authorization": self.auth_token},
+                                 timeout=ACTION_TIMEOUT)
 
     def logout(self):
-        if not self.auth_token:
-            return None
-
-        response = requests.post(f"{self.server_url}/api/logout",
-                                 headers={"Authorization": self.auth_token},
-                                 timeout=5)
-        self.auth_token = None
-        return response
+        """Forget the session at once and tell the server in the background."""
+        token, self.auth_token = self.auth_token, None
+        self.network.cancel()
+        if token:
+            self.network.submit(partial(self.session.post, f"{self.server_url}/api/logout",
+                                        headers={"Authorization": token},
+                                        timeout=TIMEOUT))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,42 @@
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Seconds to establish a connection, and to wait for a response once it is
+# sent. Mobile links are slow to connect but a live server answers quickly;
+# start/stop waits for the process to come up or go down, so it reads longer.
+CONNECT_TIMEOUT = 4
+READ_TIMEOUT = 10
+TIMEOUT = (CONNECT_TIMEOUT, READ_TIMEOUT)
+ACTION_TIMEOUT = (CONNECT_TIMEOUT, 30)
+
+# Retries for idempotent requests (GET), with exponential backoff: 0.5s, 1s, 2s.
+# Busy (429) and unavailable (503) responses wait for their Retry-After instead.
+RETRIES = 3
+RETRY_BACKOFF = 0.5
+RETRY_STATUSES = (429, 502, 503, 504)
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS'])
+
+# Idle connections kept per host; the app talks to one server at a time
+POOL_SIZE = 4
+
+
+def make_session(retries=RETRIES, backoff=RETRY_BACKOFF, pool_size=POOL_SIZE):
+    """A requests.Session that keeps connections to the server open between calls.
+
+    Every call after the first reuses a pooled keep-alive connection instead
+    of paying for a new TCP handshake. Idempotent requests are retried on
+    connection failures and on RETRY_STATUSES; other requests are retried
+    only when they could not connect, so the request never reached the
+    server. Responses are requested gzip-compressed and decompressed by
+    requests transparently.
+    """
+    retry = Retry(total=retries, connect=retries, read=retries, status=retries,
+                  backoff_factor=backoff, status_forcelist=RETRY_STATUSES,
+                  allowed_methods=IDEMPOTENT_METHODS, raise_on_status=False)
+    adapter = HTTPAdapter(max_retries=retry, pool_connections=1, pool_maxsize=pool_size)
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers['Accept-Encoding'] = 'gzip'
+    return session
@@ -0,0 +1,74 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from kivy.clock import Clock
+
+
+class RequestExecutor:
+    """Runs blocking network calls on worker threads and hands the results back on the Kivy main thread.
+
+    submit() returns at once. The call runs on a worker, then on_result(result)
+    or on_error(exception) is scheduled with Clock.schedule_once, so callbacks
+    may touch widgets. Calls sharing a key never overlap: while one is in
+    flight, further submits with that key coalesce into a single follow-up
+    (the newest) that runs when it returns. cancel() drops queued follow-ups
+    and the results of everything already running; a blocking request cannot
+    be interrupted, but nothing it returns reaches the UI.
+    """
+
+    def __init__(self, workers=2):
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='network')
+        self.lock = threading.Lock()
+        self.generation = 0  # Bumped by cancel(); results from older generations are stale
+        self.in_flight = set()  # Keys with a call running
+        self.queued = {}  # {key: (call, on_result, on_error)} to run when the in-flight call returns
+
+    def submit(self, call, on_result=None, on_error=None, key=None):
+        with self.lock:
+            if key is not None:
+                if key in self.in_flight:
+                    self.queued[key] = (call, on_result, on_error)
+                    return
+                self.in_flight.add(key)
+            generation = self.generation
+        self.pool.submit(self._run, call, on_result, on_error, key, generation)
+
+    def busy(self, key):
+        """True while a call with this key is running or queued."""
+        with self.lock:
+            return key in self.in_flight
+
+    def cancel(self):
+        with self.lock:
+            self.generation += 1
+            self.queued.clear()
+
+    def shutdown(self):
+        self.cancel()
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, call, on_result, on_error, key, generation):
+        while True:
+            try:
+                callback, value = on_result, call()
+            except Exception as e:
+                callback, value = on_error, e
+            if callback is not None:
+                Clock.schedule_once(partial(self._deliver, generation, callback, value), 0)
+
+            if key is None:
+                return
+            # Run the coalesced follow-up on this worker, so calls with one key stay in order
+            with self.lock:
+                follow_up = self.queued.pop(key, None)
+                if follow_up is None:
+                    self.in_flight.discard(key)
+                    return
+                generation = self.generation
+            call, on_result, on_error = follow_up
+
+    # Main thread
+    def _deliver(self, generation, callback, value, dt):
+        if generation == self.generation:
+            callback(value)
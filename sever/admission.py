@@ -0,0 +1,131 @@
+import math
+import threading
+import time
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, up to `burst` saved."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self, now=None):
+        """Take one token; returns (allowed, seconds until one is available)."""
+        now = time.monotonic() if now is None else now
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True, 0
+        return False, (1 - self.tokens) / self.rate
+
+
+class AdmissionController:
+    """Limits expensive operations globally and per client.
+
+    Each client (session token) has its own token bucket. Admitted requests
+    then need one of `max_concurrent` global slots; when they are all busy a
+    request queues for at most `queue_timeout` seconds, and no more than
+    `max_queued` requests may wait at once. Rejections carry a Retry-After
+    hint in seconds.
+    """
+
+    def __init__(self, max_concurrent=4, queue_timeout=2.0, max_queued=32,
+                 rate=5.0, burst=10, idle_bucket_ttl=600):
+        self.max_concurrent = max_concurrent
+        self.queue_timeout = queue_timeout
+        self.max_queued = max_queued
+        self.rate = rate
+        self.burst = burst
+        self.idle_bucket_ttl = idle_bucket_ttl
+        self.slots = threading.BoundedSemaphore(max_concurrent)
+        self.lock = threading.Lock()
+        self.buckets = {}
+        self.queued = 0
+        self.in_flight = 0
+        self.rejected = 0
+        self.last_prune = time.monotonic()
+
+    def _take_token(self, client):
+        now = time.monotonic()
+        with self.lock:
+            bucket = self.buckets.get(client)
+            if bucket is None:
+                bucket = self.buckets[client] = TokenBucket(self.rate, self.burst)
+            allowed, wait = bucket.take(now)
+            if now - self.last_prune > self.idle_bucket_ttl:
+                self._prune(now)
+        return allowed, wait
+
+    def _prune(self, now):
+        # Full buckets of idle clients carry no state worth keeping
+        idle = [client for client, bucket in self.buckets.items()
+                if now - bucket.updated > self.idle_bucket_ttl]
+        for client in idle:
+            del self.buckets[client]
+        self.last_prune = now
+
+    def acquire(self, client):
+        """Try to admit a request; returns (admitted, retry_after_seconds)."""
+        allowed, wait = self._take_token(client)
+        if not allowed:
+            with self.lock:
+                self.rejected += 1
+            return False, max(1, math.ceil(wait))
+
+        if self.slots.acquire(blocking=False):
+            with self.lock:
+                self.in_flight += 1
+            return True, 0
+
+        with self.lock:
+            if self.queued >= self.max_queued:
+                self.rejected += 1
+                return False, max(1, math.ceil(self.queue_timeout))
+            self.queued += 1
+        admitted = False
+        try:
+            admitted = self.slots.acquire(timeout=self.queue_timeout)
+        finally:
+            with self.lock:
+                self.queued -= 1
+                if admitted:
+                    self.in_flight += 1
+                else:
+                    self.rejected += 1
+        return admitted, 0 if admitted else max(1, math.ceil(self.queue_timeout))
+
+    def try_acquire(self, client):
+        """Admit only if a slot is free right now; never queues.
+
+        For read paths that can fall back to cached data instead of waiting.
+        """
+        allowed, wait = self._take_token(client)
+        if not allowed:
+            with self.lock:
+                self.rejected += 1
+            return False, max(1, math.ceil(wait))
+        if self.slots.acquire(blocking=False):
+            with self.lock:
+                self.in_flight += 1
+            return True, 0
+        with self.lock:
+            self.rejected += 1
+        return False, 1
+
+    def release(self):
+        with self.lock:
+            self.in_flight -= 1
+        self.slots.release()
+
+    def stats(self):
+        with self.lock:
+            return {
+                'in_flight': self.in_flight,
+                'queued': self.queued,
+                'rejected': self.rejected,
+                'clients': len(self.buckets)
+            }
@@ -0,0 +1,438 @@
+import asyncio
+import io
+import json
+import string
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, unquote
+
+from werkzeug.exceptions import BadRequest, ClientDisconnected, RequestEntityTooLarge
+
+MAX_HEADER_BYTES = 64 * 1024
+MAX_BODY_BYTES = 16 * 1024 * 1024
+KEEPALIVE_TIMEOUT = 75
+SSE_HEARTBEAT = 15
+CHUNK_BATCH_BYTES = 64 * 1024
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class RequestBody(io.RawIOBase):
+    """wsgi.input that reads the request body off the connection as the app consumes it.
+
+    The app runs on a worker thread; every read hands the event loop the job
+    of fetching the next piece of the body (Content-Length bytes, or chunked
+    transfer coding), so a large upload such as an NDJSON import is handled
+    line by line instead of being held in memory first. Errors surface in
+    the app as werkzeug HTTP exceptions, which Flask turns into responses.
+    """
+
+    def __init__(self, reader, loop, length=0, chunked=False):
+        self.reader = reader
+        self.loop = loop
+        self.chunked = chunked
+        self.remaining = 0 if chunked else length  # Left of the body, or of the current chunk
+        self.received = 0
+        self.done = not chunked and not length
+        self.failed = False  # Reading stopped short; the rest of the body is still on the connection
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self.done:
+            return 0
+        data = asyncio.run_coroutine_threadsafe(self._read(len(buffer)), self.loop).result()
+        buffer[:len(data)] = data
+        return len(data)
+
+    async def _read(self, size):
+        try:
+            return await asyncio.wait_for(self._read_piece(size), KEEPALIVE_TIMEOUT)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            self.done = self.failed = True
+            raise ClientDisconnected()
+
+    async def _read_piece(self, size):
+        if self.chunked and not self.remaining:
+            self.remaining = await self._next_chunk_size()
+            if not self.remaining:
+                self.done = True
+                return b''
+        data = await self.reader.read(min(size, self.remaining))
+        if not data:
+            raise ConnectionError("Connection closed mid-body")
+        self.remaining -= len(data)
+        self.received += len(data)
+        if not self.remaining:
+            if self.chunked:
+                await self.reader.readexactly(2)
+            else:
+                self.done = True
+        return data
+
+    async def _next_chunk_size(self):
+        try:
+            size_line = await self.reader.readuntil(b'\r\n')
+        except asyncio.LimitOverrunError:
+            self.done = self.failed = True
+            raise BadRequest("Chunk size line too long")
+        size = size_line.split(b';', 1)[0].strip().decode('latin-1')
+        if not size or not all(c in string.hexdigits for c in size):
+            self.done = self.failed = True
+            raise BadRequest("Invalid chunk size")
+        size = int(size, 16)
+        # Checked before any of the chunk is read, however large it claims to be
+        if self.received + size > MAX_BODY_BYTES:
+            self.done = self.failed = True
+            raise RequestEntityTooLarge()
+        if not size:
+            # Skip optional trailers
+            while (await self.reader.readuntil(b'\r\n')) != b'\r\n':
+                pass
+        return size
+
+
+class AsyncHTTPServer:
+    """asyncio front-end for the Flask API.
+
+    Long-poll (/api/events) and streaming (/api/events/stream) subscribers
+    are served directly on the event loop, so an idle subscriber costs one
+    socket and a suspended coroutine instead of a thread. Every other route
+    is dispatched to the Flask WSGI app on a bounded thread pool, which is
+    also where the blocking process scans and launches happen.
+    """
+
+    def __init__(self, wsgi_app, check_session, status_feed, host='0.0.0.0', port=5000,
+                 workers=16, max_poll_timeout=60, backlog=1024):
+        self.wsgi_app = wsgi_app
+        self.check_session = check_session
+        self.status_feed = status_feed
+        self.host = host
+        self.port = port
+        self.backlog = backlog
+        self.max_poll_timeout = max_poll_timeout
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='api-worker')
+        self.loop = None
+        self.server = None
+        self.waiters = set()
+        self.connection_tasks = set()
+        self.connections = 0
+
+    # Called from whatever thread published the status change
+    def _on_status_event(self, event):
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self._wake_waiters)
+
+    def _wake_waiters(self):
+        waiters, self.waiters = self.waiters, set()
+        for future in waiters:
+            if not future.done():
+                future.set_result(None)
+
+    async def _wait_for_event(self, since, timeout):
+        version, events, complete = self.status_feed.events_since(since)
+        if events or timeout <= 0:
+            return version, events, complete
+        future = self.loop.create_future()
+        self.waiters.add(future)
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self.waiters.discard(future)
+        return self.status_feed.events_since(since)
+
+    async def start(self):
+        self.loop = asyncio.get_running_loop()
+        self.status_feed.subscribe(self._on_status_event)
+        self.server = await asyncio.start_server(self._handle_connection, self.host, self.port,
+                                                 backlog=self.backlog, limit=MAX_HEADER_BYTES)
+        if not self.port:
+            self.port = self.server.sockets[0].getsockname()[1]
+        return self.server
+
+    async def serve_forever(self):
+        server = await self.start()
+        print(f"Async server started on {self.host}:{self.port}")
+        async with server:
+            await server.serve_forever()
+
+    async def stop(self):
+        self.status_feed.unsubscribe(self._on_status_event)
+        if self.server is not None:
+            self.server.close()
+        # Idle keep-alive, long-poll and stream connections never finish by themselves
+        tasks = list(self.connection_tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self.server is not None:
+            await self.server.wait_closed()
+        self.executor.shutdown(wait=False)
+
+    def run(self):
+        try:
+            asyncio.run(self.serve_forever())
+        except KeyboardInterrupt:
+            print("Server is shutting down...")
+
+    async def _handle_connection(self, reader, writer):
+        self.connections += 1
+        task = asyncio.current_task()
+        self.connection_tasks.add(task)
+        peer = writer.get_extra_info('peername')
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(self._read_request(reader), KEEPALIVE_TIMEOUT)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except HTTPError as e:
+                    await self._send_json(writer, e.status, {"error": e.message}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+
+                keep_alive = await self._dispatch(request, peer, writer)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.CancelledError):
+            # Cancelled by stop(); ending normally keeps asyncio's stream callback quiet
+            pass
+        except Exception as e:
+            print(f"Error handling connection {peer}: {e}")
+        finally:
+            self.connections -= 1
+            self.connection_tasks.discard(task)
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except (Exception, asyncio.CancelledError):
+                pass
+
+    async def _read_request(self, reader):
+        try:
+            head = await reader.readuntil(b'\r\n\r\n')
+        except asyncio.IncompleteReadError as e:
+            if not e.partial:
+                return None
+            raise
+        except asyncio.LimitOverrunError:
+            raise HTTPError(431, "Request headers too large")
+
+        lines = head.decode('latin-1').split('\r\n')
+        try:
+            method, target, version = lines[0].split(' ', 2)
+        except ValueError:
+            raise HTTPError(400, "Malformed request line")
+
+        headers = []
+        for line in lines[1:]:
+            if not line:
+                continue
+            name, _, value = line.partition(':')
+            headers.append((name.strip(), value.strip()))
+        header_map = {name.lower(): value for name, value in headers}
+
+        # The body is left on the connection for the handler to stream
+        if header_map.get('transfer-encoding', '').lower() == 'chunked':
+            body = RequestBody(reader, self.loop, chunked=True)
+        else:
+            length = header_map.get('content-length', '').strip() or '0'
+            if not (length.isascii() and length.isdigit()):
+                raise HTTPError(400, "Invalid Content-Length")
+            length = int(length)
+            if length > MAX_BODY_BYTES:
+                raise HTTPError(413, "Request body too large")
+            body = RequestBody(reader, self.loop, length)
+
+        path, _, query = target.partition('?')
+        keep_alive = header_map.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+        return {
+            'method': method.upper(),
+            'path': path,
+            'query': query,
+            'version': version,
+            'headers': headers,
+            'header_map': header_map,
+            'body': body,
+            'keep_alive': keep_alive
+        }
+
+    async def _dispatch(self, request, peer, writer):
+        if not request['body'].done and request['path'] in ('/api/events', '/api/events/stream'):
+            # Event requests have no use for a body; rather than read it, close after replying
+            request['keep_alive'] = False
+        if request['method'] == 'GET' and request['path'] == '/api/events':
+            return await self._handle_long_poll(request, writer)
+        if request['method'] == 'GET' and request['path'] == '/api/events/stream':
+            return await self._handle_stream(request, writer)
+        return await self._handle_wsgi(request, peer, writer)
+
+    def _authorize(self, request):
+        return self.check_session(request['header_map'].get('authorization'))
+
+    async def _handle_long_poll(self, request, writer):
+        error = self._authorize(request)
+        if error:
+            await self._send_json(writer, 401, {"error": error}, request['keep_alive'])
+            return request['keep_alive']
+
+        query = parse_qs(request['query'])
+        try:
+            since = int(query.get('since', ['0'])[0])
+            timeout = min(float(query.get('timeout', ['25'])[0]), self.max_poll_timeout)
+        except ValueError:
+            await self._send_json(writer, 400, {"error": "Invalid since or timeout"}, request['keep_alive'])
+            return request['keep_alive']
+
+        version, events, complete = await self._wait_for_event(since, timeout)
+        await self._send_json(writer, 200, {"version": version, "events": events, "complete": complete},
+                              request['keep_alive'])
+        return request['keep_alive']
+
+    async def _handle_stream(self, request, writer):
+        error = self._authorize(request)
+        if error:
+            await self._send_json(writer, 401, {"error": error}, False)
+            return False
+
+        query = parse_qs(request['query'])
+        since = request['header_map'].get('last-event-id') or query.get('since', ['0'])[0]
+        try:
+            since = int(since)
+        except ValueError:
+            since = 0
+
+        writer.write(b'HTTP/1.1 200 OK\r\n'
+                     b'Content-Type: text/event-stream\r\n'
+                     b'Cache-Control: no-cache\r\n'
+                     b'Connection: close\r\n\r\n')
+        await writer.drain()
+        while True:
+            version, events, complete = await self._wait_for_event(since, SSE_HEARTBEAT)
+            if events:
+                for event in events:
+                    writer.write(f"id: {event['version']}\ndata: {json.dumps(event)}\n\n".encode())
+                since = version
+            else:
+                writer.write(b': keep-alive\n\n')
+            await writer.drain()
+
+    def _build_environ(self, request, peer):
+        environ = {
+            'REQUEST_METHOD': request['method'],
+            'SCRIPT_NAME': '',
+            'PATH_INFO': unquote(request['path'], 'latin-1'),
+            'QUERY_STRING': request['query'],
+            'SERVER_NAME': self.host,
+            'SERVER_PORT': str(self.port),
+            'SERVER_PROTOCOL': request['version'],
+            'REMOTE_ADDR': peer[0] if peer else '',
+            'REMOTE_PORT': str(peer[1]) if peer else '',
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': 'http',
+            'wsgi.input': io.BufferedReader(request['body'], CHUNK_BATCH_BYTES),
+            # Reads end with the body (chunked or not), so apps may read to EOF
+            'wsgi.input_terminated': True,
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        for name, value in request['headers']:
+            key = name.upper().replace('-', '_')
+            if key == 'CONTENT_TYPE':
+                environ['CONTENT_TYPE'] = value
+            elif key == 'CONTENT_LENGTH':
+                if not request['body'].chunked:
+                    environ['CONTENT_LENGTH'] = value.strip()
+            elif key != 'TRANSFER_ENCODING':
+                key = 'HTTP_' + key
+                environ[key] = f"{environ[key]},{value}" if key in environ else value
+        return environ
+
+    # Runs on a worker thread: call the app and pull the first batch of output
+    def _call_wsgi(self, environ):
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = status
+            response['headers'] = headers
+
+        result = self.wsgi_app(environ, start_response)
+        iterator = iter(result)
+        chunks, done = self._read_batch(iterator)
+        if done and hasattr(result, 'close'):
+            result.close()
+        return response, result, iterator, chunks, done
+
+    @staticmethod
+    def _read_batch(iterator):
+        chunks = []
+        size = 0
+        for chunk in iterator:
+            if chunk:
+                chunks.append(chunk)
+                size += len(chunk)
+            if size >= CHUNK_BATCH_BYTES:
+                return chunks, False
+        return chunks, True
+
+    async def _handle_wsgi(self, request, peer, writer):
+        environ = self._build_environ(request, peer)
+        try:
+            response, result, iterator, chunks, done = await self.loop.run_in_executor(
+                self.executor, self._call_wsgi, environ)
+        except Exception as e:
+            print(f"Error in request handler: {e}")
+            await self._send_json(writer, 500, {"error": "Internal server error"}, False)
+            return False
+
+        # A body the app left unread would be taken for the next request
+        keep_alive = request['keep_alive'] and request['body'].done and not request['body'].failed
+        headers = [(k, v) for k, v in response['headers'] if k.lower() != 'connection']
+        has_length = any(k.lower() == 'content-length' for k, v in headers)
+        chunked = not has_length and not done and request['version'] == 'HTTP/1.1'
+        if not has_length and done:
+            headers.append(('Content-Length', str(sum(len(c) for c in chunks))))
+        elif chunked:
+            headers.append(('Transfer-Encoding', 'chunked'))
+        elif not has_length:
+            keep_alive = False
+        headers.append(('Connection', 'keep-alive' if keep_alive else 'close'))
+
+        head = f"HTTP/1.1 {response['status']}\r\n" + ''.join(f"{k}: {v}\r\n" for k, v in headers) + "\r\n"
+        writer.write(head.encode('latin-1'))
+
+        try:
+            while True:
+                for chunk in chunks:
+                    writer.write(b'%x\r\n%s\r\n' % (len(chunk), chunk) if chunked else chunk)
+                await writer.drain()
+                if done:
+                    break
+                chunks, done = await self.loop.run_in_executor(self.executor, self._read_batch, iterator)
+            if chunked:
+                writer.write(b'0\r\n\r\n')
+                await writer.drain()
+        finally:
+            # Completed bodies were already closed on the worker thread
+            if not done and hasattr(result, 'close'):
+                await self.loop.run_in_executor(self.executor, result.close)
+        return keep_alive
+
+    async def _send_json(self, writer, status, payload, keep_alive):
+        body = json.dumps(payload).encode()
+        reason = HTTPStatus(status).phrase
+        writer.write((f"HTTP/1.1 {status} {reason}\r\n"
+                      f"Content-Type: application/json\r\n"
+                      f"Content-Length: {len(body)}\r\n"
+                      f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n").encode() + body)
+        await writer.drain()
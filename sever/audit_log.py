@@ -0,0 +1,209 @@
+import bisect
+import json
+import os
+import queue
+import threading
+import time
+
+SEGMENT_PREFIX = 'audit-'
+SEGMENT_SUFFIX = '.jsonl'
+INDEX_SUFFIX = '.idx'
+
+
+class Segment:
+    """One append-only JSONL file plus a sparse (timestamp, offset) index."""
+
+    def __init__(self, path, first_ts):
+        self.path = path
+        self.first_ts = first_ts
+        self.index_ts = []
+        self.index_offsets = []
+
+    @property
+    def index_path(self):
+        return self.path[:-len(SEGMENT_SUFFIX)] + INDEX_SUFFIX
+
+    def add_index_point(self, ts, offset):
+        self.index_ts.append(ts)
+        self.index_offsets.append(offset)
+
+    def save_index(self):
+        with open(self.index_path, 'w') as f:
+            json.dump(list(zip(self.index_ts, self.index_offsets)), f)
+
+    def load_index(self):
+        try:
+            with open(self.index_path, 'r') as f:
+                points = json.load(f)
+        except (OSError, ValueError):
+            return False
+        self.index_ts = [p[0] for p in points]
+        self.index_offsets = [p[1] for p in points]
+        return True
+
+    def rebuild_index(self, every):
+        """Rescan the file for index points; returns the number of records."""
+        self.index_ts = []
+        self.index_offsets = []
+        offset = 0
+        count = 0
+        with open(self.path, 'rb') as f:
+            for count, line in enumerate(f, 1):
+                if (count - 1) % every == 0:
+                    try:
+                        self.add_index_point(json.loads(line)['ts'], offset)
+                    except (ValueError, KeyError):
+                        pass
+                offset += len(line)
+        return count
+
+
+class AuditLog:
+    """Append-only audit trail written by a background group-commit thread.
+
+    record() only enqueues, so callers never wait on the disk. The writer
+    thread drains everything queued (up to max_batch records or flush_interval
+    seconds), appends it to the active segment and issues a single fsync for
+    the whole batch. Segments rotate at max_segment_bytes and are named after
+    their first timestamp, which together with a sparse per-segment offset
+    index lets query() seek straight to the records for a `since` time.
+    """
+
+    def __init__(self, directory='audit', max_segment_bytes=8 * 1024 * 1024,
+                 flush_interval=0.05, max_batch=1000, index_every=256):
+        self.directory = directory
+        self.max_segment_bytes = max_segment_bytes
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.index_every = index_every
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.segments = []
+        self.active = None
+        self.active_file = None
+        self.active_count = 0
+        self.thread = None
+
+    def open(self):
+        os.makedirs(self.directory, exist_ok=True)
+        names = sorted(n for n in os.listdir(self.directory)
+                       if n.startswith(SEGMENT_PREFIX) and n.endswith(SEGMENT_SUFFIX))
+        for name in names:
+            try:
+                first_ts = int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]) / 1000
+            except ValueError:
+                continue
+            segment = Segment(os.path.join(self.directory, name), first_ts)
+            if not segment.load_index():
+                segment.rebuild_index(self.index_every)
+            self.segments.append(segment)
+
+        # Keep appending to the newest segment if it still has room
+        if self.segments and os.path.getsize(self.segments[-1].path) < self.max_segment_bytes:
+            self.active = self.segments[-1]
+            self.active_count = self.active.rebuild_index(self.index_every)
+            self.active_file = open(self.active.path, 'ab')
+
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def record(self, event, user=None, **details):
+        # Nothing is kept until open() has started the writer
+        if self.thread is None:
+            return
+        entry = {'ts': time.time(), 'event': event, 'user': user}
+        entry.update(details)
+        self.queue.put(entry)
+
+    def flush(self):
+        """Block until everything recorded so far is on disk."""
+        if self.thread is not None:
+            self.queue.join()
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._commit(batch)
+            except OSError as e:
+                print(f"Error writing audit log: {e}")
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def _commit(self, batch):
+        with self.lock:
+            for entry in batch:
+                if self.active is None:
+                    self._new_segment(entry['ts'])
+                line = (json.dumps(entry, default=str) + '\n').encode('utf-8')
+                if self.active_count % self.index_every == 0:
+                    self.active.add_index_point(entry['ts'], self.active_file.tell())
+                self.active_file.write(line)
+                self.active_count += 1
+                if self.active_file.tell() >= self.max_segment_bytes:
+                    self._close_active()
+            # Group commit: one fsync covers the whole batch
+            if self.active_file is not None:
+                self.active_file.flush()
+                os.fsync(self.active_file.fileno())
+
+    def _new_segment(self, first_ts):
+        # Names must stay unique and ordered even if a segment fills within one millisecond
+        stamp = int(first_ts * 1000)
+        if self.segments:
+            stamp = max(stamp, int(round(self.segments[-1].first_ts * 1000)) + 1)
+        path = os.path.join(self.directory, f'{SEGMENT_PREFIX}{stamp:015d}{SEGMENT_SUFFIX}')
+        self.active = Segment(path, stamp / 1000)
+        self.active_file = open(path, 'ab')
+        self.active_count = 0
+        self.segments.append(self.active)
+
+    def _close_active(self):
+        self.active_file.flush()
+        os.fsync(self.active_file.fileno())
+        self.active_file.close()
+        self.active.save_index()
+        self.active = None
+        self.active_file = None
+
+    def query(self, since=0, user=None, event=None, limit=1000):
+        """Records with ts >= since, oldest first, optionally filtered."""
+        self.flush()
+        with self.lock:
+            segments = list(self.segments)
+            index = [(list(s.index_ts), list(s.index_offsets)) for s in segments]
+
+        # Last segment that starts at or before `since`; earlier ones can be skipped
+        start = max(0, bisect.bisect_right([s.first_ts for s in segments], since) - 1)
+        results = []
+        for segment, (index_ts, index_offsets) in zip(segments[start:], index[start:]):
+            position = bisect.bisect_left(index_ts, since) - 1
+            offset = index_offsets[position] if position >= 0 else 0
+            try:
+                with open(segment.path, 'rb') as f:
+                    f.seek(offset)
+                    for line in f:
+                        try:
+                            entry = json.loads(line)
+                        except ValueError:
+                            continue
+                        if entry.get('ts', 0) < since:
+                            continue
+                        if user is not None and entry.get('user') != user:
+                            continue
+                        if event is not None and entry.get('event') != event:
+                            continue
+                        results.append(entry)
+                        if len(results) >= limit:
+                            return results
+            except FileNotFoundError:
+                continue
+        return results
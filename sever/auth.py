@@ -0,0 +1,96 @@
+import functools
+import hashlib
+import secrets
+import threading
+import time
+
+from flask import request, jsonify
+
+
+def hash_password(password):
+    return hashlib.sha256(password.encode()).hexdigest()
+
+
+class SessionStore:
+    """Login sessions keyed by bearer token, expiring after `timeout` idle seconds."""
+
+    def __init__(self, timeout=1800):
+        self.timeout = timeout
+        self.sessions = {}  # {token: {'username': ..., 'timestamp': ...}}
+        self.lock = threading.Lock()
+
+    def create(self, username):
+        token = secrets.token_hex(16)
+        with self.lock:
+            self.sessions[token] = {
+                'username': username,
+                'timestamp': time.time()
+            }
+        return token
+
+    def check(self, token):
+        """Validate a token; returns an error message or None if valid."""
+        with self.lock:
+            session_data = self.sessions.get(token) if token else None
+            if session_data is None:
+                return "Unauthorized"
+
+            # Check if session has expired
+            if time.time() - session_data['timestamp'] > self.timeout:
+                self.sessions.pop(token, None)
+                return "Session expired"
+
+            # Update session timestamp
+            session_data['timestamp'] = time.time()
+            return None
+
+    def username(self, token):
+        with self.lock:
+            session_data = self.sessions.get(token)
+            return session_data['username'] if session_data else None
+
+    def discard(self, token):
+        with self.lock:
+            self.sessions.pop(token, None)
+
+    def discard_users(self, usernames):
+        usernames = set(usernames)
+        with self.lock:
+            for token in [t for t, s in self.sessions.items() if s['username'] in usernames]:
+                del self.sessions[token]
+
+    def current_user(self):
+        return self.username(request.headers.get('Authorization'))
+
+    def requires_auth(self, f):
+        """Route decorator rejecting requests without a valid session."""
+        @functools.wraps(f)
+        def decorated(*args, **kwargs):
+            error = self.check(request.headers.get('Authorization'))
+            if error:
+                return jsonify({"error": error}), 401
+            return f(*args, **kwargs)
+
+        return decorated
+
+
+def check_password(users, username, password):
+    """True if password is username's (users as in users.json)."""
+    if not isinstance(username, str) or not isinstance(password, str):
+        return False
+    user = users.get(username)
+    return bool(user and secrets.compare_digest(user['password'], hash_password(password)))
+
+
+def authenticate(users, sessions, data):
+    """Check login credentials; returns (payload, status_code)."""
+    data = data or {}
+    username = data.get('username')
+    password = data.get('password')
+
+    if not username or not password:
+        return {"error": "Username and password required"}, 400
+
+    if check_password(users, username, password):
+        return {"token": sessions.create(username), "role": users[username]['role']}, 200
+    return {"error": "Invalid credentials"}, 401
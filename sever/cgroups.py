@@ -0,0 +1,293 @@
+import errno
+import os
+import re
+import signal
+import sys
+import threading
+import time
+
+CPU_PERIOD = 100000  # cpu.max period in microseconds
+CONTROLLERS = ('cpu', 'memory', 'io', 'pids')
+LIMIT_KEYS = ('cpu_max', 'memory_max', 'io_weight')
+JOIN_FAILED = 126  # Exit status of a wrap_command wrapper that could not join its group
+
+
+class CgroupError(ValueError):
+    pass
+
+
+def parse_cgroup_limits(data):
+    """Validate a profile's cgroup settings; returns a normalised dict.
+
+    {} asks for a group without limits. cpu_max is a number of CPUs (0.5
+    means half of one CPU), memory_max is in bytes and io_weight is 1-10000.
+    """
+    if data is None:
+        return None
+    if not isinstance(data, dict):
+        raise CgroupError("cgroup must be a JSON object")
+    unknown = set(data) - set(LIMIT_KEYS)
+    if unknown:
+        raise CgroupError(f"Unknown cgroup settings: {', '.join(sorted(unknown))}")
+
+    limits = {}
+    cpu_max = data.get('cpu_max')
+    if cpu_max is not None:
+        if isinstance(cpu_max, bool) or not isinstance(cpu_max, (int, float)) or cpu_max <= 0:
+            raise CgroupError("cpu_max must be a positive number of CPUs")
+        limits['cpu_max'] = cpu_max
+    memory_max = data.get('memory_max')
+    if memory_max is not None:
+        if isinstance(memory_max, bool) or not isinstance(memory_max, int) or memory_max <= 0:
+            raise CgroupError("memory_max must be a positive number of bytes")
+        limits['memory_max'] = memory_max
+    io_weight = data.get('io_weight')
+    if io_weight is not None:
+        if isinstance(io_weight, bool) or not isinstance(io_weight, int) or not 1 <= io_weight <= 10000:
+            raise CgroupError("io_weight must be an integer from 1 to 10000")
+        limits['io_weight'] = io_weight
+    return limits
+
+
+def find_cgroup2_base():
+    """Directory of this process's own cgroup v2 group, or None."""
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        with open('/proc/self/mountinfo') as f:
+            mounts = [line.split() for line in f]
+        with open('/proc/self/cgroup') as f:
+            own = [line.strip().split(':', 2) for line in f]
+    except OSError:
+        return None
+    mount_point = next((fields[4] for fields in mounts
+                        if '-' in fields and fields[fields.index('-') + 1] == 'cgroup2'), None)
+    own_path = next((path for hierarchy, _, path in own if hierarchy == '0'), None)
+    if mount_point is None or own_path is None:
+        return None
+    return os.path.join(mount_point, own_path.lstrip('/'))
+
+
+class CgroupManager:
+    """Puts each opted-in profile in its own cgroup v2 child group.
+
+    Groups live under <base>/<parent_name>, where base defaults to the
+    server's own cgroup (the subtree systemd delegates to a service). If that
+    group still holds processes, the server moves itself into a
+    <base>/<server_name> leaf first, as cgroup v2 only lets controllers be
+    enabled for children of groups without member processes. It never moves
+    other processes: in a group it shares with them, cgroups stay disabled.
+
+    Every method is a no-op when cgroup v2 is not available, so callers need
+    no special casing beyond checking the return values.
+    """
+
+    def __init__(self, base=None, parent_name='remote-control', server_name='server'):
+        self.base = base
+        self.parent_name = parent_name
+        self.server_name = server_name
+        self.parent = None
+        self.controllers = set()
+        self.lock = threading.Lock()
+        self.samples = {}  # {group: (monotonic time, usage_usec)} for cpu_percent
+        self.ready = None  # None until the first use decides
+
+    def available(self):
+        with self.lock:
+            if self.ready is None:
+                try:
+                    self._setup()
+                    self.ready = True
+                except OSError as e:
+                    print(f"cgroup v2 unavailable ({e}); running profiles without cgroups")
+                    self.ready = False
+            return self.ready
+
+    def _setup(self):
+        base = self.base or find_cgroup2_base()
+        if base is None or not os.path.exists(os.path.join(base, 'cgroup.procs')):
+            raise OSError(errno.ENOENT, "no cgroup v2 hierarchy")
+        parent = os.path.join(base, self.parent_name)
+        os.makedirs(parent, exist_ok=True)
+
+        available = set(self._read(base, 'cgroup.controllers').split())
+        wanted = [c for c in CONTROLLERS if c in available]
+        try:
+            self._enable(base, wanted)
+        except OSError as e:
+            if e.errno != errno.EBUSY:
+                raise
+            # "No internal processes": move the server out of the base group, then retry
+            others = [pid for pid in self._read(base, 'cgroup.procs').split() if int(pid) != os.getpid()]
+            if others:
+                raise OSError(errno.EBUSY, f"{base} is shared with other processes ({', '.join(others[:5])})")
+            leaf = os.path.join(base, self.server_name)
+            os.makedirs(leaf, exist_ok=True)
+            self._write(leaf, 'cgroup.procs', os.getpid())
+            try:
+                self._enable(base, wanted)
+            except OSError:
+                self._write(base, 'cgroup.procs', os.getpid())
+                raise
+        self._enable(parent, wanted)
+        self.parent = parent
+        self.controllers = set(self._read(parent, 'cgroup.subtree_control').split())
+
+    def _enable(self, group, controllers):
+        if controllers:
+            self._write(group, 'cgroup.subtree_control', ' '.join(f'+{c}' for c in controllers))
+
+    @staticmethod
+    def _read(group, name):
+        with open(os.path.join(group, name)) as f:
+            return f.read()
+
+    @staticmethod
+    def _write(group, name, value):
+        with open(os.path.join(group, name), 'w') as f:
+            f.write(str(value))
+
+    def group_path(self, key):
+        return os.path.join(self.parent, 'profile-' + re.sub(r'[^A-Za-z0-9_.-]', '_', str(key)))
+
+    def prepare(self, key, limits):
+        """Create (or reuse) the group for key and apply limits.
+
+        Returns (group path or None, errors); limits whose controller is not
+        enabled here are reported in errors rather than failing the launch.
+        """
+        if not self.available():
+            return None, []
+        group = self.group_path(key)
+        try:
+            os.makedirs(group, exist_ok=True)
+        except OSError as e:
+            return None, [f"cgroup: {e}"]
+        return group, self.apply_limits(group, limits)
+
+    def apply_limits(self, group, limits):
+        limits = limits or {}
+        settings = [
+            ('cpu.max', 'cpu', f"{max(1000, int(limits['cpu_max'] * CPU_PERIOD))} {CPU_PERIOD}"
+             if 'cpu_max' in limits else f"max {CPU_PERIOD}"),
+            ('memory.max', 'memory', limits.get('memory_max', 'max')),
+            ('io.weight', 'io', f"default {limits.get('io_weight', 100)}"),
+        ]
+        errors = []
+        for name, controller, value in settings:
+            key = {'cpu': 'cpu_max', 'memory': 'memory_max', 'io': 'io_weight'}[controller]
+            if controller not in self.controllers:
+                if key in limits:
+                    errors.append(f"{key}: {controller} controller not available")
+                continue
+            try:
+                self._write(group, name, value)
+            except OSError as e:
+                errors.append(f"{key}: {e}")
+        return errors
+
+    @staticmethod
+    def wrap_command(group, cmd):
+        """Command line that joins group before exec'ing cmd.
+
+        The shell moves itself in and then execs, so the program (and
+        anything it forks) starts inside the group without a preexec_fn. If
+        it cannot join, the program is not run and the shell exits with
+        JOIN_FAILED instead.
+        """
+        procs = os.path.join(group, 'cgroup.procs')
+        return ['/bin/sh', '-c', f'echo $$ > "$0" || exit {JOIN_FAILED}; exec "$@"', procs] + list(cmd)
+
+    def attach(self, group, pids):
+        """Move already running pids into group; returns a list of errors."""
+        errors = []
+        for pid in pids:
+            try:
+                self._write(group, 'cgroup.procs', pid)
+            except OSError as e:
+                errors.append(f"pid {pid}: {e}")
+        return errors
+
+    def pids(self, group):
+        try:
+            return [int(pid) for pid in self._read(group, 'cgroup.procs').split()]
+        except OSError:
+            return []
+
+    def populated(self, group):
+        try:
+            for line in self._read(group, 'cgroup.events').splitlines():
+                name, _, value = line.partition(' ')
+                if name == 'populated':
+                    return value == '1'
+        except OSError:
+            pass
+        return bool(self.pids(group))
+
+    def kill(self, key, timeout=3):
+        """SIGKILL every process in key's group; returns the pids it held."""
+        if not self.available():
+            return []
+        group = self.group_path(key)
+        pids = self.pids(group)
+        if not pids:
+            return []
+        try:
+            self._write(group, 'cgroup.kill', '1')  # Linux 5.14+
+        except OSError:
+            # Older kernels: signal members until the group drains
+            for pid in pids:
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+        deadline = time.monotonic() + timeout
+        while self.populated(group) and time.monotonic() < deadline:
+            for pid in self.pids(group):
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+            time.sleep(0.01)
+        return pids
+
+    def usage(self, key):
+        """CPU and memory use of key's group from its own counters, or None."""
+        if not self.available():
+            return None
+        group = self.group_path(key)
+        if not os.path.isdir(group):
+            return None
+        metrics = {'pids': len(self.pids(group))}
+        try:
+            for line in self._read(group, 'cpu.stat').splitlines():
+                name, _, value = line.partition(' ')
+                if name in ('usage_usec', 'user_usec', 'system_usec', 'nr_throttled', 'throttled_usec'):
+                    metrics[name] = int(value)
+        except OSError:
+            pass
+        for name in ('memory.current', 'memory.peak'):
+            try:
+                metrics[name.replace('.', '_')] = int(self._read(group, name))
+            except (OSError, ValueError):
+                pass
+
+        # CPU share since the previous sample of this group
+        if 'usage_usec' in metrics:
+            now = time.monotonic()
+            previous = self.samples.get(group)
+            self.samples[group] = (now, metrics['usage_usec'])
+            if previous and now > previous[0]:
+                metrics['cpu_percent'] = round(
+                    (metrics['usage_usec'] - previous[1]) / ((now - previous[0]) * 1e6) * 100, 1)
+        return metrics
+
+    def remove(self, key):
+        if not self.available():
+            return
+        group = self.group_path(key)
+        self.samples.pop(group, None)
+        try:
+            os.rmdir(group)
+        except OSError:
+            pass
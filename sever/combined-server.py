@@ -0,0 +1,65 @@
+"""Serves the HTTP API and the socket protocol from one process.
+
+Both front-ends run over the HTTP API's ControlEngine: one profile store
+(--config, in the HTTP API's format), one process backend, one status
+sampler and cache, and one status feed. A start from the phone app's socket
+connection shows up on /api/events at once, and a scan made for an HTTP
+request answers socket clients too. Socket clients log in with the HTTP
+API's users (--users).
+
+    python combined-server.py --port 5000 --socket-port 5001
+    python combined-server.py --mode async --socket-mode async
+
+Every option of remote-control-system.py is accepted, plus the --socket-*
+options below.
+"""
+import importlib.util
+import os
+import threading
+
+SERVER_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_script(name, filename):
+    spec = importlib.util.spec_from_file_location(name, os.path.join(SERVER_DIR, filename))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def main():
+    http_api = load_script('remote_control_system', 'remote-control-system.py')
+    socket_server = load_script('windows_server', 'windows-server.py')
+    from auth import check_password
+
+    parser = http_api.build_parser("Remote control HTTP API and socket server in one process")
+    parser.add_argument('--socket-host', help='Host IP for the socket server (default: --host)')
+    parser.add_argument('--socket-port', type=int, default=5001, help='Port for the socket server')
+    parser.add_argument('--socket-mode', choices=['threaded', 'async'], default='threaded',
+                        help='threaded: thread per connection; async: asyncio event loop with a worker pool')
+    parser.add_argument('--monitor-interval', type=float, default=2.0,
+                        help='Seconds between status checks for subscribed socket clients')
+    parser.add_argument('--heartbeat-interval', type=float, default=20,
+                        help='Seconds of socket client silence before the server pings it')
+    parser.add_argument('--idle-timeout', type=float, default=60,
+                        help='Seconds of socket client silence before the connection is closed (0 to never close)')
+    parser.add_argument('--keepalive', type=int, default=30,
+                        help='Idle seconds before TCP keepalive probes start (0 to disable)')
+    args = parser.parse_args()
+
+    http_api.start(args)
+
+    control = socket_server.RemoteControlServer(
+        host=args.socket_host or args.host, port=args.socket_port, mode=args.socket_mode,
+        workers=args.workers, monitor_interval=args.monitor_interval,
+        heartbeat_interval=args.heartbeat_interval, idle_timeout=args.idle_timeout, keepalive=args.keepalive,
+        engine=http_api.engine,
+        # Looked up on every login, so edits to the users file apply at once
+        authenticate=lambda username, password: check_password(http_api.users, username, password))
+    threading.Thread(target=control.start, name='socket-server', daemon=True).start()
+
+    http_api.serve(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,564 @@
+import collections
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+from tracing import tracer
+from process_backend import default_backend
+from status_feed import StatusFeed
+from process_tuning import parse_tuning, TuningError
+from cgroups import JOIN_FAILED, CgroupManager, CgroupError, parse_cgroup_limits
+from warm_pool import WarmPool, WarmPoolError, parse_warm_pool
+
+PROFILE_FIELDS = ('name', 'path', 'arguments', 'tuning', 'cgroup', 'warm_pool')
+
+
+# Check one import/export record; returns (profile_id or None, profile, error)
+def parse_profile_record(record):
+    if not isinstance(record, dict):
+        return None, None, "Record must be a JSON object"
+    for field in ('name', 'path'):
+        if not isinstance(record.get(field), str) or not record[field]:
+            return None, None, f"Missing required field: {field}"
+    arguments = record.get('arguments', '')
+    if not isinstance(arguments, str):
+        return None, None, "arguments must be a string"
+    try:
+        tuning = parse_tuning(record.get('tuning'))
+        cgroup = parse_cgroup_limits(record.get('cgroup'))
+        pool = parse_warm_pool(record.get('warm_pool'))
+    except (TuningError, CgroupError, WarmPoolError) as e:
+        return None, None, str(e)
+    profile_id = record.get('id')
+    if profile_id is not None:
+        profile_id = str(profile_id)
+    profile = {'name': record['name'], 'path': record['path'], 'arguments': arguments,
+               'status': 'unknown', 'pid': None}
+    if tuning:
+        profile['tuning'] = tuning
+    if cgroup is not None:
+        profile['cgroup'] = cgroup
+    if pool:
+        profile['warm_pool'] = pool
+    return profile_id, profile, None
+
+
+# Validate an edited config.json; returns {profile_id: {name, path, arguments}}
+def parse_profiles_file(data):
+    if not isinstance(data, dict):
+        raise ValueError("Profiles file must be a JSON object")
+    profiles = {}
+    for profile_id, record in data.items():
+        _, profile, error = parse_profile_record(record)
+        if error:
+            raise ValueError(f"Profile {profile_id}: {error}")
+        profiles[profile_id] = {field: profile[field] for field in PROFILE_FIELDS if field in profile}
+    return profiles
+
+
+class ControlEngine:
+    """Profiles, the processes behind them and their statuses, for every front-end.
+
+    The HTTP API (remote-control-system.py) and the socket server
+    (windows-server.py) are both thin layers over one of these: one profile
+    store saved to config_file, one process backend, one status sampler
+    whose scan results are reused for status_ttl seconds, and one status
+    feed that every status change is published to. Run both front-ends
+    over the same engine (combined-server.py) and they share all of it.
+
+    `profiles` maps profile ID to a profile dict; it is replaced wholesale
+    by a reload, so look it up on the engine rather than keeping a
+    reference. `generation` goes up whenever profiles are added, removed or
+    edited, for front-ends that keep their own indexes.
+    """
+
+    def __init__(self, config_file='config.json', status_ttl=2, stop_timeout=3,
+                 warm_pool_memory=512 * 1024 * 1024, backend=None):
+        self.config_file = config_file
+        self.status_ttl = status_ttl  # Seconds a process scan result is reused by readers
+        self.stop_timeout = stop_timeout  # Seconds between terminate and kill
+        self.profiles = {}
+        self.generation = 0
+
+        # Process inspection and control (psutil, /proc or fake; see process_backend.py)
+        self.backend = backend or default_backend()
+
+        # Status change notifications for long-poll and socket subscribers
+        self.status_feed = StatusFeed()
+
+        # Optional per-profile cgroup v2 groups (profiles with a "cgroup" key); no-op without cgroup v2
+        self.cgroups = CgroupManager()
+
+        # Serialises changes to the profile table between front-ends and hot reloads
+        self.config_lock = threading.RLock()
+
+        # Digests of files this process wrote itself, so file watchers skip our own saves
+        self.recent_writes = collections.deque(maxlen=16)
+
+        # Orders concurrent saves so the newest state is always the one left on disk
+        self.save_lock = threading.Lock()
+
+        # Time of the last full status scan, and a lock so concurrent refreshes share one scan
+        self.last_status_scan = 0
+        self.status_scan_lock = threading.Lock()
+
+        # {pid: Popen} for profile processes launched in this session. Only these
+        # pids are trusted without an executable match: a pid read back from the
+        # config file may belong to an unrelated process after a restart.
+        self.launched = {}
+        self.launched_lock = threading.Lock()
+
+        # Pre-launched, suspended instances for profiles with a "warm_pool" key
+        self.warm_pool = WarmPool(self.backend, self.launch_standby, memory_budget=warm_pool_memory)
+
+        # Event-driven exit detection supplied by the backend (pidfds on Linux); polling remains the fallback
+        self.exit_watcher = self.backend.exit_watcher(self.on_process_exit)
+        self.updater_thread = None
+
+    # Profile store
+
+    def load(self):
+        """Load the profiles from config_file, creating it if it doesn't exist."""
+        if os.path.exists(self.config_file):
+            with open(self.config_file, 'r') as f:
+                data = json.load(f)
+        else:
+            data = self.default_file_data()
+            self.write_json_file(self.config_file, data)
+        with self.config_lock:
+            self.profiles = self.profiles_from_file(data)
+            self.generation += 1
+
+    # File format hooks, overridden by front-ends with a config file of their own
+    def default_file_data(self):
+        return {}
+
+    def profiles_from_file(self, data):
+        return data
+
+    def file_data(self):
+        return self.profiles
+
+    # Write via a temp file so readers (and the reload watcher) never see a partial file
+    def write_json_file(self, path, data):
+        with self.save_lock:
+            content = json.dumps(data, indent=4).encode()
+            self.recent_writes.append(hashlib.sha256(content).hexdigest())
+            fd, tmp_file = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)),
+                                            prefix=os.path.basename(path) + '.', suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(content)
+                # mkstemp creates 0600 files; keep the permissions the file already had
+                try:
+                    os.chmod(tmp_file, os.stat(path).st_mode & 0o777)
+                except FileNotFoundError:
+                    os.chmod(tmp_file, 0o644)
+                os.replace(tmp_file, path)
+            except BaseException:
+                try:
+                    os.unlink(tmp_file)
+                except OSError:
+                    pass
+                raise
+
+    def is_own_write(self, content):
+        return hashlib.sha256(content).hexdigest() in self.recent_writes
+
+    # Save the profiles (under config_lock so profiles can't be added or removed mid-dump)
+    def save_config(self):
+        with self.config_lock:
+            self.write_json_file(self.config_file, self.file_data())
+
+    # Time-based profile ID, bumped past any already in use (or in `reserved`).
+    # Bulk callers pass the previous ID as `after` so the search never restarts.
+    def new_profile_id(self, reserved=(), after=None):
+        candidate = int(time.time()) if after is None else max(int(time.time()), int(after) + 1)
+        while str(candidate) in self.profiles or str(candidate) in reserved:
+            candidate += 1
+        return str(candidate)
+
+    def add_profiles(self, profiles, source):
+        """Add {profile_id: profile}, with one scan for their initial statuses and one save."""
+        with self.config_lock:
+            snapshot = self.backend.snapshot()
+            for profile_id, profile in profiles.items():
+                self.profiles[profile_id] = profile
+                self.set_initial_status(profile_id, profile, snapshot, source)
+            self.generation += 1
+            self.save_config()
+        for profile_id, profile in profiles.items():
+            if profile.get('warm_pool'):
+                self.warm_pool.configure(profile_id, profile['warm_pool'])
+
+    def remove_profile(self, profile_id):
+        """Remove a profile (a running instance keeps running); returns it, or None if unknown."""
+        with self.config_lock:
+            profile = self.profiles.pop(profile_id, None)
+            if profile is None:
+                return None
+            self.generation += 1
+            self.save_config()
+        if profile.get('cgroup') is not None:
+            self.cgroups.remove(profile_id)
+        if profile.get('warm_pool'):
+            self.warm_pool.configure(profile_id, None)
+        return profile
+
+    def update_profile(self, profile_id, fields):
+        """Change some of a profile's PROFILE_FIELDS and save; returns the profile, or None if unknown."""
+        with self.config_lock:
+            if profile_id not in self.profiles:
+                return None
+            loaded = {key: {field: profile[field] for field in PROFILE_FIELDS if field in profile}
+                      for key, profile in self.profiles.items()}
+            loaded[profile_id].update(fields)
+            self.apply_profile_changes(loaded)
+            self.save_config()
+            return self.profiles[profile_id]
+
+    # Apply an edited profile table. Unchanged profiles keep their objects (and so
+    # their cached status); the new table replaces the old one in a single step.
+    def apply_profile_changes(self, loaded):
+        current = self.profiles
+        added = [profile_id for profile_id in loaded if profile_id not in current]
+        removed = [profile_id for profile_id in current if profile_id not in loaded]
+        changed = [profile_id for profile_id in loaded if profile_id in current
+                   and any(current[profile_id].get(field) != loaded[profile_id].get(field)
+                           for field in PROFILE_FIELDS)]
+        if not (added or removed or changed):
+            return None
+
+        profiles = dict(current)
+        for profile_id in removed:
+            del profiles[profile_id]
+        for profile_id in changed:
+            runtime = {k: v for k, v in current[profile_id].items() if k not in PROFILE_FIELDS}
+            profiles[profile_id] = dict(runtime, **loaded[profile_id])
+        for profile_id in added:
+            profiles[profile_id] = dict(loaded[profile_id], status='unknown', pid=None)
+        self.profiles = profiles
+        self.generation += 1
+
+        # New profiles and moved executables need a fresh status
+        rescan = added + [profile_id for profile_id in changed
+                          if current[profile_id]['path'] != loaded[profile_id]['path']]
+        if rescan:
+            snapshot = self.backend.snapshot()
+            for profile_id in rescan:
+                self.set_initial_status(profile_id, profiles[profile_id], snapshot, 'reload')
+        for profile_id in removed:
+            if current[profile_id].get('warm_pool'):
+                self.warm_pool.configure(profile_id, None)
+        for profile_id in added:
+            if profiles[profile_id].get('warm_pool'):
+                self.warm_pool.configure(profile_id, profiles[profile_id]['warm_pool'])
+        for profile_id in changed:
+            profile = profiles[profile_id]
+            # Standby instances of the old command line are no use any more
+            if current[profile_id].get('warm_pool') or profile.get('warm_pool'):
+                stale = any(current[profile_id].get(field) != profile.get(field)
+                            for field in ('path', 'arguments', 'tuning', 'cgroup'))
+                self.warm_pool.configure(profile_id, profile.get('warm_pool'), reset=stale)
+            if profile_id not in rescan and profile.get('pid') \
+                    and current[profile_id].get('tuning') != profile.get('tuning'):
+                self.tune_process_tree(profile['pid'], profile.get('tuning'))
+            if profile.get('cgroup') is not None and current[profile_id].get('cgroup') != profile['cgroup'] \
+                    and self.cgroups.ready:
+                self.cgroups.apply_limits(self.cgroups.group_path(profile_id), profile['cgroup'])
+        return {'added': added, 'removed': removed, 'changed': changed}
+
+    # Processes
+
+    # Check if a process is running (pass a snapshot to reuse one scan).
+    # Suspended warm pool instances share the executable but are not "running".
+    def is_process_running(self, exe_path, snapshot=None):
+        if snapshot is None:
+            snapshot = self.backend.snapshot()
+        return snapshot.find(exe_path, exclude=self.warm_pool.pids())
+
+    # Find a profile's process: one running its executable, or else the process
+    # this server started it as, which may have exec'd something else (launcher scripts do)
+    def find_profile_process(self, profile, snapshot=None):
+        if snapshot is None:
+            snapshot = self.backend.snapshot()
+        running, pid = self.is_process_running(profile['path'], snapshot)
+        if not running and self.launched_process(profile.get('pid')) is not None:
+            return True, profile['pid']
+        return running, pid
+
+    def track_launched(self, process):
+        with self.launched_lock:
+            self.launched[process.pid] = process
+
+    # The live Popen for a pid this server launched in this session, or None
+    def launched_process(self, pid):
+        with self.launched_lock:
+            process = self.launched.get(pid)
+        if process is None:
+            return None
+        if process.poll() is not None:
+            with self.launched_lock:
+                if self.launched.get(pid) is process:
+                    del self.launched[pid]
+            return None
+        return process
+
+    # Apply tuning to a process and all of its descendants; returns (pids, errors)
+    def tune_process_tree(self, pid, tuning):
+        pids = [pid] + self.backend.children(pid)
+        errors = []
+        for target in pids:
+            errors.extend(f"pid {target}: {error}" for error in self.backend.tune(target, tuning))
+        return pids, errors
+
+    # Launch an executable without waiting; returns (Popen, tuning errors)
+    def launch_executable(self, exe_path, arguments=None, tuning=None, cgroup=None):
+        cmd = [exe_path]
+        if arguments:
+            cmd.extend(arguments.split())
+        if cgroup:
+            cmd = self.cgroups.wrap_command(cgroup, cmd)
+
+        # Start the process without waiting, with platform creation flags
+        with tracer.span('start_executable.popen'):
+            process = self.backend.launch(cmd)
+        # Applied straight after launch (preexec_fn is unsafe in a threaded
+        # server), to the whole tree in case the child has already forked
+        errors = []
+        if tuning:
+            with tracer.span('start_executable.tune', pid=process.pid):
+                _, errors = self.tune_process_tree(process.pid, tuning)
+        return process, errors
+
+    # Start an executable (inside `cgroup`, a group path, if given); returns (Popen or None, message)
+    def start_executable(self, exe_path, arguments=None, tuning=None, cgroup=None):
+        with tracer.span('start_executable.path_check'):
+            if not os.path.exists(exe_path):
+                return None, "Executable not found"
+
+        try:
+            process, errors = self.launch_executable(exe_path, arguments, tuning, cgroup)
+            if errors:
+                return process, f"Process started; tuning failed: {'; '.join(errors)}"
+            return process, "Process started"
+        except Exception as e:
+            return None, str(e)
+
+    # Warm pool launcher: a standby instance of a profile, outside its cgroup
+    # until it is handed over (so stopping the profile leaves the pool alone)
+    def launch_standby(self, profile_id):
+        profile = self.profiles.get(profile_id)
+        if profile is None or not os.path.exists(profile['path']):
+            return None
+        process, errors = self.launch_executable(profile['path'], profile['arguments'], profile.get('tuning'))
+        if errors:
+            print(f"Warm pool: tuning standby for {profile_id} failed: {'; '.join(errors)}")
+        return process
+
+    # Stop every running instance of an executable (warm pool standbys aside), and
+    # the process `pid` if this server launched it and it lives on under another name
+    def stop_executable(self, exe_path, pid=None):
+        with tracer.span('stop_executable.scan'):
+            snapshot = self.backend.snapshot()
+            pids = [found for found in snapshot.find_all(exe_path) if found not in self.warm_pool.pids()]
+            if pid is not None and pid not in pids and self.launched_process(pid) is not None:
+                pids.append(pid)
+        if not pids:
+            return False, "Process not found"
+        try:
+            with tracer.span('stop_executable.terminate', pids=len(pids)):
+                for pid in pids:
+                    self.backend.terminate(pid)
+            # Wait for the processes to terminate
+            with tracer.span('stop_executable.wait', pids=len(pids)):
+                gone, alive = self.backend.wait(pids, timeout=self.stop_timeout)
+            if alive:
+                # Force kill the ones that don't terminate gracefully
+                with tracer.span('stop_executable.kill', pids=len(alive)):
+                    for pid in alive:
+                        self.backend.kill(pid)
+                    _, alive = self.backend.wait(alive, timeout=self.stop_timeout)
+            if alive:
+                return False, f"Could not stop pids {', '.join(map(str, alive))}"
+            return True, "Process stopped"
+        except Exception as e:
+            return False, str(e)
+
+    # Statuses
+
+    # Update a profile's status and notify subscribers when it changes
+    def set_profile_status(self, profile_id, profile, status, pid, source):
+        changed = profile.get('status') != status or profile.get('pid') != pid
+        profile['status'] = status
+        profile['pid'] = pid
+        if changed:
+            self.status_feed.publish(profile_id, status, pid, source)
+        # Follow running processes so their exit is reported immediately
+        if status == 'running' and pid and self.exit_watcher is not None:
+            self.exit_watcher.watch(pid, profile_id)
+
+    # Called from the exit watcher thread the moment a tracked process exits
+    def on_process_exit(self, profile_id, pid, returncode):
+        with self.launched_lock:
+            process = self.launched.get(pid)
+        self.launched_process(pid)  # Reaps it through its Popen and forgets it
+        profile = self.profiles.get(profile_id)
+        if process is not None and process.returncode == JOIN_FAILED and profile and profile.get('cgroup') is not None:
+            print(f"Profile {profile_id} did not start: could not join its cgroup")
+        if profile and profile.get('pid') == pid:
+            self.set_profile_status(profile_id, profile, 'stopped', None, 'exit')
+
+    def set_initial_status(self, profile_id, profile, snapshot, source):
+        running, pid = self.find_profile_process(profile, snapshot)
+        status = 'running' if running else 'stopped'
+
+        # Check if file exists
+        if not os.path.exists(profile['path']):
+            status = 'unknown'
+        self.set_profile_status(profile_id, profile, status, pid if running else None, source)
+
+    # Check the status of every profile against one process table scan
+    def update_all_statuses(self):
+        profiles = self.profiles
+        with tracer.span('update_all_statuses', profiles=len(profiles)):
+            with tracer.span('update_all_statuses.scan'):
+                snapshot = self.backend.snapshot()
+            for profile_id, profile in list(profiles.items()):
+                with tracer.span('update_all_statuses.path_check', profile_id=profile_id):
+                    self.set_initial_status(profile_id, profile, snapshot, 'poll')
+            self.last_status_scan = time.time()
+
+    def status_is_fresh(self, max_age=None):
+        max_age = self.status_ttl if max_age is None else max_age
+        return time.time() - self.last_status_scan <= max_age
+
+    # Rescan unless the cached statuses are recent; concurrent callers share one scan
+    def refresh_statuses(self, max_age=None):
+        if self.status_is_fresh(max_age):
+            return
+        with self.status_scan_lock:
+            if not self.status_is_fresh(max_age):
+                self.update_all_statuses()
+
+    # Starting and stopping
+
+    # Start a profile's executable and record its new status (shared by every front-end and schedules)
+    def start_profile(self, profile_id, source):
+        profile = self.profiles.get(profile_id)
+        if profile is None:
+            return False, "Profile not found"
+
+        with tracer.span('start_profile', profile_id=profile_id, source=source):
+            if profile.get('warm_pool'):
+                with tracer.span('start_profile.warm_pool'):
+                    process = self.warm_pool.take(profile_id)
+                if process is not None:
+                    return self.start_from_standby(profile_id, profile, process, source)
+
+            group, cgroup_errors = None, []
+            if profile.get('cgroup') is not None:
+                with tracer.span('start_profile.cgroup'):
+                    group, cgroup_errors = self.cgroups.prepare(profile_id, profile['cgroup'])
+            process, message = self.start_executable(profile['path'], profile['arguments'],
+                                                      profile.get('tuning'), group)
+            if process is None:
+                return False, message
+            self.track_launched(process)
+            if cgroup_errors:
+                message += f"; cgroup limits not applied: {'; '.join(cgroup_errors)}"
+
+            # The launched process is the profile's process while it lives (the
+            # cgroup wrapper execs, keeping the pid); one that is already gone
+            # may have handed over to another instance, so look for one
+            if process.poll() is None:
+                running, pid = True, process.pid
+            elif group and process.returncode == JOIN_FAILED:
+                self.set_profile_status(profile_id, profile, 'stopped', None, source)
+                return False, f"Could not join cgroup {group}"
+            else:
+                with tracer.span('start_profile.rescan'):
+                    running, pid = self.is_process_running(profile['path'])
+            self.set_profile_status(profile_id, profile, 'running' if running else 'stopped',
+                                    pid if running else None, source)
+            with tracer.span('start_profile.save_config'):
+                self.save_config()
+            return True, message
+
+    # Finish a start with a resumed warm pool instance: no launch needed
+    def start_from_standby(self, profile_id, profile, process, source):
+        message = "Process started from warm pool"
+        self.track_launched(process)
+        if profile.get('cgroup') is not None:
+            group, errors = self.cgroups.prepare(profile_id, profile['cgroup'])
+            if group:
+                errors += self.cgroups.attach(group, [process.pid] + self.backend.children(process.pid))
+            if errors:
+                message += f"; cgroup limits not applied: {'; '.join(errors)}"
+        self.set_profile_status(profile_id, profile, 'running', process.pid, source)
+        with tracer.span('start_profile.save_config'):
+            self.save_config()
+        return True, message
+
+    # Stop a profile's executable and record its new status
+    def stop_profile(self, profile_id, source):
+        profile = self.profiles.get(profile_id)
+        if profile is None:
+            return False, "Profile not found"
+
+        with tracer.span('stop_profile', profile_id=profile_id, source=source):
+            # A profile's own cgroup goes down in one step, children included
+            killed = []
+            if profile.get('cgroup') is not None:
+                with tracer.span('stop_profile.cgroup_kill'):
+                    killed = self.cgroups.kill(profile_id)
+            if killed:
+                self.backend.wait(killed, timeout=1)  # Reap our own children
+                success, message = True, f"Process group stopped ({len(killed)} processes)"
+            else:
+                success, message = self.stop_executable(profile['path'], profile.get('pid'))
+            if not success:
+                return False, message
+
+            self.set_profile_status(profile_id, profile, 'stopped', None, source)
+            with tracer.span('stop_profile.save_config'):
+                self.save_config()
+            return True, message
+
+    # Background services
+
+    def start(self, status_interval=30):
+        """Start exit watching, the warm pool and (unless status_interval is None) the status sampler."""
+        # Watch for process exits as they happen (Linux pidfd)
+        if self.exit_watcher is not None:
+            self.exit_watcher.start()
+
+        # Pre-launch standby instances for profiles that opted in
+        for profile_id, profile in self.profiles.items():
+            if profile.get('warm_pool'):
+                self.warm_pool.configure(profile_id, profile['warm_pool'])
+        self.warm_pool.start()
+
+        if status_interval is not None and self.updater_thread is None:
+            self.updater_thread = threading.Thread(target=self.status_updater, args=(status_interval,),
+                                                   daemon=True)
+            self.updater_thread.start()
+
+    # Background thread to periodically update (and save) statuses
+    def status_updater(self, interval):
+        while True:
+            tracer.begin_trace()
+            try:
+                with self.status_scan_lock:
+                    self.update_all_statuses()
+                with tracer.span('status_updater.save_config'):
+                    self.save_config()
+            except Exception as e:
+                # One failed pass must not stop the poller for good
+                print(f"Error updating statuses: {e}")
+            finally:
+                tracer.end_trace()
+            time.sleep(interval)
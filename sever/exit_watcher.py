@@ -0,0 +1,111 @@
+import os
+import selectors
+import threading
+
+
+class ExitWatcher:
+    """Reports process exits as they happen using Linux pidfds.
+
+    Every watched pid gets a pidfd (os.pidfd_open, Linux 5.3+) that becomes
+    readable when the process exits. All pidfds are multiplexed on a single
+    selector thread, so watching hundreds of processes costs no CPU until one
+    of them exits. Where pidfds are unsupported watch() returns False and the
+    caller keeps relying on polling. The watcher never reaps: a child's exit
+    status belongs to whoever owns its Popen, so on_exit gets no returncode
+    and the owner collects it with poll().
+    """
+
+    def __init__(self, on_exit):
+        self.on_exit = on_exit
+        self.selector = selectors.DefaultSelector()
+        self.watched = {}  # {pid: (pidfd, key)}
+        self.lock = threading.Lock()
+        self.thread = None
+        self._wake_r, self._wake_w = os.pipe()
+        os.set_blocking(self._wake_r, False)
+        os.set_blocking(self._wake_w, False)  # A full pipe already means a wake-up is pending
+        self.selector.register(self._wake_r, selectors.EVENT_READ, None)
+
+    @staticmethod
+    def supported():
+        if not hasattr(os, 'pidfd_open'):
+            return False
+        try:
+            os.close(os.pidfd_open(os.getpid()))
+            return True
+        except OSError:
+            return False
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def watch(self, pid, key):
+        """Watch pid and call on_exit(key, pid, None) when it exits."""
+        if not hasattr(os, 'pidfd_open'):
+            return False
+        with self.lock:
+            if pid in self.watched:
+                self.watched[pid] = (self.watched[pid][0], key)
+                return True
+            try:
+                pidfd = os.pidfd_open(pid)
+            except ProcessLookupError:
+                pidfd = None
+            except OSError:
+                return False
+            if pidfd is not None:
+                self.watched[pid] = (pidfd, key)
+                self.selector.register(pidfd, selectors.EVENT_READ, pid)
+        if pidfd is None:
+            # Already gone before we could watch it
+            self._notify(key, pid)
+        else:
+            self._wake()
+        return True
+
+    def unwatch(self, pid):
+        with self.lock:
+            entry = self.watched.pop(pid, None)
+            if entry:
+                self.selector.unregister(entry[0])
+                os.close(entry[0])
+        if entry:
+            self._wake()
+
+    def is_watched(self, pid):
+        with self.lock:
+            return pid in self.watched
+
+    def _wake(self):
+        try:
+            os.write(self._wake_w, b'\0')
+        except BlockingIOError:
+            pass
+
+    def _notify(self, key, pid):
+        try:
+            self.on_exit(key, pid, None)
+        except Exception as e:
+            print(f"Error handling exit of pid {pid}: {e}")
+
+    def _run(self):
+        while True:
+            for selector_key, _ in self.selector.select():
+                pid = selector_key.data
+                if pid is None:
+                    try:
+                        while os.read(self._wake_r, 512):
+                            pass
+                    except BlockingIOError:
+                        pass
+                    continue
+
+                with self.lock:
+                    entry = self.watched.pop(pid, None)
+                    if entry is None:
+                        continue
+                    self.selector.unregister(entry[0])
+                    os.close(entry[0])
+                self._notify(entry[1], pid)
@@ -0,0 +1,138 @@
+import ctypes
+import os
+import selectors
+import struct
+import sys
+import threading
+import time
+
+# <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+EVENT_HEADER = struct.Struct('iIII')  # wd, mask, cookie, len
+
+
+def load_inotify():
+    """libc's inotify functions via ctypes, or None where unavailable."""
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+class FileWatcher:
+    """Calls on_change(key) shortly after a watched file is written.
+
+    On Linux the parent directories are watched with inotify, which also
+    catches editors and tools that replace the file by renaming a temporary
+    one over it. Elsewhere, or if inotify cannot be set up, the files' mtime,
+    size and inode are polled every poll_interval seconds. Bursts of events
+    are coalesced for `debounce` seconds so a file is reported once it has
+    settled rather than once per write.
+    """
+
+    def __init__(self, on_change, poll_interval=1.0, debounce=0.2):
+        self.on_change = on_change
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self.files = {}  # {absolute path: key}
+        self.thread = None
+        self.mode = None
+
+    def watch(self, path, key):
+        self.files[os.path.abspath(path)] = key
+
+    def start(self):
+        if self.thread is not None:
+            return
+        target = self._run_polling
+        libc = load_inotify()
+        if libc is not None:
+            try:
+                fd, watches = self._setup_inotify(libc)
+                target = lambda: self._run_inotify(fd, watches)
+            except OSError as e:
+                print(f"inotify unavailable ({e}); polling for config changes")
+        self.mode = 'polling' if target == self._run_polling else 'inotify'
+        self.thread = threading.Thread(target=target, daemon=True)
+        self.thread.start()
+
+    def _setup_inotify(self, libc):
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), os.strerror(ctypes.get_errno()))
+        watches = {}  # {wd: directory}
+        mask = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+        for directory in {os.path.dirname(path) for path in self.files}:
+            wd = libc.inotify_add_watch(fd, os.fsencode(directory), mask)
+            if wd < 0:
+                error = ctypes.get_errno()
+                os.close(fd)
+                raise OSError(error, f"{directory}: {os.strerror(error)}")
+            watches[wd] = directory
+        return fd, watches
+
+    def _read_events(self, fd, watches):
+        changed = set()
+        while True:
+            try:
+                data = os.read(fd, 64 * 1024)
+            except BlockingIOError:
+                return changed
+            offset = 0
+            while offset < len(data):
+                wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b'\0')
+                offset += length
+                directory = watches.get(wd)
+                if directory is None or not name:
+                    continue
+                key = self.files.get(os.path.join(directory, os.fsdecode(name)))
+                if key is not None:
+                    changed.add(key)
+
+    def _run_inotify(self, fd, watches):
+        selector = selectors.DefaultSelector()
+        selector.register(fd, selectors.EVENT_READ)
+        while True:
+            selector.select()
+            changed = self._read_events(fd, watches)
+            # Keep collecting until the files have been quiet for `debounce`
+            while selector.select(self.debounce):
+                changed |= self._read_events(fd, watches)
+            for key in changed:
+                self._notify(key)
+
+    @staticmethod
+    def _signature(path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size, st.st_ino
+
+    def _run_polling(self):
+        signatures = {path: self._signature(path) for path in self.files}
+        while True:
+            time.sleep(self.poll_interval)
+            for path, key in self.files.items():
+                signature = self._signature(path)
+                if signature != signatures[path]:
+                    signatures[path] = signature
+                    self._notify(key)
+
+    def _notify(self, key):
+        try:
+            self.on_change(key)
+        except Exception as e:
+            print(f"Error handling change to {key}: {e}")
@@ -0,0 +1,308 @@
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import requests
+from requests.adapters import HTTPAdapter
+from flask import Flask, request, jsonify
+from flask_cors import CORS
+
+from auth import SessionStore, authenticate, hash_password
+
+app = Flask(__name__)
+CORS(app)  # Enable cross-origin requests
+
+# Configuration
+FLEET_FILE = 'fleet.json'
+USERS_FILE = 'users.json'
+SESSION_TIMEOUT = 1800  # 30 minutes
+FRESH_TTL = 2  # Seconds a backend's profile list is served without revalidating
+STALE_TTL = 120  # Seconds a stale list may still be served while it is refreshed
+RETRY_BACKOFF = 2  # First delay before retrying a failed backend; doubles per failure
+RETRY_BACKOFF_MAX = 60
+CONNECT_TIMEOUT = 2
+READ_TIMEOUT = 5
+ACTION_READ_TIMEOUT = 15  # Start/stop wait for the backend's settle delay
+FANOUT_WORKERS = 64
+
+backends = {}
+users = {}
+sessions = SessionStore(SESSION_TIMEOUT)
+requires_auth = sessions.requires_auth
+fanout = ThreadPoolExecutor(max_workers=FANOUT_WORKERS, thread_name_prefix='fleet')
+
+
+class BackendError(Exception):
+    pass
+
+
+class Backend:
+    """One control server: a pooled keep-alive session plus its cached profiles."""
+
+    def __init__(self, name, url, username, password, connect_timeout=CONNECT_TIMEOUT,
+                 read_timeout=READ_TIMEOUT):
+        self.name = name
+        self.url = url.rstrip('/')
+        self.username = username
+        self.password = password
+        self.timeout = (connect_timeout, read_timeout)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=8)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.token = None
+        self.login_lock = threading.Lock()
+
+        # Cached GET /api/profiles result
+        self.lock = threading.Lock()
+        self.profiles = None
+        self.fetched_at = 0
+        self.error = None
+        self.failures = 0
+        self.retry_at = 0  # Failed backends are not retried before this time
+        self.refreshing = None  # Future of the in-flight refresh
+
+    def login(self):
+        with self.login_lock:
+            response = self.session.post(f'{self.url}/api/login',
+                                         json={'username': self.username, 'password': self.password},
+                                         timeout=self.timeout)
+            if response.status_code != 200:
+                raise BackendError(f"Login failed: {response.status_code}")
+            try:
+                token = response.json().get('token')
+            except (ValueError, AttributeError):
+                token = None
+            if not isinstance(token, str) or not token:
+                raise BackendError("Login reply has no token")
+            self.token = token
+
+    def call(self, method, path, timeout=None, **kwargs):
+        """Authenticated request; logs in again once if the session expired."""
+        for attempt in range(2):
+            if self.token is None:
+                self.login()
+            response = self.session.request(method, f'{self.url}{path}',
+                                            headers={'Authorization': self.token},
+                                            timeout=timeout or self.timeout, **kwargs)
+            if response.status_code != 401 or attempt:
+                return response
+            self.token = None
+        return response
+
+    def refresh(self):
+        try:
+            response = self.call('GET', '/api/profiles')
+            if response.status_code != 200:
+                raise BackendError(f"HTTP {response.status_code}")
+            profiles = response.json()
+            with self.lock:
+                self.profiles = profiles
+                self.fetched_at = time.time()
+                self.error = None
+                self.failures = 0
+        except (requests.RequestException, BackendError, ValueError) as e:
+            with self.lock:
+                self.error = str(e) or e.__class__.__name__
+                self.failures += 1
+                self.retry_at = time.time() + min(RETRY_BACKOFF_MAX, RETRY_BACKOFF * 2 ** (self.failures - 1))
+        finally:
+            with self.lock:
+                self.refreshing = None
+
+    def refresh_async(self):
+        """Start a refresh unless one is already running; returns its future."""
+        with self.lock:
+            if self.refreshing is None:
+                self.refreshing = fanout.submit(self.refresh)
+            return self.refreshing
+
+    def max_refresh_time(self):
+        # A refresh may have to log in again before its GET
+        return 2 * sum(self.timeout)
+
+    def age(self):
+        return time.time() - self.fetched_at if self.fetched_at else None
+
+    def cache_state(self):
+        """(age, error, retry_at) of the cached profile list, read together."""
+        with self.lock:
+            return self.age(), self.error, self.retry_at
+
+    def view(self):
+        with self.lock:
+            age = self.age()
+            if self.profiles is None:
+                state = 'error' if self.error else 'pending'
+            elif self.error or age > FRESH_TTL:
+                state = 'stale'
+            else:
+                state = 'ok'
+            return {
+                'name': self.name,
+                'url': self.url,
+                'state': state,
+                'age': round(age, 3) if age is not None else None,
+                'error': self.error,
+                'profiles': dict(self.profiles or {})
+            }
+
+
+# Load the backend list and gateway users
+def load_config():
+    global users
+    with open(FLEET_FILE, 'r') as f:
+        fleet = json.load(f)
+    backends.clear()
+    for entry in fleet.get('backends', []):
+        backends[entry['name']] = Backend(entry['name'], entry['url'],
+                                          entry.get('username', 'admin'), entry.get('password', ''),
+                                          entry.get('connect_timeout', CONNECT_TIMEOUT),
+                                          entry.get('read_timeout', READ_TIMEOUT))
+
+    if os.path.exists(USERS_FILE):
+        with open(USERS_FILE, 'r') as f:
+            users = json.load(f)
+    else:
+        # Create a default admin user
+        users = {
+            "admin": {
+                "password": hash_password("admin123"),
+                "role": "admin"
+            }
+        }
+        with open(USERS_FILE, 'w') as f:
+            json.dump(users, f, indent=4)
+
+
+# Stale-while-revalidate across all backends, fetched concurrently
+def collect_profiles():
+    blocking = []
+    for backend in backends.values():
+        age, error, retry_at = backend.cache_state()
+        if age is not None and age <= FRESH_TTL:
+            continue
+        # Failing backends are retried in the background after a backoff and
+        # never waited on, so one dead host can't slow down every request
+        if error is not None:
+            if time.time() >= retry_at:
+                backend.refresh_async()
+            continue
+        future = backend.refresh_async()
+        # Too old (or never fetched): wait for it, bounded by the backend's own timeouts
+        if age is None or age > STALE_TTL:
+            blocking.append((backend, future))
+
+    if blocking:
+        deadline = max(backend.max_refresh_time() for backend, _ in blocking)
+        wait([future for _, future in blocking], timeout=deadline)
+
+    return [backend.view() for backend in backends.values()]
+
+
+def fleet_id(backend_name, profile_id):
+    return f'{backend_name}:{profile_id}'
+
+
+def split_fleet_id(value):
+    backend_name, sep, profile_id = value.rpartition(':')
+    if not sep or backend_name not in backends:
+        return None, None
+    return backends[backend_name], profile_id
+
+
+@app.route('/api/login', methods=['POST'])
+def login():
+    payload, status_code = authenticate(users, sessions, request.json)
+    return jsonify(payload), status_code
+
+
+@app.route('/api/logout', methods=['POST'])
+@requires_auth
+def logout():
+    sessions.discard(request.headers.get('Authorization'))
+    return jsonify({"message": "Logged out successfully"}), 200
+
+
+@app.route('/api/fleet/backends', methods=['GET'])
+@requires_auth
+def get_backends():
+    views = collect_profiles()
+    return jsonify([{k: v for k, v in view.items() if k != 'profiles'} for view in views]), 200
+
+
+# Merged profile list keyed by "<backend>:<profile_id>"
+@app.route('/api/fleet/profiles', methods=['GET'])
+@requires_auth
+def get_fleet_profiles():
+    merged = {}
+    backend_states = {}
+    for view in collect_profiles():
+        backend_states[view['name']] = {'state': view['state'], 'age': view['age'], 'error': view['error']}
+        for profile_id, profile in view['profiles'].items():
+            entry = dict(profile)
+            entry['backend'] = view['name']
+            entry['profile_id'] = profile_id
+            entry['stale'] = view['state'] != 'ok'
+            merged[fleet_id(view['name'], profile_id)] = entry
+    return jsonify({"profiles": merged, "backends": backend_states}), 200
+
+
+def forward_action(fleet_profile_id, action):
+    backend, profile_id = split_fleet_id(fleet_profile_id)
+    if backend is None:
+        return jsonify({"error": "Backend not found"}), 404
+
+    try:
+        response = backend.call('POST', f'/api/profiles/{profile_id}/{action}',
+                                timeout=(backend.timeout[0], ACTION_READ_TIMEOUT))
+    except (requests.RequestException, BackendError) as e:
+        return jsonify({"error": f"Backend {backend.name} unavailable: {e}"}), 502
+
+    try:
+        data = response.json()
+    except ValueError:
+        data = {"error": f"Invalid response from backend {backend.name}"}
+
+    # Reflect the result right away; the next read revalidates the rest
+    if response.status_code == 200 and 'status' in data:
+        with backend.lock:
+            if backend.profiles and profile_id in backend.profiles:
+                backend.profiles[profile_id]['status'] = data['status']
+    backend.refresh_async()
+
+    headers = {}
+    if 'Retry-After' in response.headers:
+        headers['Retry-After'] = response.headers['Retry-After']
+    return jsonify(data), response.status_code, headers
+
+
+@app.route('/api/fleet/profiles/<fleet_profile_id>/start', methods=['POST'])
+@requires_auth
+def start_fleet_profile(fleet_profile_id):
+    return forward_action(fleet_profile_id, 'start')
+
+
+@app.route('/api/fleet/profiles/<fleet_profile_id>/stop', methods=['POST'])
+@requires_auth
+def stop_fleet_profile(fleet_profile_id):
+    return forward_action(fleet_profile_id, 'stop')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Gateway that fans out to many remote control servers")
+    parser.add_argument('--host', default='0.0.0.0', help='Host IP to bind to')
+    parser.add_argument('--port', type=int, default=5100, help='Port to bind to')
+    parser.add_argument('--fleet', default=FLEET_FILE, help='Path to the backend list')
+    parser.add_argument('--users', default=USERS_FILE, help='Path to the gateway users file')
+    args = parser.parse_args()
+
+    FLEET_FILE = args.fleet
+    USERS_FILE = args.users
+    load_config()
+    print(f"Gateway managing {len(backends)} backends")
+
+    app.run(host=args.host, port=args.port, debug=False, threaded=True)
@@ -0,0 +1,474 @@
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from collections import namedtuple
+
+from exit_watcher import ExitWatcher
+from process_tuning import apply_tuning
+
+try:
+    import psutil
+except ImportError:  # The /proc and fake backends work without psutil
+    psutil = None
+
+ProcessInfo = namedtuple('ProcessInfo', ['pid', 'name', 'exe'])
+
+
+class ProcessSnapshot:
+    """One enumeration of the process table, indexed for repeated lookups."""
+
+    def __init__(self, processes, name_limit=None, resolve_exe=None):
+        self.processes = processes
+        self.taken_at = time.time()
+        self.name_limit = name_limit
+        self.resolve_exe = resolve_exe
+        self.by_name = {}
+        self.by_exe = {}
+        for proc in processes:
+            if proc.name:
+                self.by_name.setdefault(proc.name.lower(), []).append(proc.pid)
+            if proc.exe:
+                self.by_exe.setdefault(proc.exe.lower(), proc.pid)
+
+    def find(self, exe_path, exclude=()):
+        """Return (running, pid) for the first process matching exe_path, skipping pids in exclude."""
+        exe_name = os.path.basename(exe_path).lower()
+        for pid in self.by_name.get(exe_name, ()):
+            if pid not in exclude:
+                return True, pid
+
+        pid = self.by_exe.get(exe_path.lower())
+        if pid and pid not in exclude:
+            return True, pid
+
+        # Kernel process names are truncated, so confirm long names via the exe link
+        if self.name_limit and self.resolve_exe and len(exe_name) > self.name_limit:
+            for pid in self.by_name.get(exe_name[:self.name_limit], []):
+                if pid in exclude:
+                    continue
+                exe = self.resolve_exe(pid)
+                if exe and (os.path.basename(exe).lower() == exe_name or exe.lower() == exe_path.lower()):
+                    return True, pid
+
+        return False, None
+
+    def find_all(self, exe_path):
+        """Every pid whose process name or executable matches exe_path."""
+        exe_name = os.path.basename(exe_path).lower()
+        pids = list(self.by_name.get(exe_name, ()))
+        pid = self.by_exe.get(exe_path.lower())
+        if pid and pid not in pids:
+            pids.append(pid)
+        if self.name_limit and self.resolve_exe and len(exe_name) > self.name_limit:
+            for pid in self.by_name.get(exe_name[:self.name_limit], []):
+                exe = self.resolve_exe(pid)
+                if pid not in pids and exe and (os.path.basename(exe).lower() == exe_name
+                                                or exe.lower() == exe_path.lower()):
+                    pids.append(pid)
+        return pids
+
+
+class ProcessBackend:
+    """Interface for enumerating, inspecting, launching and signalling processes."""
+
+    name = 'base'
+
+    def processes(self):
+        """Return a list of ProcessInfo for every visible process."""
+        raise NotImplementedError
+
+    def snapshot(self):
+        return ProcessSnapshot(self.processes())
+
+    def find(self, exe_path):
+        return self.snapshot().find(exe_path)
+
+    def info(self, pid):
+        """Return ProcessInfo for pid, or None if it does not exist."""
+        raise NotImplementedError
+
+    def children(self, pid):
+        """Return the pids of every descendant of pid."""
+        raise NotImplementedError
+
+    def memory(self, pid):
+        """Resident memory of pid in bytes (0 if it is gone)."""
+        raise NotImplementedError
+
+    def launch(self, cmd):
+        """Start cmd without waiting and return its Popen handle."""
+        return subprocess.Popen(cmd, **creation_kwargs())
+
+    def tune(self, pid, tuning):
+        """Apply a profile's tuning settings to pid; returns a list of errors."""
+        return apply_tuning(pid, tuning)
+
+    def signal(self, pid, sig):
+        os.kill(pid, sig)
+
+    def terminate(self, pid):
+        self.signal(pid, signal.SIGTERM)
+
+    def kill(self, pid):
+        self.signal(pid, getattr(signal, 'SIGKILL', signal.SIGTERM))
+
+    def wait(self, pids, timeout=None):
+        """Wait for pids to exit; return (gone, alive) lists of pids."""
+        raise NotImplementedError
+
+    def exit_watcher(self, on_exit):
+        """Event-driven exit notifications for this backend's pids, or None to rely on polling."""
+        return ExitWatcher(on_exit) if ExitWatcher.supported() else None
+
+
+# Platform specific Popen arguments for detached, windowless children
+def creation_kwargs():
+    if sys.platform == 'win32':
+        return {'creationflags': subprocess.CREATE_NO_WINDOW}
+    # Own session, so the child survives the server and ignores its Ctrl-C
+    return {'start_new_session': True}
+
+
+class PsutilBackend(ProcessBackend):
+    name = 'psutil'
+
+    def processes(self):
+        result = []
+        for proc in psutil.process_iter(['pid', 'name', 'exe']):
+            try:
+                result.append(ProcessInfo(proc.info['pid'], proc.info['name'], proc.info.get('exe')))
+            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                pass
+        return result
+
+    def info(self, pid):
+        try:
+            proc = psutil.Process(pid)
+            with proc.oneshot():
+                try:
+                    exe = proc.exe()
+                except (psutil.AccessDenied, psutil.ZombieProcess):
+                    exe = None
+                return ProcessInfo(pid, proc.name(), exe)
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            return None
+
+    def children(self, pid):
+        try:
+            return [child.pid for child in psutil.Process(pid).children(recursive=True)]
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            return []
+
+    def memory(self, pid):
+        try:
+            return psutil.Process(pid).memory_info().rss
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            return 0
+
+    def signal(self, pid, sig):
+        psutil.Process(pid).send_signal(sig)
+
+    def terminate(self, pid):
+        psutil.Process(pid).terminate()
+
+    def kill(self, pid):
+        psutil.Process(pid).kill()
+
+    def wait(self, pids, timeout=None):
+        procs = []
+        gone = []
+        for pid in pids:
+            try:
+                procs.append(psutil.Process(pid))
+            except psutil.NoSuchProcess:
+                gone.append(pid)
+        done, alive = psutil.wait_procs(procs, timeout=timeout)
+        return gone + [p.pid for p in done], [p.pid for p in alive]
+
+
+class ProcBackend(ProcessBackend):
+    """Linux backend that reads /proc directly instead of going through psutil.
+
+    The process name comes from the comm field embedded in /proc/<pid>/stat, so
+    a full enumeration costs one small read per pid. The kernel truncates comm
+    to 15 characters; longer names are confirmed through the /proc/<pid>/exe
+    link only for the few candidates that share the truncated prefix.
+    """
+
+    name = 'proc'
+    COMM_LIMIT = 15
+
+    def __init__(self, proc_root='/proc'):
+        self.proc_root = proc_root
+
+    @staticmethod
+    def available():
+        return sys.platform.startswith('linux') and os.path.exists('/proc/self/stat')
+
+    def _read_stat(self, pid):
+        try:
+            with open(f'{self.proc_root}/{pid}/stat', 'rb') as f:
+                data = f.read()
+        except (FileNotFoundError, ProcessLookupError, PermissionError):
+            return None
+        # Format: "pid (comm) state ..." where comm may itself contain ')'
+        open_paren = data.find(b'(')
+        close_paren = data.rfind(b')')
+        if open_paren < 0 or close_paren < 0:
+            return None
+        comm = data[open_paren + 1:close_paren].decode('utf-8', 'replace')
+        fields = data[close_paren + 2:].split(b' ', 2)
+        state = fields[0].decode('ascii', 'replace')
+        ppid = int(fields[1]) if len(fields) > 1 and fields[1].isdigit() else 0
+        return comm, state, ppid
+
+    def resolve_exe(self, pid):
+        try:
+            return os.readlink(f'{self.proc_root}/{pid}/exe')
+        except OSError:
+            return None
+
+    def processes(self):
+        result = []
+        for entry in os.scandir(self.proc_root):
+            if not entry.name.isdigit():
+                continue
+            stat = self._read_stat(entry.name)
+            if stat is None or stat[1] in ('Z', 'X'):
+                continue
+            result.append(ProcessInfo(int(entry.name), stat[0], None))
+        return result
+
+    def snapshot(self):
+        return ProcessSnapshot(self.processes(), name_limit=self.COMM_LIMIT, resolve_exe=self.resolve_exe)
+
+    def children(self, pid):
+        # One pass over /proc building the parent -> children map, then walk it
+        by_parent = {}
+        for entry in os.scandir(self.proc_root):
+            if entry.name.isdigit():
+                stat = self._read_stat(entry.name)
+                if stat is not None and stat[1] not in ('Z', 'X'):
+                    by_parent.setdefault(stat[2], []).append(int(entry.name))
+        descendants = []
+        pending = [pid]
+        while pending:
+            for child in by_parent.get(pending.pop(), []):
+                descendants.append(child)
+                pending.append(child)
+        return descendants
+
+    def memory(self, pid):
+        # statm: size resident shared ... in pages
+        try:
+            with open(f'{self.proc_root}/{pid}/statm', 'rb') as f:
+                return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        except (OSError, IndexError, ValueError):
+            return 0
+
+    def info(self, pid):
+        stat = self._read_stat(pid)
+        if stat is None or stat[1] in ('Z', 'X'):
+            return None
+        return ProcessInfo(pid, stat[0], self.resolve_exe(pid))
+
+    def _exited(self, pid):
+        # Reap our own children so they don't linger as zombies
+        try:
+            reaped, _ = os.waitpid(pid, os.WNOHANG)
+            if reaped == pid:
+                return True
+        except ChildProcessError:
+            pass
+        stat = self._read_stat(pid)
+        return stat is None or stat[1] in ('Z', 'X')
+
+    def wait(self, pids, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        alive = list(pids)
+        gone = []
+        delay = 0.005
+        while alive:
+            still_alive = []
+            for pid in alive:
+                (gone if self._exited(pid) else still_alive).append(pid)
+            alive = still_alive
+            if not alive or (deadline is not None and time.monotonic() >= deadline):
+                break
+            time.sleep(delay if deadline is None else min(delay, max(0, deadline - time.monotonic())))
+            delay = min(delay * 2, 0.1)
+        return gone, alive
+
+
+class FakePopen:
+    """Minimal Popen stand-in returned by FakeBackend.launch."""
+
+    def __init__(self, backend, pid, args):
+        self.backend = backend
+        self.pid = pid
+        self.args = args
+        self.returncode = None
+
+    def poll(self):
+        if self.returncode is None and self.pid not in self.backend.table:
+            self.returncode = self.backend.exit_codes.get(self.pid, 0)
+        return self.returncode
+
+    def wait(self, timeout=None):
+        gone, alive = self.backend.wait([self.pid], timeout)
+        if alive:
+            raise subprocess.TimeoutExpired(self.args, timeout)
+        return self.poll()
+
+    def send_signal(self, sig):
+        self.backend.signal(self.pid, sig)
+
+    def terminate(self):
+        self.backend.terminate(self.pid)
+
+    def kill(self):
+        self.backend.kill(self.pid)
+
+
+class FakeExitWatcher:
+    """ExitWatcher counterpart for FakeBackend: exits are reported by signal()."""
+
+    def __init__(self, backend, on_exit):
+        self.backend = backend
+        self.on_exit = on_exit
+        self.watched = {}  # {pid: key}
+
+    def start(self):
+        pass
+
+    def watch(self, pid, key):
+        with self.backend.lock:
+            alive = pid in self.backend.table
+            if alive:
+                self.watched[pid] = key
+        if not alive:
+            self._notify(key, pid)
+        return True
+
+    def unwatch(self, pid):
+        with self.backend.lock:
+            self.watched.pop(pid, None)
+
+    def is_watched(self, pid):
+        with self.backend.lock:
+            return pid in self.watched
+
+    # Called by FakeBackend without its lock held
+    def process_exited(self, pid):
+        with self.backend.lock:
+            key = self.watched.pop(pid, None)
+        if key is not None:
+            self._notify(key, pid)
+
+    def _notify(self, key, pid):
+        try:
+            self.on_exit(key, pid, self.backend.exit_codes.get(pid))
+        except Exception as e:
+            print(f"Error handling exit of pid {pid}: {e}")
+
+
+class FakeBackend(ProcessBackend):
+    """In-memory process table for tests and benchmarks; nothing is really run."""
+
+    name = 'fake'
+
+    def __init__(self, process_count=0):
+        self.lock = threading.Condition()
+        self.table = {}
+        self.exit_codes = {}
+        self.tuned = {}  # {pid: tuning} as applied by tune()
+        self.memory_usage = {}  # {pid: bytes} reported by memory(); unset pids use 0
+        self.watchers = []
+        self.next_pid = 1000
+        for i in range(process_count):
+            self.add_process(f'/usr/lib/fake/background-{i}')
+
+    def add_process(self, exe_path):
+        with self.lock:
+            self.next_pid += 1
+            self.table[self.next_pid] = ProcessInfo(self.next_pid, os.path.basename(exe_path), exe_path)
+            return self.next_pid
+
+    def processes(self):
+        with self.lock:
+            return list(self.table.values())
+
+    def info(self, pid):
+        with self.lock:
+            return self.table.get(pid)
+
+    def children(self, pid):
+        return []
+
+    def memory(self, pid):
+        with self.lock:
+            return self.memory_usage.get(pid, 0) if pid in self.table else 0
+
+    def launch(self, cmd):
+        return FakePopen(self, self.add_process(cmd[0]), cmd)
+
+    def tune(self, pid, tuning):
+        with self.lock:
+            if pid not in self.table:
+                return [f"No such process: {pid}"]
+            self.tuned[pid] = tuning
+        return []
+
+    def signal(self, pid, sig):
+        with self.lock:
+            if pid not in self.table:
+                raise ProcessLookupError(pid)
+            exited = sig in (signal.SIGTERM, getattr(signal, 'SIGKILL', signal.SIGTERM))
+            if exited:
+                del self.table[pid]
+                self.exit_codes[pid] = -sig
+                self.lock.notify_all()
+        if exited:
+            for watcher in self.watchers:
+                watcher.process_exited(pid)
+
+    def exit_watcher(self, on_exit):
+        # Fake pids mean nothing to the kernel, so pidfds can't be used
+        watcher = FakeExitWatcher(self, on_exit)
+        self.watchers.append(watcher)
+        return watcher
+
+    def wait(self, pids, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.lock:
+            while True:
+                alive = [pid for pid in pids if pid in self.table]
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if not alive or (remaining is not None and remaining <= 0):
+                    break
+                self.lock.wait(remaining)
+        return [pid for pid in pids if pid not in alive], alive
+
+
+BACKENDS = {
+    'psutil': PsutilBackend,
+    'proc': ProcBackend,
+    'fake': FakeBackend,
+}
+
+
+# Pick a backend: RC_PROCESS_BACKEND wins, then /proc on Linux, then psutil
+def default_backend(name=None):
+    name = name or os.environ.get('RC_PROCESS_BACKEND')
+    if name:
+        if name not in BACKENDS:
+            raise ValueError(f"Unknown process backend: {name}")
+        return BACKENDS[name]()
+    if ProcBackend.available():
+        return ProcBackend()
+    if psutil is not None:
+        return PsutilBackend()
+    raise RuntimeError("No process backend available: install psutil")
@@ -0,0 +1,177 @@
+import ctypes
+import os
+import platform
+import sys
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+IONICE_CLASSES = ('realtime', 'best-effort', 'idle')
+RLIMITS = ('memory', 'nofile')
+
+# Linux ioprio_set(2): no libc wrapper, so call the syscall directly
+IOPRIO_SYSCALLS = {'x86_64': 251, 'aarch64': 30, 'i386': 289, 'i686': 289, 'armv7l': 314, 'ppc64le': 273}
+IOPRIO_WHO_PROCESS = 1
+IOPRIO_CLASS_SHIFT = 13
+IOPRIO_CLASS_NUMBERS = {'realtime': 1, 'best-effort': 2, 'idle': 3}
+
+
+class TuningError(ValueError):
+    pass
+
+
+# JSON true/false arrive as bool, which is a subclass of int
+def is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def parse_tuning(data):
+    """Validate a profile's tuning settings; returns a normalised dict.
+
+    Accepted keys (all optional): affinity (list of CPU numbers), nice
+    (-20..19), ionice ({"class": realtime|best-effort|idle, "level": 0..7})
+    and rlimits ({"memory": bytes, "nofile": count}).
+    """
+    if data is None:
+        return None
+    if not isinstance(data, dict):
+        raise TuningError("tuning must be a JSON object")
+    unknown = set(data) - {'affinity', 'nice', 'ionice', 'rlimits'}
+    if unknown:
+        raise TuningError(f"Unknown tuning settings: {', '.join(sorted(unknown))}")
+
+    tuning = {}
+    affinity = data.get('affinity')
+    if affinity is not None:
+        cpu_count = os.cpu_count() or 1
+        if not isinstance(affinity, list) or not affinity \
+                or not all(is_int(cpu) and 0 <= cpu < cpu_count for cpu in affinity):
+            raise TuningError(f"affinity must be a non-empty list of CPUs between 0 and {cpu_count - 1}")
+        tuning['affinity'] = sorted(set(affinity))
+
+    nice = data.get('nice')
+    if nice is not None:
+        if not is_int(nice) or not -20 <= nice <= 19:
+            raise TuningError("nice must be an integer from -20 to 19")
+        tuning['nice'] = nice
+
+    ionice = data.get('ionice')
+    if ionice is not None:
+        if not isinstance(ionice, dict) or ionice.get('class') not in IONICE_CLASSES:
+            raise TuningError(f"ionice class must be one of {', '.join(IONICE_CLASSES)}")
+        level = ionice.get('level', 4)
+        if not is_int(level) or not 0 <= level <= 7:
+            raise TuningError("ionice level must be an integer from 0 to 7")
+        tuning['ionice'] = {'class': ionice['class'], 'level': 0 if ionice['class'] == 'idle' else level}
+
+    rlimits = data.get('rlimits')
+    if rlimits is not None:
+        if not isinstance(rlimits, dict) or set(rlimits) - set(RLIMITS):
+            raise TuningError(f"rlimits may only set {', '.join(RLIMITS)}")
+        for name, value in rlimits.items():
+            if value is not None and (not is_int(value) or value <= 0):
+                raise TuningError(f"rlimit {name} must be a positive integer")
+        limits = {name: value for name, value in rlimits.items() if value is not None}
+        if limits:
+            tuning['rlimits'] = limits
+
+    return tuning or None
+
+
+# Linux applies scheduling attributes per thread, so set them on every task
+def _threads(pid):
+    try:
+        return [int(tid) for tid in os.listdir(f'/proc/{pid}/task')]
+    except OSError:
+        return [pid]
+
+
+def set_affinity(pid, cpus):
+    if hasattr(os, 'sched_setaffinity'):
+        for tid in _threads(pid):
+            os.sched_setaffinity(tid, cpus)
+    elif psutil is not None:
+        psutil.Process(pid).cpu_affinity(cpus)
+    else:
+        raise NotImplementedError("CPU affinity is not supported on this platform")
+
+
+def set_nice(pid, nice):
+    if hasattr(os, 'setpriority'):
+        for tid in _threads(pid):
+            os.setpriority(os.PRIO_PROCESS, tid, nice)
+    elif psutil is not None and sys.platform == 'win32':
+        # Windows has priority classes rather than nice levels
+        if nice <= -10:
+            priority = psutil.HIGH_PRIORITY_CLASS
+        elif nice < 0:
+            priority = psutil.ABOVE_NORMAL_PRIORITY_CLASS
+        elif nice == 0:
+            priority = psutil.NORMAL_PRIORITY_CLASS
+        elif nice < 10:
+            priority = psutil.BELOW_NORMAL_PRIORITY_CLASS
+        else:
+            priority = psutil.IDLE_PRIORITY_CLASS
+        psutil.Process(pid).nice(priority)
+    else:
+        raise NotImplementedError("Priorities are not supported on this platform")
+
+
+def set_ionice(pid, ionice):
+    syscall = IOPRIO_SYSCALLS.get(platform.machine()) if sys.platform.startswith('linux') else None
+    if syscall is not None:
+        libc = ctypes.CDLL(None, use_errno=True)
+        value = (IOPRIO_CLASS_NUMBERS[ionice['class']] << IOPRIO_CLASS_SHIFT) | ionice['level']
+        for tid in _threads(pid):
+            if libc.syscall(syscall, IOPRIO_WHO_PROCESS, tid, value) < 0:
+                error = ctypes.get_errno()
+                raise OSError(error, os.strerror(error))
+    elif psutil is not None and sys.platform == 'win32':
+        priority = {'realtime': psutil.IOPRIO_HIGH, 'idle': psutil.IOPRIO_VERYLOW}.get(
+            ionice['class'], psutil.IOPRIO_LOW if ionice['level'] > 4 else psutil.IOPRIO_NORMAL)
+        psutil.Process(pid).ionice(priority)
+    else:
+        raise NotImplementedError("I/O priorities are not supported on this platform")
+
+
+def set_rlimits(pid, rlimits):
+    if resource is None or not hasattr(resource, 'prlimit'):
+        raise NotImplementedError("rlimits are not supported on this platform")
+    for name, value in rlimits.items():
+        limit = resource.RLIMIT_AS if name == 'memory' else resource.RLIMIT_NOFILE
+        soft, hard = resource.prlimit(pid, limit)
+        # Raising the hard limit needs privileges, lowering it is irreversible; only move it if we must
+        if hard != resource.RLIM_INFINITY and value > hard:
+            hard = value
+        resource.prlimit(pid, limit, (value, hard))
+
+
+SETTERS = [
+    ('affinity', set_affinity),
+    ('nice', set_nice),
+    ('ionice', set_ionice),
+    ('rlimits', set_rlimits),
+]
+
+
+def apply_tuning(pid, tuning):
+    """Apply tuning to one process; returns a list of errors (empty on success)."""
+    errors = []
+    for name, setter in SETTERS:
+        value = (tuning or {}).get(name)
+        if value is None:
+            continue
+        try:
+            setter(pid, value)
+        except (OSError, ValueError, NotImplementedError) as e:
+            errors.append(f"{name}: {e}")
+        except Exception as e:  # psutil.Error and friends
+            errors.append(f"{name}: {e.__class__.__name__}: {e}")
+    return errors
@@ -1,13 +1,22 @@
 import os
-import subprocess
+import gzip
 import json
-import hashlib
 import time
-import threading
-from flask import Flask, request, jsonify, session
+import argparse
+import atexit
+from flask import Flask, Response, request, jsonify, session
 from flask_cors import CORS
-import psutil
 import secrets
+from tracing import tracer, trace_id_from_headers
+from control_engine import ControlEngine, parse_profile_record, parse_profiles_file
+from admission import AdmissionController
+from scheduler import Schedule, Scheduler, ScheduleError
+from audit_log import AuditLog
+from auth import SessionStore, authenticate, hash_password
+from file_watcher import FileWatcher
+from process_tuning import parse_tuning, TuningError
+from cgroups import CgroupError, parse_cgroup_limits
+from warm_pool import WarmPoolError, parse_warm_pool
 
 app = Flask(__name__)
 CORS(app)  # Enable cross-origin requests
@@ -16,25 +25,53 @@ app.secret_key = secrets.token_hex(16)  # For session management
 # Configuration
 CONFIG_FILE = 'config.json'
 USERS_FILE = 'users.json'
+SCHEDULES_FILE = 'schedules.json'
+SCHEDULE_CATCH_UP = 'once'  # Missed runs after a restart: 'skip', 'once' or 'all'
+AUDIT_DIR = 'audit'
+AUDIT_SEGMENT_BYTES = 8 * 1024 * 1024  # Rotate audit segments at this size
 SESSION_TIMEOUT = 1800  # 30 minutes
+EVENTS_MAX_TIMEOUT = 60  # Longest a /api/events long-poll may block
+STATUS_CACHE_TTL = 2  # Seconds a process scan result is reused by read endpoints
+STATUS_POLL_INTERVAL = 30  # Seconds between background status scans
+RELOAD_POLL_INTERVAL = 1  # Seconds between config file checks where inotify is unavailable
+WARM_POOL_MEMORY_BUDGET = 512 * 1024 * 1024  # Bytes all suspended standby instances may use together
+GZIP_MIN_BYTES = 1024  # JSON responses smaller than this are sent uncompressed
+
+# Admission control for expensive operations (process scans, starts, stops)
+ADMISSION_MAX_CONCURRENT = 4  # Expensive operations running at once
+ADMISSION_QUEUE_TIMEOUT = 2  # Seconds a request may wait for a free slot
+ADMISSION_MAX_QUEUED = 32  # Requests allowed to wait at once
+ADMISSION_RATE = 5  # Expensive operations per second per session
+ADMISSION_BURST = 10
+
+# Profiles, their processes and statuses (see control_engine.py); the socket
+# server shares this engine when both run in one process (combined-server.py)
+engine = ControlEngine(CONFIG_FILE, status_ttl=STATUS_CACHE_TTL, warm_pool_memory=WARM_POOL_MEMORY_BUDGET)
+
+# Status change notifications for long-poll subscribers
+status_feed = engine.status_feed
 
-# In-memory storage for executable profiles and their statuses
-exe_profiles = {}
 users = {}
-active_sessions = {}
+sessions = SessionStore(SESSION_TIMEOUT)
+check_session = sessions.check
+requires_auth = sessions.requires_auth
+current_user = sessions.current_user
+
+admission = AdmissionController(max_concurrent=ADMISSION_MAX_CONCURRENT,
+                                queue_timeout=ADMISSION_QUEUE_TIMEOUT,
+                                max_queued=ADMISSION_MAX_QUEUED,
+                                rate=ADMISSION_RATE, burst=ADMISSION_BURST)
+
+# Who did what: logins, profile edits and start/stop actions
+audit = AuditLog(AUDIT_DIR, max_segment_bytes=AUDIT_SEGMENT_BYTES)
 
 
 # Load configuration from file
 def load_config():
-    global exe_profiles, users
+    global users
     try:
-        if os.path.exists(CONFIG_FILE):
-            with open(CONFIG_FILE, 'r') as f:
-                exe_profiles = json.load(f)
-        else:
-            # Create default config if it doesn't exist
-            exe_profiles = {}
-            save_config()
+        engine.config_file = CONFIG_FILE
+        engine.load()
 
         if os.path.exists(USERS_FILE):
             with open(USERS_FILE, 'r') as f:
@@ -43,7 +80,7 @@ def load_config():
             # Create a default admin user
             users = {
                 "admin": {
-                    "password": hashlib.sha256("admin123".encode()).hexdigest(),
+                    "password": hash_password("admin123"),
                     "role": "admin"
                 }
             }
@@ -52,142 +89,188 @@ def load_config():
         print(f"Error loading configuration: {e}")
 
 
-# Save configuration to file
-def save_config():
-    with open(CONFIG_FILE, 'w') as f:
-        json.dump(exe_profiles, f, indent=4)
+def save_users():
+    engine.write_json_file(USERS_FILE, users)
+
+
+def parse_users_file(data):
+    if not isinstance(data, dict):
+        raise ValueError("Users file must be a JSON object")
+    for username, user in data.items():
+        if not isinstance(user, dict) or not isinstance(user.get('password'), str) \
+                or not isinstance(user.get('role'), str):
+            raise ValueError(f"User {username}: password and role are required")
+    return data
+
+
+def apply_user_changes(loaded):
+    global users
+    current = users
+    added = [username for username in loaded if username not in current]
+    removed = [username for username in current if username not in loaded]
+    changed = [username for username in loaded if username in current and current[username] != loaded[username]]
+    if not (added or removed or changed):
+        return None
+
+    users = loaded
+    # Sessions survive a reload, except those of users that no longer exist
+    sessions.discard_users(removed)
+    return {'added': added, 'removed': removed, 'changed': changed}
+
+
+# Called from the file watcher thread when config.json or users.json changes
+def reload_file(key):
+    path, parse, apply = {
+        'config': (CONFIG_FILE, parse_profiles_file, engine.apply_profile_changes),
+        'users': (USERS_FILE, parse_users_file, apply_user_changes)
+    }[key]
+    with engine.config_lock:
+        try:
+            with open(path, 'rb') as f:
+                content = f.read()
+        except FileNotFoundError:
+            print(f"{path} was removed; keeping the running configuration")
+            return
+        if engine.is_own_write(content):
+            return
 
+        try:
+            loaded = parse(json.loads(content))
+        except ValueError as e:
+            # Invalid edits never touch the running state
+            print(f"Rejected changes to {path}: {e}")
+            audit.record('config_reload_rejected', None, file=path, error=str(e))
+            return
+        changes = apply(loaded)
 
-def save_users():
-    with open(USERS_FILE, 'w') as f:
-        json.dump(users, f, indent=4)
+    if changes:
+        print(f"Reloaded {path}: " + ', '.join(f"{len(v)} {k}" for k, v in changes.items()))
+        audit.record('config_reloaded', None, file=path, **changes)
 
 
-# Function to check if a process is running
-def is_process_running(exe_path):
-    exe_name = os.path.basename(exe_path)
-    for proc in psutil.process_iter(['pid', 'name', 'exe']):
-        try:
-            # Check if the executable name matches
-            if proc.info['name'].lower() == exe_name.lower():
-                return True, proc.info['pid']
-            # Also check the full path if available
-            if 'exe' in proc.info and proc.info['exe'] and proc.info['exe'].lower() == exe_path.lower():
-                return True, proc.info['pid']
-        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-            pass
-    return False, None
-
-
-# Function to start an executable
-def start_executable(exe_path, arguments=None):
-    if not os.path.exists(exe_path):
-        return False, "Executable not found"
+config_watcher = FileWatcher(reload_file, poll_interval=RELOAD_POLL_INTERVAL)
+
 
+# Scheduler callback: runs on the scheduler's action pool
+def run_scheduled_action(action, profile_id):
+    tracer.begin_trace()
     try:
-        cmd = [exe_path]
-        if arguments:
-            cmd.extend(arguments.split())
+        if action == 'start':
+            success, message = engine.start_profile(profile_id, 'schedule')
+        else:
+            success, message = engine.stop_profile(profile_id, 'schedule')
+        audit.record(action, 'scheduler', profile_id=profile_id, success=success, message=message)
+        return success, message
+    finally:
+        tracer.end_trace()
 
-        # Use subprocess.Popen to start the process without waiting
-        subprocess.Popen(cmd, creationflags=subprocess.CREATE_NO_WINDOW)
-        return True, "Process started"
-    except Exception as e:
-        return False, str(e)
 
+scheduler = Scheduler(run_scheduled_action, SCHEDULES_FILE, catch_up=SCHEDULE_CATCH_UP)
 
-# Function to stop an executable
-def stop_executable(exe_path):
-    running, pid = is_process_running(exe_path)
-    if running and pid:
-        try:
-            process = psutil.Process(pid)
-            process.terminate()
-            # Wait for the process to terminate
-            gone, alive = psutil.wait_procs([process], timeout=3)
-            if alive:
-                # Force kill if it doesn't terminate gracefully
-                process.kill()
-            return True, "Process stopped"
-        except Exception as e:
-            return False, str(e)
-    return False, "Process not found"
-
-
-# Function to check status of all executables
-def update_all_statuses():
-    for profile_id, profile in exe_profiles.items():
-        running, pid = is_process_running(profile['path'])
-        profile['status'] = 'running' if running else 'stopped'
-        profile['pid'] = pid if running else None
-
-        # Check if file exists
-        if not os.path.exists(profile['path']):
-            profile['status'] = 'unknown'
-
-
-# Authentication middleware
-def requires_auth(f):
-    def decorated(*args, **kwargs):
-        token = request.headers.get('Authorization')
-        if not token or token not in active_sessions:
-            return jsonify({"error": "Unauthorized"}), 401
 
-        # Check if session has expired
-        session_data = active_sessions[token]
-        if time.time() - session_data['timestamp'] > SESSION_TIMEOUT:
-            del active_sessions[token]
-            return jsonify({"error": "Session expired"}), 401
+def busy_response(retry_after):
+    response = jsonify({"error": "Server busy, try again later"})
+    response.headers['Retry-After'] = str(retry_after)
+    return response, 429
+
 
-        # Update session timestamp
-        active_sessions[token]['timestamp'] = time.time()
-        return f(*args, **kwargs)
+# Admission control for expensive endpoints; use below @requires_auth
+def admission_controlled(f):
+    def decorated(*args, **kwargs):
+        with tracer.span('admission.wait'):
+            admitted, retry_after = admission.acquire(request.headers.get('Authorization'))
+        if not admitted:
+            return busy_response(retry_after)
+        try:
+            return f(*args, **kwargs)
+        finally:
+            admission.release()
 
     decorated.__name__ = f.__name__
     return decorated
 
 
+# Tracing hooks: continue the caller's trace if it sent one
+@app.before_request
+def begin_request_trace():
+    if tracer.enabled:
+        trace_id, parent_span_id = trace_id_from_headers(request.headers)
+        tracer.begin_trace(trace_id, parent_span_id)
+
+
+@app.after_request
+def end_request_trace(response):
+    if tracer.enabled and tracer.trace_id:
+        response.headers['X-Trace-Id'] = tracer.trace_id
+    return response
+
+
+# gzip JSON responses for clients that accept it (the phone app does); the
+# profile list shrinks about tenfold, which matters on slow mobile links
+@app.after_request
+def compress_response(response):
+    if response.mimetype != 'application/json' or response.direct_passthrough \
+            or 'Content-Encoding' in response.headers \
+            or 'gzip' not in request.headers.get('Accept-Encoding', ''):
+        return response
+    data = response.get_data()
+    if len(data) < GZIP_MIN_BYTES:
+        return response
+    response.set_data(gzip.compress(data, compresslevel=6))
+    response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+@app.teardown_request
+def clear_request_trace(exc):
+    if tracer.enabled:
+        tracer.end_trace()
+
+
 # API Endpoints
 @app.route('/api/login', methods=['POST'])
 def login():
-    data = request.json
-    username = data.get('username')
-    password = data.get('password')
-
-    if not username or not password:
-        return jsonify({"error": "Username and password required"}), 400
-
-    # Check credentials
-    if username in users and users[username]['password'] == hashlib.sha256(password.encode()).hexdigest():
-        # Generate token
-        token = secrets.token_hex(16)
-        active_sessions[token] = {
-            'username': username,
-            'timestamp': time.time()
-        }
-        return jsonify({"token": token, "role": users[username]['role']}), 200
-    else:
-        return jsonify({"error": "Invalid credentials"}), 401
+    data = request.json or {}
+    payload, status_code = authenticate(users, sessions, data)
+    if status_code == 200:
+        audit.record('login', data['username'], remote_addr=request.remote_addr)
+    elif status_code == 401:
+        audit.record('login_failed', data.get('username'), remote_addr=request.remote_addr)
+    return jsonify(payload), status_code
 
 
 @app.route('/api/logout', methods=['POST'])
 @requires_auth
 def logout():
-    token = request.headers.get('Authorization')
-    if token in active_sessions:
-        del active_sessions[token]
+    audit.record('logout', current_user())
+    sessions.discard(request.headers.get('Authorization'))
     return jsonify({"message": "Logged out successfully"}), 200
 
 
 @app.route('/api/profiles', methods=['GET'])
 @requires_auth
 def get_profiles():
-    update_all_statuses()  # Update all statuses before sending
-    return jsonify(exe_profiles), 200
+    # Recent scan results are served as-is; only stale ones trigger a rescan
+    if not engine.status_is_fresh():
+        admitted, retry_after = admission.try_acquire(request.headers.get('Authorization'))
+        if admitted:
+            try:
+                engine.refresh_statuses()
+            finally:
+                admission.release()
+        elif not engine.last_status_scan:
+            return busy_response(retry_after)
+        # Otherwise fall back to the last known statuses under overload
+
+    response = jsonify(engine.profiles)
+    response.headers['X-Status-Age'] = str(round(time.time() - engine.last_status_scan, 3))
+    return response, 200
 
 
 @app.route('/api/profiles', methods=['POST'])
 @requires_auth
+@admission_controlled
 def add_profile():
     data = request.json
     required_fields = ['name', 'path']
@@ -196,74 +279,267 @@ def add_profile():
         if field not in data:
             return jsonify({"error": f"Missing required field: {field}"}), 400
 
-    profile_id = str(int(time.time()))  # Simple ID generation
-    exe_profiles[profile_id] = {
+    try:
+        tuning = parse_tuning(data.get('tuning'))
+        cgroup = parse_cgroup_limits(data.get('cgroup'))
+        pool = parse_warm_pool(data.get('warm_pool'))
+    except (TuningError, CgroupError, WarmPoolError) as e:
+        return jsonify({"error": str(e)}), 400
+
+    profile = {
         'name': data['name'],
         'path': data['path'],
         'arguments': data.get('arguments', ''),
         'status': 'unknown',
         'pid': None
     }
-
-    # Check initial status
-    running, pid = is_process_running(data['path'])
-    exe_profiles[profile_id]['status'] = 'running' if running else 'stopped'
-    exe_profiles[profile_id]['pid'] = pid if running else None
-
-    # Check if file exists
-    if not os.path.exists(data['path']):
-        exe_profiles[profile_id]['status'] = 'unknown'
-
-    save_config()
-    return jsonify(exe_profiles[profile_id]), 201
+    if tuning:
+        profile['tuning'] = tuning
+    if cgroup is not None:
+        profile['cgroup'] = cgroup
+    if pool:
+        profile['warm_pool'] = pool
+
+    # Checks the initial status, saves and starts the warm pool
+    with engine.config_lock:
+        profile_id = engine.new_profile_id()
+        engine.add_profiles({profile_id: profile}, 'add')
+    audit.record('profile_added', current_user(), profile_id=profile_id,
+                 name=data['name'], path=data['path'], arguments=data.get('arguments', ''))
+    return jsonify(profile), 201
+
+
+# Bulk import of newline-delimited JSON profiles, one record per line:
+#   {"name": ..., "path": ..., "arguments": ..., "id", "tuning", "cgroup", "warm_pool": optional}
+# Records are validated as the body streams in; valid ones are added with a
+# single process scan and a single save. ?strict=1 adds nothing if any fail.
+@app.route('/api/profiles/import', methods=['POST'])
+@requires_auth
+@admission_controlled
+def import_profiles():
+    strict = request.args.get('strict', default=0, type=int)
+    pending = {}
+    errors = []
+    last_generated = None
+    for line_number, line in enumerate(request.stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            errors.append({"line": line_number, "error": f"Invalid JSON: {e}"})
+            continue
+        profile_id, profile, error = parse_profile_record(record)
+        if error is None and profile_id is not None and (profile_id in engine.profiles or profile_id in pending):
+            error = f"Profile {profile_id} already exists"
+        if error:
+            errors.append({"line": line_number, "error": error})
+            continue
+        if profile_id is None:
+            profile_id = last_generated = engine.new_profile_id(pending, last_generated)
+        pending[profile_id] = profile
+
+    if errors and strict:
+        return jsonify({"imported": 0, "errors": errors}), 400
+
+    if pending:
+        # One scan covers every new profile's initial status
+        engine.add_profiles(pending, 'import')
+        audit.record('profiles_imported', current_user(), profile_ids=list(pending), errors=len(errors))
+
+    status_code = 400 if errors and not pending else 200
+    return jsonify({"imported": len(pending), "profile_ids": list(pending), "errors": errors}), status_code
+
+
+# Streams every profile as newline-delimited JSON, in the format import accepts
+@app.route('/api/profiles/export', methods=['GET'])
+@requires_auth
+def export_profiles():
+    def generate(profile_ids):
+        for profile_id in profile_ids:
+            profile = engine.profiles.get(profile_id)
+            if profile is not None:
+                record = {'id': profile_id, 'name': profile['name'], 'path': profile['path'],
+                          'arguments': profile.get('arguments', '')}
+                if profile.get('tuning'):
+                    record['tuning'] = profile['tuning']
+                if profile.get('cgroup') is not None:
+                    record['cgroup'] = profile['cgroup']
+                if profile.get('warm_pool'):
+                    record['warm_pool'] = profile['warm_pool']
+                yield json.dumps(record) + '\n'
+
+    return Response(generate(list(engine.profiles)), mimetype='application/x-ndjson')
 
 
 @app.route('/api/profiles/<profile_id>', methods=['DELETE'])
 @requires_auth
 def delete_profile(profile_id):
-    if profile_id not in exe_profiles:
+    profile = engine.remove_profile(profile_id)
+    if profile is None:
         return jsonify({"error": "Profile not found"}), 404
-
-    del exe_profiles[profile_id]
-    save_config()
+    audit.record('profile_deleted', current_user(), profile_id=profile_id,
+                 name=profile['name'], path=profile['path'])
     return jsonify({"message": "Profile deleted"}), 200
 
 
+# Merge a settings patch (tuning, cgroup) into the current settings; nested
+# objects (ionice, rlimits) are merged key by key and null removes a key
+def merge_settings(current, patch):
+    merged = dict(current)
+    for key, value in patch.items():
+        if value is None:
+            merged.pop(key, None)
+        elif isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge_settings(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+# Change a profile's affinity/nice/ionice/rlimits (see process_tuning.py) and
+# re-apply them to its running process tree. Keys set to null are cleared;
+# clearing a setting does not revert it on processes that are already running.
+@app.route('/api/profiles/<profile_id>/tuning', methods=['PATCH'])
+@requires_auth
+@admission_controlled
+def update_profile_tuning(profile_id):
+    data = request.json
+    if not isinstance(data, dict):
+        return jsonify({"error": "Expected a JSON object"}), 400
+
+    with engine.config_lock:
+        profile = engine.profiles.get(profile_id)
+        if profile is None:
+            return jsonify({"error": "Profile not found"}), 404
+        merged = merge_settings(profile.get('tuning') or {}, data)
+        try:
+            tuning = parse_tuning(merged)
+        except TuningError as e:
+            return jsonify({"error": str(e)}), 400
+        if tuning:
+            profile['tuning'] = tuning
+        else:
+            profile.pop('tuning', None)
+        engine.save_config()
+
+    pids, errors = [], []
+    if profile.get('pid') and tuning:
+        pids, errors = engine.tune_process_tree(profile['pid'], tuning)
+    audit.record('tuning_changed', current_user(), profile_id=profile_id, tuning=tuning,
+                 pids=pids, errors=errors)
+    return jsonify({"tuning": tuning, "applied_to": pids, "errors": errors}), 200
+
+
+# Change a profile's cgroup limits (see cgroups.py); they take effect on the
+# running group immediately. {"disable": true} stops using a cgroup for it.
+@app.route('/api/profiles/<profile_id>/cgroup', methods=['PATCH'])
+@requires_auth
+def update_profile_cgroup(profile_id):
+    data = request.json
+    if not isinstance(data, dict):
+        return jsonify({"error": "Expected a JSON object"}), 400
+
+    with engine.config_lock:
+        profile = engine.profiles.get(profile_id)
+        if profile is None:
+            return jsonify({"error": "Profile not found"}), 404
+        if data.get('disable'):
+            limits = None
+            profile.pop('cgroup', None)
+        else:
+            try:
+                limits = parse_cgroup_limits(merge_settings(profile.get('cgroup') or {}, data))
+            except CgroupError as e:
+                return jsonify({"error": str(e)}), 400
+            profile['cgroup'] = limits
+        engine.save_config()
+
+    errors = []
+    if limits is not None and engine.cgroups.available() and os.path.isdir(engine.cgroups.group_path(profile_id)):
+        errors = engine.cgroups.apply_limits(engine.cgroups.group_path(profile_id), limits)
+    audit.record('cgroup_changed', current_user(), profile_id=profile_id, cgroup=limits, errors=errors)
+    return jsonify({"cgroup": limits, "errors": errors}), 200
+
+
+# Change a profile's warm pool (see warm_pool.py); {"disable": true} removes it
+# and kills its standby instances
+@app.route('/api/profiles/<profile_id>/warm_pool', methods=['PATCH'])
+@requires_auth
+def update_profile_warm_pool(profile_id):
+    data = request.json
+    if not isinstance(data, dict):
+        return jsonify({"error": "Expected a JSON object"}), 400
+
+    with engine.config_lock:
+        profile = engine.profiles.get(profile_id)
+        if profile is None:
+            return jsonify({"error": "Profile not found"}), 404
+        if data.get('disable'):
+            pool = None
+            profile.pop('warm_pool', None)
+        else:
+            try:
+                pool = parse_warm_pool(merge_settings(profile.get('warm_pool') or {}, data))
+            except WarmPoolError as e:
+                return jsonify({"error": str(e)}), 400
+            profile['warm_pool'] = pool
+        engine.save_config()
+
+    engine.warm_pool.configure(profile_id, pool)
+    audit.record('warm_pool_changed', current_user(), profile_id=profile_id, warm_pool=pool)
+    return jsonify({"warm_pool": pool}), 200
+
+
+# Standby instances per profile and the memory they hold against the budget
+@app.route('/api/warm_pool', methods=['GET'])
+@requires_auth
+def get_warm_pool():
+    return jsonify(engine.warm_pool.status()), 200
+
+
+# CPU and memory use of a profile's cgroup, read from the group's own counters
+@app.route('/api/profiles/<profile_id>/usage', methods=['GET'])
+@requires_auth
+def get_profile_usage(profile_id):
+    profile = engine.profiles.get(profile_id)
+    if profile is None:
+        return jsonify({"error": "Profile not found"}), 404
+    if profile.get('cgroup') is None:
+        return jsonify({"error": "Profile does not run in a cgroup"}), 404
+    usage = engine.cgroups.usage(profile_id)
+    if usage is None:
+        return jsonify({"error": "No cgroup usage available"}), 404
+    return jsonify(usage), 200
+
+
 @app.route('/api/profiles/<profile_id>/start', methods=['POST'])
 @requires_auth
+@admission_controlled
 def start_profile(profile_id):
-    if profile_id not in exe_profiles:
+    if profile_id not in engine.profiles:
         return jsonify({"error": "Profile not found"}), 404
 
-    profile = exe_profiles[profile_id]
-    success, message = start_executable(profile['path'], profile['arguments'])
-
+    success, message = engine.start_profile(profile_id, 'start')
+    audit.record('start', current_user(), profile_id=profile_id, success=success, message=message)
     if success:
-        # Wait a moment for the process to start
-        time.sleep(1)
-        running, pid = is_process_running(profile['path'])
-        profile['status'] = 'running' if running else 'stopped'
-        profile['pid'] = pid if running else None
-        save_config()
-        return jsonify({"message": message, "status": profile['status']}), 200
+        return jsonify({"message": message, "status": engine.profiles[profile_id]['status']}), 200
     else:
         return jsonify({"error": message}), 400
 
 
 @app.route('/api/profiles/<profile_id>/stop', methods=['POST'])
 @requires_auth
+@admission_controlled
 def stop_profile(profile_id):
-    if profile_id not in exe_profiles:
+    if profile_id not in engine.profiles:
         return jsonify({"error": "Profile not found"}), 404
 
-    profile = exe_profiles[profile_id]
-    success, message = stop_executable(profile['path'])
-
+    success, message = engine.stop_profile(profile_id, 'stop')
+    audit.record('stop', current_user(), profile_id=profile_id, success=success, message=message)
     if success:
-        profile['status'] = 'stopped'
-        profile['pid'] = None
-        save_config()
-        return jsonify({"message": message, "status": profile['status']}), 200
+        return jsonify({"message": message, "status": engine.profiles[profile_id]['status']}), 200
     else:
         return jsonify({"error": message}), 400
 
@@ -271,35 +547,181 @@ def stop_profile(profile_id):
 @app.route('/api/profiles/<profile_id>/status', methods=['GET'])
 @requires_auth
 def get_profile_status(profile_id):
-    if profile_id not in exe_profiles:
+    if profile_id not in engine.profiles:
         return jsonify({"error": "Profile not found"}), 404
 
-    profile = exe_profiles[profile_id]
-    running, pid = is_process_running(profile['path'])
-    profile['status'] = 'running' if running else 'stopped'
-    profile['pid'] = pid if running else None
+    profile = engine.profiles[profile_id]
+    # A recent full scan (or the exit watcher) already has the answer
+    if not engine.status_is_fresh():
+        admitted, retry_after = admission.try_acquire(request.headers.get('Authorization'))
+        if not admitted:
+            # Under overload answer from the last known status rather than waiting
+            if profile.get('status', 'unknown') == 'unknown':
+                return busy_response(retry_after)
+            response = jsonify({"status": profile['status'], "pid": profile['pid']})
+            response.headers['X-Status-Age'] = str(round(time.time() - engine.last_status_scan, 3))
+            return response, 200
+        try:
+            running, pid = engine.find_profile_process(profile)
+            status = 'running' if running else 'stopped'
 
-    # Check if file exists
-    if not os.path.exists(profile['path']):
-        profile['status'] = 'unknown'
+            # Check if file exists
+            if not os.path.exists(profile['path']):
+                status = 'unknown'
+            engine.set_profile_status(profile_id, profile, status, pid if running else None, 'status')
+        finally:
+            admission.release()
 
     return jsonify({"status": profile['status'], "pid": profile['pid']}), 200
 
 
-# Background thread to periodically update statuses
-def status_updater():
-    while True:
-        update_all_statuses()
-        save_config()
-        time.sleep(30)  # Update every 30 seconds
+@app.route('/api/schedules', methods=['GET'])
+@requires_auth
+def get_schedules():
+    return jsonify(scheduler.list()), 200
 
 
-if __name__ == '__main__':
+# Body: action, profile_id or profile_ids, cron or at (ISO time), optional
+# timezone (IANA name, default server local time) and catch_up policy
+@app.route('/api/schedules', methods=['POST'])
+@requires_auth
+def add_schedule():
+    try:
+        schedule = Schedule(request.json or {}, now=time.time())
+    except ScheduleError as e:
+        return jsonify({"error": str(e)}), 400
+    for profile_id in schedule.profile_ids:
+        if profile_id not in engine.profiles:
+            return jsonify({"error": f"Profile not found: {profile_id}"}), 404
+    try:
+        scheduler.add(schedule)
+    except OSError as e:
+        return jsonify({"error": f"Could not save schedules: {e}"}), 500
+    audit.record('schedule_added', current_user(), schedule=schedule.to_dict())
+    return jsonify(schedule.to_dict()), 201
+
+
+@app.route('/api/schedules/<schedule_id>', methods=['DELETE'])
+@requires_auth
+def delete_schedule(schedule_id):
+    if not scheduler.remove(schedule_id):
+        return jsonify({"error": "Schedule not found"}), 404
+    audit.record('schedule_deleted', current_user(), schedule_id=schedule_id)
+    return jsonify({"message": "Schedule deleted"}), 200
+
+
+@app.route('/api/schedules/upcoming', methods=['GET'])
+@requires_auth
+def get_upcoming_schedules():
+    limit = min(request.args.get('limit', default=50, type=int), 1000)
+    until = request.args.get('until', type=float)
+    return jsonify(scheduler.upcoming(limit, until)), 200
+
+
+# Audit trail query (admins only): ?since=<epoch seconds>&user=&event=&limit=
+@app.route('/api/audit', methods=['GET'])
+@requires_auth
+def get_audit():
+    user = users.get(current_user(), {})
+    if user.get('role') != 'admin':
+        return jsonify({"error": "Admin role required"}), 403
+
+    since = request.args.get('since', default=0, type=float)
+    limit = min(request.args.get('limit', default=1000, type=int), 10000)
+    entries = audit.query(since, request.args.get('user'), request.args.get('event'), limit)
+    return jsonify(entries), 200
+
+
+# Long-poll for status changes newer than ?since=<version>
+@app.route('/api/events', methods=['GET'])
+@requires_auth
+def get_events():
+    since = request.args.get('since', default=0, type=int)
+    timeout = min(request.args.get('timeout', default=25, type=float), EVENTS_MAX_TIMEOUT)
+    version, events, complete = status_feed.wait(since, timeout)
+    return jsonify({"version": version, "events": events, "complete": complete}), 200
+
+
+# Server-sent events stream of status changes. In Flask mode every open
+# stream holds a server thread; the async mode serves it from the event loop.
+@app.route('/api/events/stream', methods=['GET'])
+@requires_auth
+def stream_events():
+    since = request.headers.get('Last-Event-ID', type=int) or request.args.get('since', default=0, type=int)
+
+    def generate(since):
+        while True:
+            version, events, complete = status_feed.wait(since, 15)
+            if events:
+                for event in events:
+                    yield f"id: {event['version']}\ndata: {json.dumps(event)}\n\n"
+                since = version
+            else:
+                yield ": keep-alive\n\n"
+
+    return Response(generate(since), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+
+def build_parser(description="Remote executable control HTTP API"):
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('--host', default='0.0.0.0', help='Host IP to bind to')
+    parser.add_argument('--port', type=int, default=5000, help='Port to bind to')
+    parser.add_argument('--mode', choices=['flask', 'async'], default='flask',
+                        help='flask: thread per connection; async: asyncio event loop with a worker pool')
+    parser.add_argument('--workers', type=int, default=16, help='Worker threads for blocking work in async mode')
+    parser.add_argument('--config', default=CONFIG_FILE, help='Path to the profiles file')
+    parser.add_argument('--users', default=USERS_FILE, help='Path to the users file')
+    parser.add_argument('--schedules', default=SCHEDULES_FILE, help='Path to the schedules file')
+    parser.add_argument('--audit-dir', default=AUDIT_DIR, help='Directory for audit log segments')
+    parser.add_argument('--no-reload', action='store_true', help='Do not watch the config and users files')
+    parser.add_argument('--warm-pool-memory', type=int, default=WARM_POOL_MEMORY_BUDGET // (1024 * 1024),
+                        help='MiB of memory all warm pool standby instances may use together (0 for no limit)')
+    parser.add_argument('--cgroup-root', help='cgroup v2 directory to create profile groups under '
+                                              '(default: the server\'s own cgroup)')
+    return parser
+
+
+# Load the configuration and start every background service (the engine's
+# exit watcher, warm pool and status sampler, the file watcher and schedules)
+def start(args):
+    global CONFIG_FILE, USERS_FILE
+    CONFIG_FILE = args.config
+    USERS_FILE = args.users
     load_config()
+    engine.cgroups.base = args.cgroup_root
+    engine.warm_pool.memory_budget = args.warm_pool_memory * 1024 * 1024 or None
+
+    audit.directory = args.audit_dir
+    audit.open()
+
+    # Pick up edits to the profiles and users files without a restart
+    if not args.no_reload:
+        config_watcher.watch(CONFIG_FILE, 'config')
+        config_watcher.watch(USERS_FILE, 'users')
+        config_watcher.start()
+        print(f"Watching {CONFIG_FILE} and {USERS_FILE} for changes ({config_watcher.mode})")
+
+    # Load schedules (running any missed ones per SCHEDULE_CATCH_UP) and start the timer thread
+    scheduler.schedules_file = args.schedules
+    scheduler.load()
+    scheduler.start()
+
+    # Exit watching, standby instances (none outlive the server) and the status updater
+    atexit.register(engine.warm_pool.drain)
+    engine.start(STATUS_POLL_INTERVAL)
+
+
+# Run the HTTP server until interrupted
+def serve(args):
+    if args.mode == 'async':
+        from async_server import AsyncHTTPServer
+        AsyncHTTPServer(app, check_session, status_feed, host=args.host, port=args.port,
+                        workers=args.workers, max_poll_timeout=EVENTS_MAX_TIMEOUT).run()
+    else:
+        app.run(host=args.host, port=args.port, debug=False, threaded=True)
 
-    # Start the status updater thread
-    updater_thread = threading.Thread(target=status_updater, daemon=True)
-    updater_thread.start()
 
-    # Run the server
-    app.run(host='0.0.0.0', port=5000, debug=False)
+if __name__ == '__main__':
+    args = build_parser().parse_args()
+    start(args)
+    serve(args)
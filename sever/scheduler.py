@@ -0,0 +1,400 @@
+import heapq
+import itertools
+import json
+import os
+import secrets
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+try:
+    from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+except ImportError:  # Python < 3.9
+    ZoneInfo = None
+    ZoneInfoNotFoundError = KeyError
+
+CATCH_UP_POLICIES = ('skip', 'once', 'all')
+ACTIONS = ('start', 'stop')
+MAX_CATCH_UP_RUNS = 100
+
+
+class ScheduleError(ValueError):
+    pass
+
+
+class CronExpression:
+    """Standard 5-field cron: minute hour day-of-month month day-of-week.
+
+    Fields accept '*', numbers, ranges (1-5), steps (*/15, 8-18/2) and comma
+    lists. Day-of-week is 0-7 with both 0 and 7 meaning Sunday. As in cron,
+    when both day fields are restricted (neither covers its whole range) a
+    day matches if either does.
+    """
+
+    FIELDS = [('minute', 0, 59), ('hour', 0, 23), ('day', 1, 31), ('month', 1, 12), ('weekday', 0, 7)]
+
+    def __init__(self, expression):
+        self.expression = expression
+        parts = expression.split()
+        if len(parts) != 5:
+            raise ScheduleError(f"Cron expression needs 5 fields: {expression!r}")
+        values = [self._parse_field(part, low, high) for part, (_, low, high) in zip(parts, self.FIELDS)]
+        self.minutes, self.hours, self.days, self.months, weekdays = values
+        # Cron uses 0 = Sunday, datetime.weekday() uses 0 = Monday
+        self.weekdays = {(d - 1) % 7 for d in weekdays}
+        self.day_restricted = self.days != set(range(1, 32))
+        self.weekday_restricted = len(self.weekdays) != 7
+
+    @staticmethod
+    def _parse_field(field, low, high):
+        values = set()
+        for item in field.split(','):
+            range_part, _, step = item.partition('/')
+            try:
+                step = int(step) if step else 1
+                if range_part == '*':
+                    start, end = low, high
+                elif '-' in range_part:
+                    start, end = (int(v) for v in range_part.split('-', 1))
+                else:
+                    start = end = int(range_part)
+                    if step != 1:
+                        end = high
+            except ValueError:
+                raise ScheduleError(f"Invalid cron field: {field!r}")
+            if start < low or end > high or start > end or step < 1:
+                raise ScheduleError(f"Cron field out of range: {field!r}")
+            values.update(range(start, end + 1, step))
+        return values
+
+    def _day_matches(self, dt):
+        day_ok = dt.day in self.days
+        weekday_ok = dt.weekday() in self.weekdays
+        if self.day_restricted and self.weekday_restricted:
+            return day_ok or weekday_ok
+        return day_ok and weekday_ok
+
+    def next_after(self, dt):
+        """Next matching wall-clock minute strictly after naive datetime dt."""
+        dt = dt.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = dt + timedelta(days=366 * 5)
+        while dt < limit:
+            if dt.month not in self.months:
+                dt = (dt.replace(day=1) + timedelta(days=32)).replace(day=1, hour=0, minute=0)
+                continue
+            if not self._day_matches(dt):
+                dt = (dt + timedelta(days=1)).replace(hour=0, minute=0)
+                continue
+            if dt.hour not in self.hours:
+                dt = (dt + timedelta(hours=1)).replace(minute=0)
+                continue
+            if dt.minute not in self.minutes:
+                dt += timedelta(minutes=1)
+                continue
+            return dt
+        return None
+
+
+def load_zone(name):
+    if not name or name == 'local':
+        return None
+    if ZoneInfo is None:
+        raise ScheduleError("Time zones need Python 3.9+ (zoneinfo)")
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ScheduleError(f"Unknown time zone: {name}")
+
+
+# Wall-clock <-> epoch conversion; zone None means the server's local time
+def to_epoch(naive, zone):
+    if zone is None:
+        return time.mktime(naive.timetuple()) + naive.microsecond / 1_000_000
+    return naive.replace(tzinfo=zone).timestamp()
+
+
+def to_wall_clock(epoch, zone):
+    if zone is None:
+        return datetime.fromtimestamp(epoch)
+    return datetime.fromtimestamp(epoch, zone).replace(tzinfo=None)
+
+
+class Schedule:
+    # Pass `now` for a new schedule: a one-shot `at` that is already past is
+    # rejected (loaded schedules keep theirs, for catch-up)
+    def __init__(self, data, now=None):
+        if not isinstance(data, dict):
+            raise ScheduleError("Schedule must be a JSON object")
+        self.id = data.get('id') or secrets.token_hex(8)
+        self.name = data.get('name', '')
+        self.action = data.get('action')
+        profile_ids = data.get('profile_ids') or ([data['profile_id']] if data.get('profile_id') else [])
+        # A string here would otherwise be iterated one character at a time
+        if not isinstance(profile_ids, list) \
+                or not all(isinstance(p, (str, int)) and not isinstance(p, bool) for p in profile_ids):
+            raise ScheduleError("profile_ids must be a list of profile IDs")
+        self.profile_ids = [str(p) for p in profile_ids]
+        self.cron = data.get('cron')
+        self.at = data.get('at')
+        self.timezone = data.get('timezone', 'local')
+        self.catch_up = data.get('catch_up')
+        self.enabled = data.get('enabled', True)
+        self.last_run = data.get('last_run')
+        self.created = data.get('created', time.time())
+        self.generation = 0
+
+        if self.action not in ACTIONS:
+            raise ScheduleError(f"action must be one of {', '.join(ACTIONS)}")
+        if not self.profile_ids:
+            raise ScheduleError("profile_id or profile_ids is required")
+        if bool(self.cron) == bool(self.at):
+            raise ScheduleError("Exactly one of cron or at is required")
+        for field in ('cron', 'at', 'timezone'):
+            if getattr(self, field) is not None and not isinstance(getattr(self, field), str):
+                raise ScheduleError(f"{field} must be a string")
+        if self.catch_up is not None and self.catch_up not in CATCH_UP_POLICIES:
+            raise ScheduleError(f"catch_up must be one of {', '.join(CATCH_UP_POLICIES)}")
+
+        self.zone = load_zone(self.timezone)
+        self.expression = CronExpression(self.cron) if self.cron else None
+        if self.at:
+            try:
+                at = datetime.fromisoformat(self.at)
+            except ValueError:
+                raise ScheduleError(f"Invalid 'at' timestamp: {self.at}")
+            self.at_epoch = at.timestamp() if at.tzinfo else to_epoch(at, self.zone)
+            if now is not None and self.at_epoch <= now:
+                raise ScheduleError(f"'at' is in the past: {self.at}")
+
+    def next_fire(self, after):
+        """Epoch of the first fire strictly after `after`, or None."""
+        if self.expression is None:
+            return self.at_epoch if self.at_epoch > after else None
+        wall = self.expression.next_after(to_wall_clock(after, self.zone))
+        while wall is not None:
+            epoch = to_epoch(wall, self.zone)
+            # Wall times skipped by a DST jump can map back before `after`
+            if epoch > after:
+                return epoch
+            wall = self.expression.next_after(wall)
+        return None
+
+    def to_dict(self):
+        data = {
+            'id': self.id,
+            'name': self.name,
+            'action': self.action,
+            'profile_ids': self.profile_ids,
+            'timezone': self.timezone,
+            'enabled': self.enabled,
+            'last_run': self.last_run,
+            'created': self.created
+        }
+        if self.cron:
+            data['cron'] = self.cron
+        else:
+            data['at'] = self.at
+        if self.catch_up is not None:
+            data['catch_up'] = self.catch_up
+        return data
+
+
+class Scheduler:
+    """Runs start/stop schedules from one thread driven by a min-heap.
+
+    The heap holds (fire_time, seq, schedule_id, generation). Updating or
+    deleting a schedule bumps its generation, so outdated heap entries are
+    simply skipped when they surface; adding or changing a schedule is a
+    single O(log n) push.
+    """
+
+    def __init__(self, run_action, schedules_file='schedules.json', catch_up='once', action_workers=4):
+        self.run_action = run_action
+        self.schedules_file = schedules_file
+        self.catch_up = catch_up
+        self.schedules = {}
+        self.heap = []
+        self.seq = itertools.count()
+        self.condition = threading.Condition()
+        self.executor = ThreadPoolExecutor(max_workers=action_workers, thread_name_prefix='schedule')
+        self.thread = None
+        self.dirty = False
+        self.save_lock = threading.Lock()  # The timer thread and API calls both save
+
+    # Persistence
+    def load(self):
+        if not os.path.exists(self.schedules_file):
+            return
+        try:
+            with open(self.schedules_file, 'r') as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error loading schedules: {e}")
+            return
+        if not isinstance(entries, list):
+            print("Error loading schedules: the file must hold a JSON list")
+            return
+
+        now = time.time()
+        with self.condition:
+            for entry in entries:
+                try:
+                    schedule = Schedule(entry)
+                except ScheduleError as e:
+                    print(f"Skipping invalid schedule {entry.get('id') if isinstance(entry, dict) else entry!r}: {e}")
+                    continue
+                self.schedules[schedule.id] = schedule
+                self._catch_up(schedule, now)
+                self._push(schedule, now)
+        if self.dirty:
+            self.save()
+
+    def save(self):
+        with self.save_lock:
+            with self.condition:
+                data = [s.to_dict() for s in self.schedules.values()]
+                self.dirty = False
+            fd, tmp_file = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.schedules_file)),
+                                            prefix=os.path.basename(self.schedules_file) + '.', suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(data, f, indent=4)
+                os.replace(tmp_file, self.schedules_file)
+            except BaseException:
+                try:
+                    os.unlink(tmp_file)
+                except OSError:
+                    pass
+                raise
+
+    def _catch_up(self, schedule, now):
+        """Handle fires missed while the server was down."""
+        if not schedule.enabled:
+            return
+        policy = schedule.catch_up or self.catch_up
+        since = schedule.last_run if schedule.last_run is not None else schedule.created
+        missed = []
+        fire = schedule.next_fire(since)
+        while fire is not None and fire <= now and len(missed) < MAX_CATCH_UP_RUNS:
+            missed.append(fire)
+            fire = schedule.next_fire(fire)
+        if not missed:
+            return
+
+        if policy == 'skip':
+            print(f"Schedule {schedule.id}: skipping {len(missed)} missed run(s)")
+            runs = []
+        elif policy == 'once':
+            runs = missed[-1:]
+        else:
+            runs = missed
+        for fire_time in runs:
+            self.executor.submit(self._execute, schedule, fire_time)
+        schedule.last_run = missed[-1]
+        self.dirty = True
+
+    def _push(self, schedule, after):
+        if not schedule.enabled:
+            return
+        fire = schedule.next_fire(after)
+        if fire is not None:
+            heapq.heappush(self.heap, (fire, next(self.seq), schedule.id, schedule.generation))
+            if self.heap[0][2] == schedule.id:
+                self.condition.notify()
+
+    # Public API
+    def add(self, data):
+        """Add or replace a schedule from a dict or an already parsed Schedule."""
+        schedule = data if isinstance(data, Schedule) else Schedule(data)
+        with self.condition:
+            if schedule.id in self.schedules:
+                schedule.generation = self.schedules[schedule.id].generation + 1
+            self.schedules[schedule.id] = schedule
+            self._push(schedule, time.time())
+        self.save()
+        return schedule
+
+    def remove(self, schedule_id):
+        with self.condition:
+            schedule = self.schedules.pop(schedule_id, None)
+            if schedule is None:
+                return False
+            schedule.generation += 1  # Invalidate its heap entries
+        self.save()
+        return True
+
+    def list(self):
+        with self.condition:
+            return [s.to_dict() for s in self.schedules.values()]
+
+    def upcoming(self, limit=50, until=None):
+        """Next `limit` fires across all schedules, in time order."""
+        with self.condition:
+            heap = [entry for entry in self.heap
+                    if entry[2] in self.schedules and self.schedules[entry[2]].generation == entry[3]]
+            schedules = dict(self.schedules)
+        heapq.heapify(heap)
+
+        fires = []
+        while heap and len(fires) < limit:
+            fire, seq, schedule_id, generation = heapq.heappop(heap)
+            if until is not None and fire > until:
+                break
+            schedule = schedules[schedule_id]
+            fires.append({
+                'schedule_id': schedule_id,
+                'name': schedule.name,
+                'action': schedule.action,
+                'profile_ids': schedule.profile_ids,
+                'fire_time': fire,
+                'fire_time_local': to_wall_clock(fire, schedule.zone).isoformat(),
+                'timezone': schedule.timezone
+            })
+            next_fire = schedule.next_fire(fire)
+            if next_fire is not None:
+                heapq.heappush(heap, (next_fire, seq, schedule_id, generation))
+        return fires
+
+    # Scheduler thread
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def _run(self):
+        while True:
+            due = []
+            with self.condition:
+                while not due:
+                    now = time.time()
+                    while self.heap and self.heap[0][0] <= now:
+                        fire, _, schedule_id, generation = heapq.heappop(self.heap)
+                        schedule = self.schedules.get(schedule_id)
+                        if schedule is None or schedule.generation != generation or not schedule.enabled:
+                            continue
+                        due.append((schedule, fire))
+                        schedule.last_run = fire
+                        self._push(schedule, fire)
+                    if due:
+                        break
+                    timeout = self.heap[0][0] - now if self.heap else None
+                    self.condition.wait(timeout)
+                self.dirty = True
+
+            for schedule, fire in due:
+                self.executor.submit(self._execute, schedule, fire)
+            try:
+                self.save()
+            except OSError as e:
+                print(f"Error saving schedules: {e}")
+
+    def _execute(self, schedule, fire_time):
+        for profile_id in schedule.profile_ids:
+            try:
+                ok, message = self.run_action(schedule.action, profile_id)
+                if not ok:
+                    print(f"Schedule {schedule.id}: {schedule.action} {profile_id} failed: {message}")
+            except Exception as e:
+                print(f"Schedule {schedule.id}: {schedule.action} {profile_id} raised {e}")
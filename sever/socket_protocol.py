@@ -0,0 +1,369 @@
+import json
+import struct
+import zlib
+
+try:
+    import msgpack
+except ImportError:  # The pure Python packer below speaks the same format
+    msgpack = None
+
+# Wire format of the raw socket protocol (windows-server.py and its client).
+#
+# A framed connection starts with the client sending MAGIC plus the highest
+# protocol version it speaks; the server answers with MAGIC plus the version
+# it picked. From version 2 on, both handshakes carry one more byte of
+# capability flags: the client offers, the server answers with the subset it
+# accepted. After that every message travels in a frame:
+#
+#     version (1 byte) | payload length (4 bytes, big endian) | payload
+#
+# The payload is a JSON object, or MessagePack if CAPABILITY_MSGPACK was
+# agreed. With CAPABILITY_ZLIB each side runs one zlib stream per direction
+# for the whole connection and every payload is the stream's output up to a
+# sync flush, so later messages are compressed against the earlier ones.
+#
+# Requests may carry an "id"; the reply to a request echoes it, so a client
+# can pipeline several requests on one connection and match the replies in
+# any order. Connections that open with '{' instead are legacy clients that
+# send bare JSON objects back to back; they are still understood.
+#
+# client/socket_protocol.py is a copy of this file, since the client is packaged
+# on its own; keep the two in sync. benchmarks/protocol_sync_check.py fails
+# when they differ.
+MAGIC = b'RCP'
+PROTOCOL_VERSION = 2
+CAPABILITY_MSGPACK = 0x01
+CAPABILITY_ZLIB = 0x02
+SUPPORTED_CAPABILITIES = CAPABILITY_MSGPACK | CAPABILITY_ZLIB
+HEADER = struct.Struct('!BI')  # version, payload length
+MAX_FRAME_SIZE = 16 * 1024 * 1024
+
+
+class ProtocolError(ValueError):
+    pass
+
+
+def handshake(version=PROTOCOL_VERSION, capabilities=0):
+    if version < 2:
+        return MAGIC + bytes([version])
+    return MAGIC + bytes([version, capabilities])
+
+
+def handshake_size(version):
+    return len(MAGIC) + (1 if version < 2 else 2)
+
+
+def parse_handshake(data):
+    """(version, capabilities, length) of the handshake at the start of data, or None if incomplete."""
+    if len(data) < len(MAGIC) + 1:
+        return None
+    version = data[len(MAGIC)]
+    size = handshake_size(version)
+    if len(data) < size:
+        return None
+    capabilities = data[len(MAGIC) + 1] if version >= 2 else 0
+    return version, capabilities, size
+
+
+def detect_mode(data):
+    """'framed', 'legacy', or None while the first bytes are still incomplete."""
+    stripped = data.lstrip()
+    if not stripped:
+        return None
+    if stripped[:1] == b'{':
+        return 'legacy'
+    if len(data) < len(MAGIC) + 1:
+        return None if MAGIC.startswith(data) else 'invalid'
+    return 'framed' if data.startswith(MAGIC) else 'invalid'
+
+
+def encode_message(message):
+    return json.dumps(message, separators=(',', ':')).encode('utf-8')
+
+
+def decode_message(payload):
+    """Parse one payload; raises ProtocolError if it isn't a JSON object."""
+    try:
+        message = json.loads(payload)
+    except ValueError as e:
+        raise ProtocolError(f"Invalid JSON format: {e}")
+    if not isinstance(message, dict):
+        raise ProtocolError("Messages must be JSON objects")
+    return message
+
+
+# MessagePack, for when the msgpack package isn't installed. Covers the types
+# JSON has plus bytes, which is all the protocol sends.
+def _pack(obj, out):
+    if obj is None:
+        out.append(0xc0)
+    elif obj is True or obj is False:
+        out.append(0xc3 if obj else 0xc2)
+    elif isinstance(obj, int):
+        if 0 <= obj < 0x80:
+            out.append(obj)
+        elif -32 <= obj < 0:
+            out.append(obj & 0xff)
+        elif obj >= 0:
+            for code, fmt, limit in ((0xcc, '>B', 1 << 8), (0xcd, '>H', 1 << 16),
+                                     (0xce, '>I', 1 << 32), (0xcf, '>Q', 1 << 64)):
+                if obj < limit:
+                    out.append(code)
+                    out += struct.pack(fmt, obj)
+                    break
+            else:
+                raise ProtocolError(f"Integer {obj} is too large for MessagePack")
+        else:
+            for code, fmt, limit in ((0xd0, '>b', 1 << 7), (0xd1, '>h', 1 << 15),
+                                     (0xd2, '>i', 1 << 31), (0xd3, '>q', 1 << 63)):
+                if obj >= -limit:
+                    out.append(code)
+                    out += struct.pack(fmt, obj)
+                    break
+            else:
+                raise ProtocolError(f"Integer {obj} is too small for MessagePack")
+    elif isinstance(obj, float):
+        out.append(0xcb)
+        out += struct.pack('>d', obj)
+    elif isinstance(obj, str):
+        data = obj.encode('utf-8')
+        _pack_header(out, len(data), 0xa0, 32, (0xd9, 0xda, 0xdb))
+        out += data
+    elif isinstance(obj, (bytes, bytearray)):
+        _pack_header(out, len(obj), None, 0, (0xc4, 0xc5, 0xc6))
+        out += obj
+    elif isinstance(obj, (list, tuple)):
+        _pack_header(out, len(obj), 0x90, 16, (None, 0xdc, 0xdd))
+        for item in obj:
+            _pack(item, out)
+    elif isinstance(obj, dict):
+        _pack_header(out, len(obj), 0x80, 16, (None, 0xde, 0xdf))
+        for key, value in obj.items():
+            _pack(key, out)
+            _pack(value, out)
+    else:
+        raise TypeError(f"Object of type {type(obj).__name__} is not MessagePack serializable")
+
+
+def _pack_header(out, length, fix_code, fix_limit, codes):
+    # codes: 8, 16 and 32 bit length variants (None where the type has none)
+    if length < fix_limit:
+        out.append(fix_code | length)
+    elif length < 1 << 8 and codes[0] is not None:
+        out.append(codes[0])
+        out.append(length)
+    elif length < 1 << 16:
+        out.append(codes[1])
+        out += struct.pack('>H', length)
+    else:
+        out.append(codes[2])
+        out += struct.pack('>I', length)
+
+
+_FIXED = {0xc0: None, 0xc2: False, 0xc3: True}
+_NUMBERS = {0xca: '>f', 0xcb: '>d', 0xcc: '>B', 0xcd: '>H', 0xce: '>I', 0xcf: '>Q',
+            0xd0: '>b', 0xd1: '>h', 0xd2: '>i', 0xd3: '>q'}
+_LENGTHS = {0xc4: '>B', 0xc5: '>H', 0xc6: '>I', 0xd9: '>B', 0xda: '>H', 0xdb: '>I',
+            0xdc: '>H', 0xdd: '>I', 0xde: '>H', 0xdf: '>I'}
+
+
+def _unpack(data, offset):
+    code = data[offset]
+    offset += 1
+    if code < 0x80:
+        return code, offset
+    if code >= 0xe0:
+        return code - 0x100, offset
+    if code in _FIXED:
+        return _FIXED[code], offset
+    if code in _NUMBERS:
+        fmt = _NUMBERS[code]
+        return struct.unpack_from(fmt, data, offset)[0], offset + struct.calcsize(fmt)
+
+    if 0xa0 <= code <= 0xbf:
+        kind, length = 'str', code & 0x1f
+    elif 0x90 <= code <= 0x9f:
+        kind, length = 'array', code & 0x0f
+    elif 0x80 <= code <= 0x8f:
+        kind, length = 'map', code & 0x0f
+    elif code in _LENGTHS:
+        fmt = _LENGTHS[code]
+        length = struct.unpack_from(fmt, data, offset)[0]
+        offset += struct.calcsize(fmt)
+        kind = 'bin' if code <= 0xc6 else 'str' if code <= 0xdb else 'array' if code <= 0xdd else 'map'
+    else:
+        raise ProtocolError(f"Unsupported MessagePack type 0x{code:02x}")
+
+    if kind in ('str', 'bin'):
+        end = offset + length
+        if end > len(data):
+            raise ProtocolError("Truncated MessagePack data")
+        value = bytes(data[offset:end])
+        return (value.decode('utf-8') if kind == 'str' else value), end
+    if kind == 'array':
+        items = []
+        for _ in range(length):
+            item, offset = _unpack(data, offset)
+            items.append(item)
+        return items, offset
+    mapping = {}
+    for _ in range(length):
+        key, offset = _unpack(data, offset)
+        mapping[key], offset = _unpack(data, offset)
+    return mapping, offset
+
+
+def pack_message(message):
+    if msgpack is not None:
+        return msgpack.packb(message, use_bin_type=True)
+    out = bytearray()
+    _pack(message, out)
+    return bytes(out)
+
+
+def unpack_message(payload):
+    """Parse one MessagePack payload; raises ProtocolError if it isn't a map."""
+    try:
+        if msgpack is not None:
+            message = msgpack.unpackb(payload, raw=False)
+        else:
+            message, end = _unpack(payload, 0)
+            if end != len(payload):
+                raise ProtocolError("Extra data after MessagePack message")
+    except ProtocolError as e:
+        raise ProtocolError(f"Invalid MessagePack format: {e}")
+    except (ValueError, TypeError, IndexError, struct.error) as e:  # msgpack's errors are ValueErrors
+        raise ProtocolError(f"Invalid MessagePack format: {e}")
+    if not isinstance(message, dict):
+        raise ProtocolError("Messages must be MessagePack maps")
+    return message
+
+
+class MessageCodec:
+    """Encoding and compression state of one framed connection.
+
+    encode() and decode() must each be called in frame order, since the zlib
+    streams carry state from one message to the next; callers sending from
+    several threads hold a lock around encode() and the write.
+    """
+
+    def __init__(self, capabilities=0, max_message_size=MAX_FRAME_SIZE):
+        self.capabilities = capabilities
+        self.binary = bool(capabilities & CAPABILITY_MSGPACK)
+        self.encoding = 'MessagePack' if self.binary else 'JSON'
+        self.max_message_size = max_message_size
+        self.compressor = self.decompressor = None
+        if capabilities & CAPABILITY_ZLIB:
+            self.compressor = zlib.compressobj()
+            self.decompressor = zlib.decompressobj()
+
+    def serialize(self, message):
+        return pack_message(message) if self.binary else encode_message(message)
+
+    def encode(self, message, serialized=None):
+        """Frame payload for message; serialized may be serialize(message) from a codec of the same encoding."""
+        payload = self.serialize(message) if serialized is None else serialized
+        if self.compressor is not None:
+            payload = self.compressor.compress(payload) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+        return payload
+
+    def decompress(self, payload):
+        """Undo compression; call for every received payload, in order."""
+        if self.decompressor is None:
+            return payload
+        try:
+            data = self.decompressor.decompress(payload, self.max_message_size)
+        except zlib.error as e:
+            raise ProtocolError(f"Corrupt compressed frame: {e}")
+        if self.decompressor.unconsumed_tail:
+            raise ProtocolError(f"Message exceeds {self.max_message_size} bytes")
+        return data
+
+    def decode(self, data):
+        """Parse a decompressed payload; raises ProtocolError."""
+        return unpack_message(data) if self.binary else decode_message(data)
+
+
+def encode_frame(payload, version=PROTOCOL_VERSION):
+    if len(payload) > MAX_FRAME_SIZE:
+        raise ProtocolError(f"Frame of {len(payload)} bytes exceeds {MAX_FRAME_SIZE}")
+    return HEADER.pack(version, len(payload)) + payload
+
+
+class FrameDecoder:
+    """Incremental frame parser: feed() it whatever recv() returned."""
+
+    def __init__(self, version=PROTOCOL_VERSION, max_frame_size=MAX_FRAME_SIZE):
+        self.version = version
+        self.max_frame_size = max_frame_size
+        self.buffer = bytearray()
+
+    def feed(self, data):
+        """Returns the payloads of every frame completed by data."""
+        self.buffer += data
+        payloads = []
+        offset = 0
+        while len(self.buffer) - offset >= HEADER.size:
+            version, length = HEADER.unpack_from(self.buffer, offset)
+            if version != self.version:
+                raise ProtocolError(f"Unexpected protocol version {version}")
+            if length > self.max_frame_size:
+                raise ProtocolError(f"Frame of {length} bytes exceeds {self.max_frame_size}")
+            end = offset + HEADER.size + length
+            if len(self.buffer) < end:
+                break
+            payloads.append(bytes(self.buffer[offset + HEADER.size:end]))
+            offset = end
+        del self.buffer[:offset]
+        return payloads
+
+
+class LegacyDecoder:
+    """Splits a stream of bare JSON objects at their closing braces.
+
+    Scanning resumes where the previous feed() stopped, so a message split
+    across several recv() calls costs one pass over its bytes.
+    """
+
+    def __init__(self, max_message_size=MAX_FRAME_SIZE):
+        self.max_message_size = max_message_size
+        self.buffer = bytearray()
+        self.position = 0
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+
+    def feed(self, data):
+        self.buffer += data
+        payloads = []
+        start = 0
+        i = self.position
+        while i < len(self.buffer):
+            char = self.buffer[i]
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == 0x5c:  # backslash
+                    self.escaped = True
+                elif char == 0x22:  # quote
+                    self.in_string = False
+            elif self.depth == 0 and char not in b'{ \t\r\n':
+                # Garbage between messages: hand it over so it gets an error reply
+                payloads.append(bytes(self.buffer[start:]))
+                start = i = len(self.buffer)
+                break
+            elif char == 0x22:
+                self.in_string = True
+            elif char in b'{[':
+                self.depth += 1
+            elif char in b'}]':
+                self.depth -= 1
+                if self.depth == 0:
+                    payloads.append(bytes(self.buffer[start:i + 1]))
+                    start = i + 1
+            i += 1
+        del self.buffer[:start]
+        self.position = i - start
+        if len(self.buffer) > self.max_message_size:
+            raise ProtocolError(f"Message exceeds {self.max_message_size} bytes")
+        return payloads
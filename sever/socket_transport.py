@@ -0,0 +1,281 @@
+import asyncio
+import json
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from socket_protocol import (PROTOCOL_VERSION, SUPPORTED_CAPABILITIES, FrameDecoder, LegacyDecoder,
+                             MessageCodec, ProtocolError, detect_mode, encode_frame, handshake,
+                             parse_handshake)
+from timer_wheel import TimerWheel
+
+READ_SIZE = 64 * 1024
+
+
+class ClientConnection:
+    """Protocol state of one socket client, shared by the threaded and event-loop servers.
+
+    The first bytes decide between the framed protocol (handshake) and legacy
+    bare JSON; receive() then turns raw bytes into request payloads, decode()
+    parses one, and send() encodes a message the way this client expects,
+    with the encoding and compression agreed in the handshake. write(data)
+    must be safe to call from any thread, so replies and pushed frames can
+    share it; so must close(), which ends the connection from outside.
+    """
+
+    def __init__(self, address, write, close=None, capabilities=SUPPORTED_CAPABILITIES):
+        self.address = address
+        self.write = write
+        self.close = close
+        self.last_seen = time.monotonic()  # Last time the client sent anything
+        self.capabilities = capabilities  # What the server is willing to agree to
+        self.mode = None  # 'framed' or 'legacy' once the first bytes are in
+        self.version = None
+        self.decoder = None
+        self.codec = MessageCodec()
+        self.send_lock = threading.Lock()
+        self.pending = b''
+
+    @property
+    def encoding(self):
+        return self.codec.encoding
+
+    def receive(self, data):
+        """Feed received bytes; returns the payloads of every complete request."""
+        self.last_seen = time.monotonic()
+        if self.decoder is None:
+            self.pending += data
+            mode = detect_mode(self.pending)
+            if mode is None:
+                return []
+            if mode == 'framed':
+                parsed = parse_handshake(self.pending)
+                if parsed is None:
+                    return []
+                version, offered, size = parsed
+                if version < 1:
+                    raise ProtocolError(f"Unsupported protocol version {version}")
+                self.version = min(version, PROTOCOL_VERSION)
+                self.codec = MessageCodec(offered & self.capabilities if self.version >= 2 else 0)
+                self.write(handshake(self.version, self.codec.capabilities))
+                data, self.pending = self.pending[size:], b''
+                self.decoder = FrameDecoder(self.version)
+            else:
+                data, self.pending = self.pending, b''
+                # Anything that isn't a handshake gets the legacy "Invalid JSON format" reply
+                self.decoder = LegacyDecoder()
+            self.mode = 'framed' if mode == 'framed' else 'legacy'
+        if self.mode == 'framed':
+            return [self.codec.decompress(payload) for payload in self.decoder.feed(data)]
+        return self.decoder.feed(data)
+
+    def decode(self, payload):
+        """Parse one payload from receive(); raises ProtocolError."""
+        return self.codec.decode(payload)
+
+    def send(self, message, serialized=None):
+        """Send message; serialized is an optional cache {encoding: bytes} shared by a broadcast."""
+        if self.mode != 'framed':
+            self.write(json.dumps(message).encode('utf-8'))
+            return
+        if serialized is not None:
+            if self.encoding not in serialized:
+                serialized[self.encoding] = self.codec.serialize(message)
+            serialized = serialized[self.encoding]
+        # Frames must leave in the order the compressor produced them
+        with self.send_lock:
+            self.write(encode_frame(self.codec.encode(message, serialized), self.version))
+
+
+def socket_writer(sock):
+    """Thread-safe write function for a blocking socket."""
+    lock = threading.Lock()
+
+    def write(data):
+        with lock:
+            sock.sendall(data)
+
+    return write
+
+
+def socket_closer(sock):
+    """Close function for a blocking socket: the reading thread sees EOF and cleans up."""
+    def close():
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    return close
+
+
+def enable_keepalive(sock, idle=30, interval=10, count=3):
+    """Have the OS probe an idle connection, so dead peers are noticed without traffic."""
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        if hasattr(socket, 'TCP_KEEPIDLE'):  # Linux
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, idle)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, interval)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPCNT, count)
+        elif hasattr(socket, 'TCP_KEEPALIVE'):  # macOS
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPALIVE, idle)
+        elif hasattr(socket, 'SIO_KEEPALIVE_VALS'):  # Windows
+            sock.ioctl(socket.SIO_KEEPALIVE_VALS, (1, idle * 1000, interval * 1000))
+    except (OSError, AttributeError) as e:  # asyncio's TransportSocket has no ioctl
+        print(f"Could not enable TCP keepalive: {e}")
+
+
+class HeartbeatMonitor:
+    """Pings quiet connections and closes the ones that stay silent.
+
+    A framed connection that has sent nothing for `interval` seconds gets a
+    {"event": "ping"} frame, which clients answer with {"action": "pong"};
+    any connection silent for `idle_timeout` seconds is closed. Each
+    connection has one timer in a TimerWheel, set for its next deadline.
+    Traffic only updates connection.last_seen; the timer compares against it
+    when it fires, so busy connections cost nothing extra.
+    """
+
+    def __init__(self, interval=20, idle_timeout=60, wheel=None):
+        self.interval = interval
+        self.idle_timeout = idle_timeout
+        self.wheel = wheel or TimerWheel()
+        self.watched = set()
+        self.lock = threading.Lock()
+
+    def start(self):
+        self.wheel.start()
+
+    def watch(self, connection):
+        with self.lock:
+            self.watched.add(connection)
+            self.wheel.schedule(connection, min(self.interval, self.idle_timeout),
+                                lambda: self._check(connection))
+
+    def forget(self, connection):
+        with self.lock:
+            self.watched.discard(connection)
+            self.wheel.cancel(connection)
+
+    def _check(self, connection):
+        quiet = time.monotonic() - connection.last_seen
+        if quiet >= self.idle_timeout:
+            print(f"Closing idle connection {connection.address} (silent for {quiet:.0f}s)")
+            if connection.close is not None:
+                connection.close()
+            return
+        if quiet >= self.interval:
+            if connection.mode == 'framed':
+                try:
+                    connection.send({"event": "ping"})
+                except Exception as e:
+                    print(f"Could not ping {connection.address}: {e}")
+            delay = min(self.interval, self.idle_timeout - quiet)
+        else:
+            delay = self.interval - quiet
+        # forget() may have run while this check was pinging; don't revive its timer
+        with self.lock:
+            if connection in self.watched:
+                self.wheel.schedule(connection, delay, lambda: self._check(connection))
+
+
+class AsyncSocketServer:
+    """asyncio front-end for RemoteControlServer's socket protocol.
+
+    Every client socket is multiplexed on one event loop, so an idle phone
+    costs a socket and a suspended coroutine instead of a thread. Requests
+    run through control.handle_message on a bounded worker pool, which is
+    where the blocking process checks and launches happen; a client's
+    requests are answered in order, as in the threaded server.
+    """
+
+    def __init__(self, control, host='0.0.0.0', port=5000, workers=16, backlog=1024, keepalive=None):
+        self.control = control
+        self.host = host
+        self.port = port
+        self.backlog = backlog
+        self.keepalive = keepalive  # Seconds before TCP keepalive probes, or None
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='socket-worker')
+        self.loop = None
+        self.server = None
+        self.connection_tasks = set()
+
+    async def start(self):
+        self.loop = asyncio.get_running_loop()
+        self.server = await asyncio.start_server(self._handle_connection, self.host, self.port,
+                                                 backlog=self.backlog, limit=READ_SIZE)
+        if not self.port:
+            self.port = self.server.sockets[0].getsockname()[1]
+        return self.server
+
+    async def serve_forever(self):
+        server = await self.start()
+        print(f"Server started on {self.host}:{self.port} (async)")
+        async with server:
+            await server.serve_forever()
+
+    async def stop(self):
+        if self.server is not None:
+            self.server.close()
+        # Idle clients never disconnect by themselves
+        tasks = list(self.connection_tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self.server is not None:
+            await self.server.wait_closed()
+        self.executor.shutdown(wait=False)
+
+    def run(self):
+        try:
+            asyncio.run(self.serve_forever())
+        except KeyboardInterrupt:
+            print("Server is shutting down...")
+
+    def _writer(self, writer):
+        loop_thread = threading.get_ident()
+
+        def write(data):
+            if threading.get_ident() == loop_thread:
+                writer.write(data)
+            else:
+                self.loop.call_soon_threadsafe(writer.write, data)
+
+        return write
+
+    async def _handle_connection(self, reader, writer):
+        task = asyncio.current_task()
+        self.connection_tasks.add(task)
+        address = writer.get_extra_info('peername')
+        if self.keepalive:
+            enable_keepalive(writer.get_extra_info('socket'), idle=self.keepalive)
+        connection = ClientConnection(address, self._writer(writer),
+                                      close=lambda: self.loop.call_soon_threadsafe(writer.close))
+        self.control.client_connected(connection)
+        try:
+            while True:
+                data = await reader.read(READ_SIZE)
+                if not data:
+                    break
+                for payload in connection.receive(data):
+                    response = await self.loop.run_in_executor(
+                        self.executor, self.control.handle_message, payload, connection)
+                    if response is not None:
+                        connection.send(response)
+                await writer.drain()
+        except ProtocolError as e:
+            print(f"Protocol error from client {address}: {e}")
+        except (ConnectionError, asyncio.CancelledError):
+            # Cancelled by stop(); ending normally keeps asyncio's stream callback quiet
+            pass
+        except Exception as e:
+            print(f"Error handling client {address}: {e}")
+        finally:
+            self.connection_tasks.discard(task)
+            self.control.client_disconnected(connection)
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except (Exception, asyncio.CancelledError):
+                pass
@@ -0,0 +1,68 @@
+import threading
+import time
+from collections import deque
+
+
+class StatusFeed:
+    """Versioned stream of profile status changes.
+
+    Every change gets a monotonically increasing version. Subscribers either
+    register a callback or long-poll with wait(since), which returns the
+    events newer than `since` as soon as one is published.
+    """
+
+    def __init__(self, history=1000):
+        self.version = 0
+        self.events = deque(maxlen=history)
+        self.condition = threading.Condition()
+        self.callbacks = []
+
+    def publish(self, profile_id, status, pid=None, source=None):
+        with self.condition:
+            self.version += 1
+            event = {
+                'version': self.version,
+                'profile_id': profile_id,
+                'status': status,
+                'pid': pid,
+                'source': source,
+                'timestamp': time.time()
+            }
+            self.events.append(event)
+            self.condition.notify_all()
+            callbacks = list(self.callbacks)
+
+        for callback in callbacks:
+            try:
+                callback(event)
+            except Exception as e:
+                print(f"Error in status subscriber: {e}")
+        return event
+
+    def subscribe(self, callback):
+        with self.condition:
+            self.callbacks.append(callback)
+
+    def unsubscribe(self, callback):
+        with self.condition:
+            if callback in self.callbacks:
+                self.callbacks.remove(callback)
+
+    def events_since(self, since):
+        """Return (version, events newer than since, complete)."""
+        with self.condition:
+            events = [e for e in self.events if e['version'] > since]
+            # If the oldest retained event is newer than since+1 some were dropped
+            complete = not self.events or self.events[0]['version'] <= since + 1 or since >= self.version
+            return self.version, events, complete
+
+    def wait(self, since, timeout):
+        """Block until there is an event newer than since or timeout expires."""
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            while self.version <= since:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.condition.wait(remaining)
+        return self.events_since(since)
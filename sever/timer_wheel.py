@@ -0,0 +1,74 @@
+import math
+import threading
+import time
+
+
+class TimerWheel:
+    """Hashed timing wheel for large numbers of coarse timeouts.
+
+    Timers hash into `slots` buckets by the tick they expire on, so
+    schedule() and cancel() are a couple of dict operations and each tick
+    only looks at one bucket, whatever the total number of timers. A timer
+    more than one revolution away stays in its bucket and is skipped until
+    its tick comes round. Every key has at most one timer; scheduling a key
+    again replaces it. Callbacks run on the wheel's thread, outside its lock.
+    """
+
+    def __init__(self, tick=1.0, slots=512):
+        self.tick = tick
+        self.slots = [{} for _ in range(slots)]  # {key: (expiry tick, callback)}
+        self.timers = {}  # {key: slot index}
+        self.now = 0  # Ticks since start
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def __len__(self):
+        return len(self.timers)
+
+    def schedule(self, key, delay, callback):
+        """Call callback() after about delay seconds (rounded up to whole ticks)."""
+        with self.lock:
+            self._cancel(key)
+            expiry = self.now + max(1, math.ceil(delay / self.tick))
+            index = expiry % len(self.slots)
+            self.slots[index][key] = (expiry, callback)
+            self.timers[key] = index
+
+    def cancel(self, key):
+        with self.lock:
+            self._cancel(key)
+
+    def advance(self):
+        """Move on one tick and run the timers that expired."""
+        with self.lock:
+            self.now += 1
+            bucket = self.slots[self.now % len(self.slots)]
+            expired = [key for key, (expiry, _) in bucket.items() if expiry <= self.now]
+            callbacks = []
+            for key in expired:
+                callbacks.append(bucket.pop(key)[1])
+                del self.timers[key]
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"Timer callback failed: {e}")
+
+    def start(self):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+
+    # Call with the lock held
+    def _cancel(self, key):
+        index = self.timers.pop(key, None)
+        if index is not None:
+            del self.slots[index][key]
+
+    def _run(self):
+        next_tick = time.monotonic() + self.tick
+        while True:
+            time.sleep(max(0.0, next_tick - time.monotonic()))
+            next_tick += self.tick
+            self.advance()
@@ -0,0 +1,138 @@
+"""Timing spans for the start/stop and status pipeline, exported to RC_TRACE_FILE.
+
+The file is in the Chrome trace event "JSON Array Format", not plain JSONL:
+its first line is '[' and every following line is one complete ("ph": "X")
+event followed by a comma. The closing ']' is optional in that format, so
+the file can be appended to forever and still be opened directly in
+chrome://tracing, Perfetto (ui.perfetto.dev) or speedscope. Line-oriented
+tools can still read it one event per line after dropping the first line
+and each line's trailing comma, e.g. sed '1d; s/,$//' trace.json.
+"""
+import json
+import os
+import re
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+
+TRACEPARENT_RE = re.compile(r'^[0-9a-f]{2}-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$')
+
+
+def new_trace_id():
+    return secrets.token_hex(16)
+
+
+def new_span_id():
+    return secrets.token_hex(8)
+
+
+# Extract a trace ID from incoming request headers
+def trace_id_from_headers(headers):
+    traceparent = headers.get('traceparent')
+    if traceparent:
+        match = TRACEPARENT_RE.match(traceparent.strip().lower())
+        if match:
+            return match.group(1), match.group(2)
+
+    trace_id = headers.get('X-Trace-Id')
+    if trace_id and re.fullmatch(r'[0-9A-Za-z\-]{1,64}', trace_id):
+        return trace_id, None
+
+    return new_trace_id(), None
+
+
+class Tracer:
+    """Records nested timing spans and exports them to a trace file."""
+
+    def __init__(self, trace_file=None):
+        self.trace_file = trace_file
+        self.pid = os.getpid()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._file = None
+
+    @property
+    def enabled(self):
+        return bool(self.trace_file)
+
+    def _open(self):
+        if self._file is None:
+            new_file = not os.path.exists(self.trace_file) or os.path.getsize(self.trace_file) == 0
+            self._file = open(self.trace_file, 'a', buffering=1)
+            if new_file:
+                self._file.write('[\n')
+        return self._file
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def begin_trace(self, trace_id=None, parent_span_id=None):
+        """Start a new trace on the current thread."""
+        self._local.trace_id = trace_id or new_trace_id()
+        self._local.root_parent = parent_span_id
+        self._local.stack = []
+        return self._local.trace_id
+
+    def end_trace(self):
+        self._local.trace_id = None
+        self._local.root_parent = None
+        self._local.stack = []
+
+    @property
+    def trace_id(self):
+        return getattr(self._local, 'trace_id', None)
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """Time the enclosed block as a child of the current span."""
+        if not self.enabled:
+            yield
+            return
+
+        if self.trace_id is None:
+            self.begin_trace()
+
+        stack = self._stack()
+        parent_id = stack[-1] if stack else getattr(self._local, 'root_parent', None)
+        span_id = new_span_id()
+        stack.append(span_id)
+        start = time.time()
+        start_perf = time.perf_counter()
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = repr(e)
+            raise
+        finally:
+            duration = time.perf_counter() - start_perf
+            stack.pop()
+            args = {'trace_id': self.trace_id, 'span_id': span_id, 'parent_id': parent_id}
+            args.update(attributes)
+            if error:
+                args['error'] = error
+            self._export({
+                'name': name,
+                'cat': name.split('.', 1)[0],
+                'ph': 'X',
+                'ts': int(start * 1_000_000),
+                'dur': int(duration * 1_000_000),
+                'pid': self.pid,
+                'tid': threading.get_ident(),
+                'args': args
+            })
+
+    def _export(self, event):
+        line = json.dumps(event, default=str) + ',\n'
+        try:
+            with self._lock:
+                self._open().write(line)
+        except OSError as e:
+            print(f"Error writing trace: {e}")
+
+
+tracer = Tracer(os.environ.get('RC_TRACE_FILE'))
@@ -0,0 +1,269 @@
+import collections
+import signal
+import threading
+import time
+
+from process_tuning import is_int
+
+WARM_POOL_MAX_SIZE = 16
+
+
+class WarmPoolError(ValueError):
+    pass
+
+
+def parse_warm_pool(data):
+    """Validate a profile's warm pool settings; returns a normalised dict.
+
+    size is the number of standby instances to keep (1-16), warmup the seconds
+    an instance is given to initialise before it is suspended, and memory an
+    optional per-instance estimate in bytes used against the pool's budget
+    until a real instance has been measured.
+    """
+    if data is None:
+        return None
+    if not isinstance(data, dict):
+        raise WarmPoolError("warm_pool must be a JSON object")
+    unknown = set(data) - {'size', 'warmup', 'memory'}
+    if unknown:
+        raise WarmPoolError(f"Unknown warm_pool settings: {', '.join(sorted(unknown))}")
+
+    size = data.get('size')
+    if not is_int(size) or not 1 <= size <= WARM_POOL_MAX_SIZE:
+        raise WarmPoolError(f"warm_pool size must be an integer from 1 to {WARM_POOL_MAX_SIZE}")
+    warmup = data.get('warmup', 5)
+    if isinstance(warmup, bool) or not isinstance(warmup, (int, float)) or warmup < 0:
+        raise WarmPoolError("warm_pool warmup must be a non-negative number of seconds")
+    settings = {'size': size, 'warmup': warmup}
+    memory = data.get('memory')
+    if memory is not None:
+        if not is_int(memory) or memory <= 0:
+            raise WarmPoolError("warm_pool memory must be a positive number of bytes")
+        settings['memory'] = memory
+    return settings
+
+
+class Standby:
+    """One pre-launched instance: warming until ready_at, then parked (stopped)."""
+
+    def __init__(self, process, ready_at):
+        self.process = process
+        self.pid = process.pid
+        self.ready_at = ready_at
+        self.parked = False
+        self.memory = 0
+
+
+class WarmPool:
+    """Keeps pre-launched, suspended instances of opted-in profiles.
+
+    launch(key) starts a new instance of a profile and returns its Popen
+    handle (or None if it can't be started). Each instance runs for the
+    profile's warmup time so it can initialise, then its process tree is
+    suspended with SIGSTOP. take(key) hands the oldest instance over with
+    SIGCONT, so a start costs a signal instead of the program's start-up
+    time. A background thread replaces handed-over and dead instances, but
+    only while the measured memory of all standby instances stays within
+    memory_budget bytes (None for no limit).
+    """
+
+    def __init__(self, backend, launch, memory_budget=None, check_interval=5):
+        self.backend = backend
+        self.launch = launch
+        self.memory_budget = memory_budget
+        self.check_interval = check_interval
+        self.settings = {}  # {key: parsed warm_pool settings}
+        self.instances = {}  # {key: deque of Standby, oldest first}
+        self.estimates = {}  # {key: bytes} last measured size of an instance
+        self.lock = threading.Condition()
+        self.woken = False
+        self.thread = None
+
+    @staticmethod
+    def supported():
+        return hasattr(signal, 'SIGSTOP')
+
+    def configure(self, key, settings, reset=False):
+        """Set (or with None, remove) key's pool; reset discards existing instances."""
+        discarded = ()
+        with self.lock:
+            if reset or settings is None:
+                discarded = self.instances.pop(key, ())
+                self.estimates.pop(key, None)
+            if settings is None:
+                self.settings.pop(key, None)
+            else:
+                self.settings[key] = settings
+                self.instances.setdefault(key, collections.deque())
+            self._wake()
+        self._discard(discarded)
+
+    def take(self, key):
+        """Hand over a standby instance of key, resumed; returns its Popen or None."""
+        with self.lock:
+            standby = None
+            instances = self.instances.get(key, ())
+            # Prefer parked instances, which have finished initialising
+            for candidate in sorted(instances, key=lambda s: not s.parked):
+                if candidate.process.poll() is None:
+                    standby = candidate
+                    break
+            if standby is None:
+                return None
+            instances.remove(standby)
+            self._wake()  # Refill in the background
+        if standby.parked:
+            self._signal_tree(standby.pid, signal.SIGCONT)
+        return standby.process
+
+    def pids(self):
+        """Pids of every standby instance, which status scans must not report as running."""
+        with self.lock:
+            return {standby.pid for instances in self.instances.values() for standby in instances}
+
+    def memory_used(self):
+        with self.lock:
+            return self._memory_used()
+
+    def status(self):
+        with self.lock:
+            return {
+                'memory_used': self._memory_used(),
+                'memory_budget': self.memory_budget,
+                'profiles': {key: {'size': self.settings[key]['size'],
+                                   'parked': sum(s.parked for s in self.instances[key]),
+                                   'warming': sum(not s.parked for s in self.instances[key])}
+                             for key in self.settings}
+            }
+
+    def start(self):
+        if not self.supported():
+            print("Warm pools need SIGSTOP/SIGCONT; profiles will start cold on this platform")
+            return
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def drain(self):
+        """Kill every standby instance and stop refilling (on shutdown)."""
+        with self.lock:
+            self.settings.clear()
+            instances = [standby for deque in self.instances.values() for standby in deque]
+            for deque in self.instances.values():
+                deque.clear()
+        self._discard(instances)
+
+    # Call with the lock held
+    def _wake(self):
+        self.woken = True
+        self.lock.notify_all()
+
+    def _memory_used(self):
+        # Warming instances count at their profile's expected size
+        return sum(standby.memory if standby.parked else self._estimate(key)
+                   for key, instances in self.instances.items() for standby in instances)
+
+    def _estimate(self, key):
+        return self.estimates.get(key, self.settings.get(key, {}).get('memory', 0))
+
+    def _fits(self, key, extra=None):
+        if self.memory_budget is None:
+            return True
+        return self._memory_used() + (self._estimate(key) if extra is None else extra) <= self.memory_budget
+
+    def _tree(self, pid):
+        return [pid] + self.backend.children(pid)
+
+    def _signal_tree(self, pid, sig):
+        for target in self._tree(pid):
+            try:
+                self.backend.signal(target, sig)
+            except (ProcessLookupError, PermissionError):
+                pass
+            except Exception as e:  # psutil.NoSuchProcess and friends
+                print(f"Warm pool: could not signal pid {target}: {e}")
+
+    def _discard(self, instances):
+        instances = list(instances)
+        for standby in instances:
+            self._signal_tree(standby.pid, getattr(signal, 'SIGKILL', signal.SIGTERM))
+        if instances:
+            self.backend.wait([standby.pid for standby in instances], timeout=1)
+        for standby in instances:
+            standby.process.poll()  # Reap
+
+    def _run(self):
+        while True:
+            try:
+                delay = self._tick()
+            except Exception as e:
+                print(f"Warm pool error: {e}")
+                delay = self.check_interval
+            with self.lock:
+                if not self.woken:
+                    self.lock.wait(delay)
+                self.woken = False
+
+    # One maintenance pass; returns how long the thread may sleep
+    def _tick(self):
+        now = time.monotonic()
+        to_park = []
+        to_launch = []
+        with self.lock:
+            for key, settings in self.settings.items():
+                instances = self.instances[key]
+                for standby in [s for s in instances if s.process.poll() is not None]:
+                    instances.remove(standby)
+                to_park.extend((key, s) for s in instances if not s.parked and s.ready_at <= now)
+                missing = settings['size'] - len(instances)
+                if missing > 0:
+                    to_launch.append((key, missing))
+
+        for key, standby in to_park:
+            self._park(key, standby)
+
+        for key, missing in to_launch:
+            for _ in range(missing):
+                with self.lock:
+                    if key not in self.settings or not self._fits(key):
+                        break
+                    warmup = self.settings[key]['warmup']
+                try:
+                    process = self.launch(key)
+                except Exception as e:
+                    print(f"Warm pool: could not launch {key}: {e}")
+                    process = None
+                if process is None:
+                    break
+                with self.lock:
+                    if key in self.settings:
+                        self.instances[key].append(Standby(process, time.monotonic() + warmup))
+                        continue
+                self._discard([Standby(process, 0)])
+
+        with self.lock:
+            pending = [s.ready_at for instances in self.instances.values() for s in instances if not s.parked]
+        if pending:
+            return max(0.0, min(min(pending) - time.monotonic(), self.check_interval))
+        return self.check_interval
+
+    def _park(self, key, standby):
+        self._signal_tree(standby.pid, signal.SIGSTOP)
+        memory = sum(self.backend.memory(pid) for pid in self._tree(standby.pid))
+        with self.lock:
+            if standby not in self.instances.get(key, ()):
+                # Handed over while we were suspending it; take() saw it unparked
+                release, discard = standby, False
+            else:
+                self.estimates[key] = memory
+                standby.memory = memory
+                standby.parked = True
+                if self._fits(key, extra=0):
+                    return
+                # Bigger than expected: give the memory back rather than overrun the budget
+                self.instances[key].remove(standby)
+                release, discard = standby, True
+        if discard:
+            self._discard([release])
+        elif release.process.poll() is None:
+            self._signal_tree(release.pid, signal.SIGCONT)
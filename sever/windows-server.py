@@ -1,216 +1,508 @@
-import json
+import itertools
 import socket
 import threading
-import subprocess
 import os
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from control_engine import ControlEngine, parse_profile_record
+from socket_protocol import ProtocolError
+from socket_transport import (READ_SIZE, AsyncSocketServer, ClientConnection, HeartbeatMonitor,
+                              enable_keepalive, socket_closer, socket_writer)
+
+# The socket protocol reports profile statuses as colours; anything else
+# (the executable doesn't exist) is yellow
+STATUS_COLOURS = {"running": "green", "stopped": "red"}
+
+
+def app_colour(status):
+    return STATUS_COLOURS.get(status, "yellow")
+
+
+class AppConfigEngine(ControlEngine):
+    """ControlEngine over the standalone socket server's own config.json.
+    
+    The file keeps its {"apps": [{"name", "path"}], "users": [...]} layout:
+    every app record is loaded as a profile under a profile ID of its own
+    (the same time-based IDs new apps get, so duplicate names survive) and
+    written back as a list in the same order, with any other keys it had.
+    The users are kept here for authenticate().
+    """
+    def __init__(self, config_file='config.json', **kwargs):
+        self.users = []
+        self.users_by_name = {}
+        self.app_records = {}  # {profile_id: app record as loaded}
+        super().__init__(config_file, **kwargs)
+    
+    def default_file_data(self):
+        # Create default config if not exists
+        return {
+            "apps": [
+                {"name": "Notepad", "path": "C:\\Windows\\System32\\notepad.exe"},
+                {"name": "Calculator", "path": "C:\\Windows\\System32\\calc.exe"}
+            ],
+            "users": [
+                {"username": "admin", "password": "password123"}
+            ]
+        }
+    
+    def profiles_from_file(self, data):
+        self.users = data["users"]
+        self.users_by_name = {}
+        for user in self.users:
+            self.users_by_name.setdefault(user["username"], user)
+        profiles = {}
+        self.app_records = {}
+        profile_id = None
+        for app in data["apps"]:
+            profile_id = self.new_profile_id(reserved=profiles, after=profile_id)
+            profiles[profile_id] = {"name": app["name"], "path": app["path"],
+                                    "arguments": app.get("arguments", ""),
+                                    "status": "unknown", "pid": None}
+            self.app_records[profile_id] = app
+        return profiles
+    
+    def file_data(self):
+        apps = []
+        for profile_id, profile in self.profiles.items():
+            app = dict(self.app_records.get(profile_id, {}), name=profile["name"], path=profile["path"])
+            app.pop("arguments", None)
+            if profile.get("arguments"):
+                app["arguments"] = profile["arguments"]
+            apps.append(app)
+        return {"apps": apps, "users": self.users}
+    
+    def authenticate(self, username, password):
+        """Authenticate a user."""
+        user = self.users_by_name.get(username)
+        return user is not None and user["password"] == password
+
+
+class AppIndex:
+    """Name and path indexes over one generation of the engine's profiles.
+    
+    An index is never modified: when the engine's generation moves on a new
+    one is built and swapped in with a single assignment, so lookups on
+    other threads always see a complete, consistent set of indexes.
+    """
+    def __init__(self, profiles, generation):
+        self.generation = generation
+        self.by_name = {}
+        self.by_path = {}
+        for profile_id, profile in profiles.items():
+            # First one wins for duplicate names, as the old linear scan did
+            self.by_name.setdefault(profile["name"], profile_id)
+            self.by_path.setdefault(os.path.normcase(profile["path"]), []).append(profile_id)
+
+
+class AppStatusMonitor:
+    """Keeps app statuses fresh while anybody is subscribed.
+    
+    Every `interval` seconds it asks the engine for statuses no older than
+    that. The scan itself is the engine's, shared with every other reader,
+    and the engine publishes what changed to its status feed, from which
+    the server pushes colour changes. Starts, stops and exits are published
+    as they happen, without waiting for a scan.
+    """
+    def __init__(self, server, interval=2.0):
+        self.server = server
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.thread = None
+    
+    def start(self):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+    
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            if not self.server.subscribers:
+                continue
+            try:
+                self.server.engine.refresh_statuses(self.interval)
+            except Exception as e:
+                print(f"Error checking app statuses: {e}")
+
 
 class RemoteControlServer:
-    def __init__(self, host='0.0.0.0', port=5000, config_file='config.json'):
+    """Socket front-end over a ControlEngine: apps are the engine's profiles, looked up by name.
+    
+    Without an engine it runs standalone over an AppConfigEngine for
+    config_file; pass one (and an authenticate(username, password)
+    function) to share profiles, statuses and process scans with the HTTP
+    API, as combined-server.py does.
+    """
+    def __init__(self, host='0.0.0.0', port=5000, config_file='config.json',
+                 mode='threaded', workers=16, backlog=1024, snapshot_ttl=1.0, monitor_interval=2.0,
+                 stop_timeout=5.0, heartbeat_interval=20, idle_timeout=60, keepalive=30,
+                 engine=None, authenticate=None):
         self.host = host
         self.port = port
-        self.config_file = config_file
+        self.mode = mode  # 'threaded': a thread per client; 'async': one event loop, `workers` threads
+        self.workers = workers
+        self.backlog = backlog
         self.clients = {}  # {client_addr: auth_status}
-        self.running_processes = {}  # {exe_name: process}
-        self.load_config()
         
-    def load_config(self):
-        """Load configuration from config file."""
-        try:
-            with open(self.config_file, 'r') as f:
-                self.config = json.load(f)
-        except FileNotFoundError:
-            # Create default config if not exists
-            self.config = {
-                "apps": [
-                    {"name": "Notepad", "path": "C:\\Windows\\System32\\notepad.exe"},
-                    {"name": "Calculator", "path": "C:\\Windows\\System32\\calc.exe"}
-                ],
-                "users": [
-                    {"username": "admin", "password": "password123"}
-                ]
-            }
-            self.save_config()
-        
-        # Initialize running_status for all apps
-        for app in self.config["apps"]:
-            app_name = app["name"]
-            self.check_app_status(app_name)
-            
-    def save_config(self):
-        """Save configuration to config file."""
-        with open(self.config_file, 'w') as f:
-            json.dump(self.config, f, indent=4)
-            
+        # Ping quiet clients and drop silent ones (idle_timeout 0 disables),
+        # with OS-level keepalive probes after `keepalive` idle seconds as a backstop
+        self.heartbeats = HeartbeatMonitor(heartbeat_interval, idle_timeout) if idle_timeout else None
+        self.keepalive = keepalive or None
+        
+        # start_app/stop_app from framed clients run here and answer with an
+        # operation_complete frame; actions on one app run one at a time
+        self.operations = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='app-operation')
+        self.operation_ids = itertools.count(1)
+        self.operation_locks = {}  # {profile_id: Lock}
+        self.operation_locks_lock = threading.Lock()
+        
+        # Profiles, process scans (reused for snapshot_ttl seconds) and
+        # start/stop, shared with the HTTP API when both use one engine
+        self.owns_engine = engine is None
+        if engine is None:
+            engine = AppConfigEngine(config_file, status_ttl=snapshot_ttl, stop_timeout=stop_timeout)
+            engine.load()
+            engine.update_all_statuses()
+        self.engine = engine
+        self.authenticate = authenticate or engine.authenticate
+        self.index = AppIndex({}, None)
+        
+        # Pushed app_status_changed frames for connections that sent "subscribe"
+        self.subscribers = set()
+        self.colours = {}  # {profile_id: colour} as last pushed
+        self.colours_lock = threading.Lock()
+        self.engine.status_feed.subscribe(self.push_status_event)
+        self.monitor = AppStatusMonitor(self, interval=monitor_interval)
+    
+    def apps(self):
+        """Indexes over the engine's current profiles."""
+        index = self.index
+        if index.generation != self.engine.generation:
+            # Under the engine's config lock so no profile is added mid-build
+            with self.engine.config_lock:
+                index = self.index = AppIndex(self.engine.profiles, self.engine.generation)
+        return index
+    
+    def find_app(self, app_name):
+        """Return (profile_id, profile) for an app name, or (None, None)."""
+        profile_id = self.apps().by_name.get(app_name)
+        profile = self.engine.profiles.get(profile_id) if profile_id is not None else None
+        return (profile_id, profile) if profile is not None else (None, None)
+    
+    def add_app(self, app):
+        """Add an app from a {"name", "path"} record."""
+        _, profile, error = parse_profile_record({"name": app.get("name"), "path": app.get("path")})
+        if error:
+            return {"status": "error", "message": error}
+        
+        with self.engine.config_lock:
+            if profile["name"] in self.apps().by_name:
+                return {"status": "error", "message": f"App already exists: {profile['name']}"}
+            try:
+                self.engine.add_profiles({self.engine.new_profile_id(): profile}, 'socket')
+            except OSError as e:
+                return {"status": "error", "message": f"Could not save config: {e}"}
+        app = {"name": profile["name"], "path": profile["path"]}
+        return {"status": "success", "message": f"Added {app['name']}", "app": app}
+    
+    def remove_app(self, app_name):
+        """Remove an app from the config (a running instance keeps running)."""
+        with self.engine.config_lock:
+            profile_id, _ = self.find_app(app_name)
+            if profile_id is None:
+                return {"status": "error", "message": f"App not found: {app_name}"}
+            try:
+                self.engine.remove_profile(profile_id)
+            except OSError as e:
+                return {"status": "error", "message": f"Could not save config: {e}"}
+        with self.colours_lock:
+            self.colours.pop(profile_id, None)
+        return {"status": "success", "message": f"Removed {app_name}"}
+    
+    def update_app(self, app_name, fields):
+        """Rename an app and/or change its path."""
+        fields = {key: fields[key] for key in ("name", "path") if key in fields}
+        with self.engine.config_lock:
+            profile_id, profile = self.find_app(app_name)
+            if profile is None:
+                return {"status": "error", "message": f"App not found: {app_name}"}
+            _, updated, error = parse_profile_record(dict(profile, **fields))
+            if error:
+                return {"status": "error", "message": error}
+            if updated["name"] != app_name and updated["name"] in self.apps().by_name:
+                return {"status": "error", "message": f"App already exists: {updated['name']}"}
+            try:
+                self.engine.update_profile(profile_id, {"name": updated["name"], "path": updated["path"]})
+            except OSError as e:
+                return {"status": "error", "message": f"Could not save config: {e}"}
+        app = {"name": updated["name"], "path": updated["path"]}
+        return {"status": "success", "message": f"Updated {app_name}", "app": app}
+    
+    def subscribe(self, connection):
+        """Start pushing app_status_changed frames to connection."""
+        if connection.mode != 'framed':
+            return {"status": "error", "message": "Subscriptions need the framed protocol"}
+        self.monitor.start()
+        self.engine.refresh_statuses()
+        with self.colours_lock:
+            # Push changes the feed hasn't delivered yet to the existing
+            # subscribers first, so the newcomer's starting point and the
+            # pushes never disagree
+            apps = []
+            changed = []
+            for profile_id, profile in list(self.engine.profiles.items()):
+                colour = app_colour(profile["status"])
+                apps.append({"name": profile["name"], "path": profile["path"], "status": colour})
+                if self.colours.get(profile_id) != colour:
+                    self.colours[profile_id] = colour
+                    changed.append((profile["name"], colour))
+            version = self.engine.status_feed.version
+            for app_name, colour in changed:
+                self.push_app_status(app_name, colour, version)
+            self.subscribers.add(connection)
+        return {"status": "success", "apps": apps, "version": version}
+    
+    def push_status_event(self, event):
+        """Status feed callback: push a profile's status to every subscriber if its colour changed."""
+        profile_id = event["profile_id"]
+        profile = self.engine.profiles.get(profile_id)
+        if profile is None:
+            return
+        colour = app_colour(event["status"])
+        with self.colours_lock:
+            if self.colours.get(profile_id) == colour:
+                return  # Only the pid changed
+            self.colours[profile_id] = colour
+        self.push_app_status(profile["name"], colour, event["version"])
+    
+    def push_app_status(self, app_name, colour, version):
+        message = {
+            "event": "app_status_changed",
+            "app_name": app_name,
+            "app_status": colour,
+            "version": version
+        }
+        serialized = {}  # Serialise once per encoding, not once per subscriber
+        for connection in list(self.subscribers):
+            try:
+                connection.send(message, serialized)
+            except Exception as e:
+                print(f"Dropping subscriber {connection.address}: {e}")
+                self.subscribers.discard(connection)
+    
     def check_app_status(self, app_name):
-        """Check if an app is running and update its status."""
-        for app in self.config["apps"]:
-            if app["name"] == app_name:
-                path = app["path"]
-                
-                # Check if the path exists
-                if not os.path.exists(path):
-                    return "yellow"  # Path doesn't exist
-                
-                # Check if process is in our tracked processes and running
-                if app_name in self.running_processes:
-                    if self.running_processes[app_name].poll() is None:
-                        return "green"  # Running
-                    else:
-                        del self.running_processes[app_name]
-                
-                # Additional check by process name (simple version)
-                exe_name = os.path.basename(path)
-                try:
-                    output = subprocess.check_output(f'tasklist /FI "IMAGENAME eq {exe_name}"', shell=True)
-                    if exe_name.lower() in output.decode().lower():
-                        return "green"  # Running
-                except:
-                    pass
-                    
-                return "red"  # Not running
-        
-        return "yellow"  # App not found in config
+        """Current colour of an app (yellow if there is no such app)."""
+        _, profile = self.find_app(app_name)
+        if profile is None:
+            return "yellow"  # App not found in config
+        self.engine.refresh_statuses()
+        return app_colour(profile["status"])
     
     def get_app_info(self):
         """Get all apps with their current status."""
-        app_info = []
-        for app in self.config["apps"]:
-            status = self.check_app_status(app["name"])
-            app_info.append({
-                "name": app["name"],
-                "path": app["path"],
-                "status": status
-            })
-        return app_info
-    
-    def authenticate(self, username, password):
-        """Authenticate a user."""
-        for user in self.config["users"]:
-            if user["username"] == username and user["password"] == password:
-                return True
-        return False
+        self.engine.refresh_statuses()
+        return [{"name": profile["name"], "path": profile["path"], "status": app_colour(profile["status"])}
+                for profile in list(self.engine.profiles.values())]
     
     def start_app(self, app_name):
-        """Start a Windows application."""
-        for app in self.config["apps"]:
-            if app["name"] == app_name:
-                path = app["path"]
-                
-                if not os.path.exists(path):
-                    return {"status": "error", "message": f"Path not found: {path}"}
-                
-                try:
-                    process = subprocess.Popen(path)
-                    self.running_processes[app_name] = process
-                    time.sleep(1)  # Give the process a moment to start
-                    return {"status": "success", "message": f"Started {app_name}"}
-                except Exception as e:
-                    return {"status": "error", "message": str(e)}
+        """Start an app's executable."""
+        profile_id, profile = self.find_app(app_name)
+        if profile is None:
+            return {"status": "error", "message": f"App not found: {app_name}"}
         
-        return {"status": "error", "message": f"App not found: {app_name}"}
+        path = profile["path"]
+        if not os.path.exists(path):
+            return {"status": "error", "message": f"Path not found: {path}"}
+        
+        success, message = self.engine.start_profile(profile_id, 'socket')
+        if not success:
+            return {"status": "error", "message": message}
+        # Only a process that is already gone (with nothing running in its place) counts as a failed start
+        if self.engine.profiles.get(profile_id, profile)["status"] != "running":
+            return {"status": "error", "message": f"{app_name} exited immediately"}
+        return {"status": "success", "message": f"Started {app_name}"}
     
     def stop_app(self, app_name):
-        """Stop a Windows application."""
-        for app in self.config["apps"]:
-            if app["name"] == app_name:
-                path = app["path"]
-                exe_name = os.path.basename(path)
-                
-                # If we have the process in our tracking dict
-                if app_name in self.running_processes:
-                    try:
-                        self.running_processes[app_name].terminate()
-                        time.sleep(1)  # Give it a chance to terminate gracefully
-                        if self.running_processes[app_name].poll() is None:
-                            self.running_processes[app_name].kill()  # Force kill if not terminated
-                        del self.running_processes[app_name]
-                        return {"status": "success", "message": f"Stopped {app_name}"}
-                    except Exception as e:
-                        return {"status": "error", "message": str(e)}
-                
-                # Try to kill by name if not in our tracking dict
-                try:
-                    subprocess.call(f'taskkill /F /IM "{exe_name}"', shell=True)
-                    return {"status": "success", "message": f"Stopped {app_name}"}
-                except Exception as e:
-                    return {"status": "error", "message": str(e)}
+        """Stop every running instance of an app's executable."""
+        profile_id, profile = self.find_app(app_name)
+        if profile is None:
+            return {"status": "error", "message": f"App not found: {app_name}"}
+        
+        success, message = self.engine.stop_profile(profile_id, 'socket')
+        if not success:
+            return {"status": "error", "message": f"Could not stop {app_name}: {message}"}
+        return {"status": "success", "message": f"Stopped {app_name}"}
+    
+    def run_operation(self, connection, action, app_name, operation):
+        """Run start_app/stop_app; framed clients get an operation id now and the result later.
+        
+        The reply says the operation was accepted; an operation_complete
+        frame carrying the same operation_id and the usual status/message
+        follows when it finishes, possibly before the reply itself. Legacy
+        clients can't take unsolicited frames, so they wait for the result.
+        """
+        profile_id, _ = self.find_app(app_name)
+        if profile_id is None:
+            return {"status": "error", "message": f"App not found: {app_name}"}
+        if connection.mode != 'framed':
+            with self.operation_lock(profile_id):
+                return operation(app_name)
+        
+        operation_id = next(self.operation_ids)
+        self.operations.submit(self.complete_operation, connection, operation_id, action, app_name,
+                               profile_id, operation)
+        return {"status": "accepted", "operation_id": operation_id, "message": f"{action} {app_name} accepted"}
+    
+    def operation_lock(self, profile_id):
+        with self.operation_locks_lock:
+            return self.operation_locks.setdefault(profile_id, threading.Lock())
+    
+    def complete_operation(self, connection, operation_id, action, app_name, profile_id, operation):
+        try:
+            with self.operation_lock(profile_id):
+                result = operation(app_name)
+        except Exception as e:
+            result = {"status": "error", "message": str(e)}
+        result.update(event="operation_complete", operation_id=operation_id, action=action, app_name=app_name)
+        try:
+            connection.send(result)
+        except Exception as e:
+            print(f"Could not report operation {operation_id} to {connection.address}: {e}")
+    
+    def handle_command(self, command, connection):
+        """Run one command from a client and return the response."""
+        address = connection.address
+        action = command.get("action")
+        if action == "ping":
+            return {"status": "success", "message": "pong"}
+        
+        if action == "pong":
+            return None  # Answer to our heartbeat; receiving it was the point
+        
+        if action == "authenticate":
+            if self.authenticate(command.get("username"), command.get("password")):
+                self.clients[address] = True  # Mark as authenticated
+                return {"status": "success", "message": "Authentication successful"}
+            return {"status": "error", "message": "Authentication failed"}
+        
+        if not self.clients.get(address):
+            # Client not authenticated
+            return {"status": "error", "message": "Authentication required"}
+        
+        if action == "get_apps":
+            app_info = self.get_app_info()
+            return {"status": "success", "apps": app_info}
+        
+        elif action == "start_app":
+            return self.run_operation(connection, action, command.get("app_name"), self.start_app)
         
-        return {"status": "error", "message": f"App not found: {app_name}"}
+        elif action == "stop_app":
+            return self.run_operation(connection, action, command.get("app_name"), self.stop_app)
+        
+        elif action == "app_status":
+            app_name = command.get("app_name")
+            if app_name is None and "path" in command:
+                # Look the app up by its executable instead
+                profile_ids = self.apps().by_path.get(os.path.normcase(str(command["path"])), [])
+                profile = self.engine.profiles.get(profile_ids[0]) if profile_ids else None
+                app_name = profile["name"] if profile else None
+            status = self.check_app_status(app_name)
+            return {"status": "success", "app_status": status}
+        
+        elif action == "subscribe":
+            return self.subscribe(connection)
+        
+        elif action == "unsubscribe":
+            self.subscribers.discard(connection)
+            return {"status": "success", "message": "Unsubscribed"}
+        
+        elif action == "add_app":
+            return self.add_app(command)
+        
+        elif action == "remove_app":
+            return self.remove_app(command.get("app_name"))
+        
+        elif action == "update_app":
+            return self.update_app(command.get("app_name"), command)
+        
+        return {"status": "error", "message": "Unknown command"}
+    
+    def handle_message(self, payload, connection):
+        """Decode one request, run it and return the response (tagged with the request's id).
+        
+        Returns None for messages that get no reply (heartbeat pongs).
+        """
+        try:
+            command = connection.decode(payload)
+        except ProtocolError:
+            return {"status": "error", "message": f"Invalid {connection.encoding} format"}
+        response = self.handle_command(command, connection)
+        if response is not None and "id" in command:
+            response["id"] = command["id"]
+        return response
+    
+    def client_connected(self, connection):
+        self.clients[connection.address] = False  # Not authenticated initially
+        if self.heartbeats is not None:
+            self.heartbeats.watch(connection)
+        print(f"Connection from {connection.address}")
+    
+    def client_disconnected(self, connection):
+        if self.heartbeats is not None:
+            self.heartbeats.forget(connection)
+        self.subscribers.discard(connection)
+        self.clients.pop(connection.address, None)
+        print(f"Connection with {connection.address} closed")
     
     def handle_client(self, client_socket, address):
-        """Handle communication with a client."""
-        self.clients[address] = False  # Not authenticated initially
+        """Handle communication with a client (framed or legacy, see socket_protocol.py)."""
+        if self.keepalive:
+            enable_keepalive(client_socket, idle=self.keepalive)
+        connection = ClientConnection(address, socket_writer(client_socket), socket_closer(client_socket))
+        self.client_connected(connection)
         
         try:
             while True:
-                # Receive data from the client
-                data = client_socket.recv(1024)
+                data = client_socket.recv(READ_SIZE)
                 if not data:
                     break
-                
-                # Parse the received command
-                try:
-                    command = json.loads(data.decode('utf-8'))
-                except json.JSONDecodeError:
-                    response = {"status": "error", "message": "Invalid JSON format"}
-                    client_socket.send(json.dumps(response).encode('utf-8'))
-                    continue
-                
-                # Process commands
-                if command["action"] == "authenticate":
-                    if self.authenticate(command.get("username"), command.get("password")):
-                        self.clients[address] = True  # Mark as authenticated
-                        response = {"status": "success", "message": "Authentication successful"}
-                    else:
-                        response = {"status": "error", "message": "Authentication failed"}
-                
-                elif not self.clients[address]:
-                    # Client not authenticated
-                    response = {"status": "error", "message": "Authentication required"}
-                
-                elif command["action"] == "get_apps":
-                    app_info = self.get_app_info()
-                    response = {"status": "success", "apps": app_info}
-                
-                elif command["action"] == "start_app":
-                    response = self.start_app(command.get("app_name"))
-                
-                elif command["action"] == "stop_app":
-                    response = self.stop_app(command.get("app_name"))
-                
-                elif command["action"] == "app_status":
-                    status = self.check_app_status(command.get("app_name"))
-                    response = {"status": "success", "app_status": status}
-                
-                else:
-                    response = {"status": "error", "message": "Unknown command"}
-                
-                # Send response back to the client
-                client_socket.send(json.dumps(response).encode('utf-8'))
+                for payload in connection.receive(data):
+                    response = self.handle_message(payload, connection)
+                    if response is not None:
+                        connection.send(response)
         
+        except ProtocolError as e:
+            print(f"Protocol error from client {address}: {e}")
         except Exception as e:
             print(f"Error handling client {address}: {e}")
         finally:
-            if address in self.clients:
-                del self.clients[address]
+            self.client_disconnected(connection)
             client_socket.close()
-            print(f"Connection with {address} closed")
     
     def start(self):
         """Start the server."""
+        if self.owns_engine:
+            # Scans happen on demand and for subscribers; exits are still watched
+            self.engine.start(status_interval=None)
+        if self.heartbeats is not None:
+            self.heartbeats.start()
+        if self.mode == 'async':
+            AsyncSocketServer(self, host=self.host, port=self.port, workers=self.workers,
+                              backlog=self.backlog, keepalive=self.keepalive).run()
+            return
+        
         server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         
         try:
             server_socket.bind((self.host, self.port))
-            server_socket.listen(5)
+            server_socket.listen(self.backlog)
             print(f"Server started on {self.host}:{self.port}")
             
             while True:
                 client_socket, addr = server_socket.accept()
-                print(f"Connection from {addr}")
                 
                 # Create a new thread to handle the client
                 client_thread = threading.Thread(
@@ -235,8 +527,28 @@ if __name__ == "__main__":
     parser.add_argument('--host', default='0.0.0.0', help='Host IP to bind to')
     parser.add_argument('--port', type=int, default=5000, help='Port to bind to')
     parser.add_argument('--config', default='config.json', help='Path to config file')
+    parser.add_argument('--mode', choices=['threaded', 'async'], default='threaded',
+                        help='threaded: thread per connection; async: asyncio event loop with a worker pool')
+    parser.add_argument('--workers', type=int, default=16, help='Worker threads for blocking work in async mode')
+    parser.add_argument('--backlog', type=int, default=1024, help='Pending connections the listen socket queues')
+    parser.add_argument('--monitor-interval', type=float, default=2.0,
+                        help='Seconds between status checks for subscribed clients')
+    parser.add_argument('--heartbeat-interval', type=float, default=20,
+                        help='Seconds of client silence before the server pings it')
+    parser.add_argument('--idle-timeout', type=float, default=60,
+                        help='Seconds of client silence before the connection is closed (0 to never close)')
+    parser.add_argument('--keepalive', type=int, default=30,
+                        help='Idle seconds before TCP keepalive probes start (0 to disable)')
+    parser.add_argument('--stop-timeout', type=float, default=5.0,
+                        help='Seconds stop_app waits after terminating an app before killing it')
+    parser.add_argument('--snapshot-ttl', type=float, default=1.0,
+                        help='Seconds one process table scan is reused for status checks')
     
     args = parser.parse_args()
     
-    server = RemoteControlServer(host=args.host, port=args.port, config_file=args.config)
+    server = RemoteControlServer(host=args.host, port=args.port, config_file=args.config,
+                                 mode=args.mode, workers=args.workers, backlog=args.backlog,
+                                 snapshot_ttl=args.snapshot_ttl, monitor_interval=args.monitor_interval,
+                                 stop_timeout=args.stop_timeout, heartbeat_interval=args.heartbeat_interval,
+                                 idle_timeout=args.idle_timeout, keepalive=args.keepalive)
     server.start()